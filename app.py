@@ -12,25 +12,56 @@ import asyncio
 import json
 import logging
 import os
-from datetime import datetime, timezone
-from typing import Dict, Any, List
+import time
+import traceback
+from typing import Dict, Any, List, Optional, Tuple
 
-from flask import Flask, render_template, request
-from flask_socketio import SocketIO, emit
+from flask import Flask, Response, render_template, request
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import websockets
 from dotenv import load_dotenv
 
 # Import protobuf utilities
 from protobuf_utils import (
-    encode_ibeacon_packet, 
-    decode_ibeacon_packet,
-    is_ibeacon_data,
-    encode_wifi_packet,
-    decode_wifi_packet,
-    is_wifi_data,
-    encode_enocean_packet,
-    decode_enocean_packet,
-    is_enocean_data
+    is_packet_stream,
+    decode_packet_stream,
+    preload_descriptors,
+    protobuf_backend,
+    codec_for_type,
+    get_codec,
+    registered_codecs,
+    set_normalizer
+)
+from aruba_session import ConnectionSession, get_auth_config
+from ble_beacons import parse_beacon
+from timestamps import api_view, format_timestamp, now_ns
+from telemetry_store import ChangeClock, Query, RegistryIndex, TelemetryBuffer
+from dashboard_feed import DashboardFeed
+from subscriptions import Subscription, SubscriptionRouter
+from enocean_eep import decode_eep
+from rssi_filters import create_rssi_filter_factory, estimate_distance
+from dedup import DuplicateSuppressor, payload_signature
+from sampling import TelemetrySampler
+from json_repair import RepairBudgetExceeded, repair_json
+from quarantine import LogLimiter, QuarantineBuffer
+from dead_letter import DeadLetterStore
+from metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from json_responses import (
+    JSON_MIMETYPE,
+    STREAM_THRESHOLD,
+    ResponseCache,
+    dumps,
+    negotiate_encoding,
+    serializer_name,
+    stream_json_object,
+    stream_response
+)
+from profiling import (
+    STAGE_PROFILER,
+    ingest_thread_id,
+    profiling_enabled,
+    register_ingest_thread,
+    sample_stacks
 )
 
 # Load environment variables
@@ -47,25 +78,78 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
 
-# Initialize SocketIO
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# Initialize SocketIO; bound to the app by init_socketio() when serving, so
+# importing this module (tests, tools, the async server) does not load the
+# threading server's WebSocket transport
+socketio = SocketIO()
+
+def init_socketio() -> SocketIO:
+    """Bind Flask-SocketIO to the app for the threading server and gunicorn (idempotent)"""
+    if socketio.server is None:
+        socketio.init_app(app, cors_allowed_origins="*", async_mode='threading')
+    return socketio
+
+# Ingest metrics (exposed at /metrics)
+PACKETS_TOTAL = REGISTRY.counter('aruba_packets_total', 'Telemetry packets processed, by packet type', ('type',))
+FRAMES_TOTAL = REGISTRY.counter('aruba_frames_total', 'Frames decoded, by decode path (protobuf, json, sanitized)', ('path',))
+JSON_PARSE_FAILURES = REGISTRY.counter('aruba_json_parse_failures_total', 'Frames that could not be parsed as JSON')
+JSON_REPAIRS = REGISTRY.counter('aruba_json_repairs_total', 'Malformed JSON frames by repair outcome (repaired, failed, over_budget)', ('result',))
+FRAME_FAILURES = REGISTRY.counter('aruba_frame_failures_total', 'Frames that failed processing and were rejected')
+DEAD_LETTERS = REGISTRY.counter('aruba_dead_letters_total', 'Rejected frames queued for the dead-letter store, by error class', ('error',))
+INGEST_SECONDS = REGISTRY.histogram('aruba_ingest_seconds', 'Time to process one frame, by frame kind', ('frame',))
+PROTOBUF_DECODE_SECONDS = REGISTRY.histogram('aruba_protobuf_decode_seconds', 'Time to decode a protobuf frame')
+BLE_ANALYTICS_SECONDS = REGISTRY.histogram('aruba_ble_analytics_seconds', 'Time spent updating BLE analytics per packet')
+PROTOBUF_BACKEND = REGISTRY.gauge('aruba_protobuf_backend', 'Protobuf runtime backend in use (1 for the active backend)', ('backend',))
+WS_CONNECTIONS = REGISTRY.gauge('aruba_ws_connections', 'Currently connected Aruba APs')
+WS_CONNECTIONS_TOTAL = REGISTRY.counter('aruba_ws_connections_total', 'Aruba WebSocket connection attempts, by result', ('result',))
+REPLAY_SESSIONS = REGISTRY.counter('aruba_replay_sessions_total', 'Dead-letter replay sessions opened (their failing frames are not dead-lettered)')
+API_RESPONSES_TOTAL = REGISTRY.counter('aruba_api_responses_total', 'JSON API responses, by source (cache, built, streamed, not_modified)', ('source',))
 
 class ArubaIoTTelemetryHandler:
     """Handler for processing Aruba IoT telemetry data"""
     
     def __init__(self):
         self.connected_clients = set()
-        self.telemetry_data = []
+        # Filtered telemetry streams requested by SocketIO clients
+        self.subscriptions = SubscriptionRouter()
+        # Frames that could not be parsed, kept for inspection instead of logged in full
+        self.quarantine = QuarantineBuffer()
+        self.bad_frame_log = LogLimiter()
+        # Rejected frames kept on disk for replay (None if DEAD_LETTER_DIR is empty)
+        self.dead_letters = DeadLetterStore.from_env()
+        # (error class, message) of the first failure of the frame being processed
+        self._rejection = None
+        # Ring of recent records with sequence numbers and type/AP indexes
+        self.telemetry_data = TelemetryBuffer(int(os.getenv('TELEMETRY_BUFFER_SIZE', 1000)))
         self.device_registry = {}
+        # Key order and change versions of the registries, for cursor pagination,
+        # seen_since queries and dashboard deltas
+        self.change_clock = ChangeClock()
+        self.device_index = RegistryIndex(self.change_clock, index_fields=('type', 'access_point'))
+        self.ble_device_index = RegistryIndex(self.change_clock, index_fields=('reporters',))
+        self.reporter_index = RegistryIndex(self.change_clock)
         self.ble_analytics = {
             'reporter_stats': {},  # Access point statistics
             'device_stats': {},    # Device statistics
             'proximity_map': {},   # Device-to-AP proximity mapping
             'signal_strength': {}  # Signal strength trends
         }
-        
-    def process_ble_packet(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Process Bluetooth Low Energy packet data"""
+        # Factory for the per-AP / per-device / per-(device, AP) RSSI filters
+        self.rssi_filter_factory = create_rssi_filter_factory()
+        # Collapses copies of the same packet forwarded by several APs
+        self.packet_dedup = DuplicateSuppressor()
+        # Per-device/per-type storage policies for chatty devices
+        self.sampler = TelemetrySampler()
+        # Incremented after every frame; tags cached API responses
+        self.data_version = 0
+        
+    def process_ble_packet(self, data: Dict[str, Any], received_ns: Optional[int] = None) -> Dict[str, Any]:
+        """Process Bluetooth Low Energy packet data
+
+        Args:
+            data: Decoded JSON packet
+            received_ns: Frame receive time in epoch nanoseconds (defaults to now)
+        """
         logger.info("process_ble_packet: Processing BLE packet")
         
         device_id = data.get('deviceId', 'unknown')
@@ -80,7 +164,7 @@ class ArubaIoTTelemetryHandler:
         rssi = data.get('rssi', 0)
         logger.info(f"process_ble_packet: RSSI: {rssi}")
         
-        timestamp = datetime.now(timezone.utc).isoformat()
+        timestamp = received_ns if received_ns is not None else now_ns()
         logger.info(f"process_ble_packet: Timestamp: {timestamp}")
         
         # Log any manufacturer data and service UUIDs
@@ -98,15 +182,17 @@ class ArubaIoTTelemetryHandler:
             logger.info("process_ble_packet: No location data present")
         
         # Check if this is an iBeacon packet
-        if is_ibeacon_data(data):
+        # Classify and encode with the registered codec (it may have been replaced)
+        codec = get_codec('ble')
+        if codec.classify(data):
             logger.info("process_ble_packet: Detected iBeacon data, using protobuf encoding")
             try:
                 # Encode to protobuf binary format
-                protobuf_data = encode_ibeacon_packet(data)
+                protobuf_data = codec.encode(data)
                 logger.info(f"process_ble_packet: Successfully encoded {len(protobuf_data)} bytes of protobuf data")
                 
                 # Decode from protobuf to verify and get standardized format
-                processed = decode_ibeacon_packet(protobuf_data)
+                processed = codec.decode(protobuf_data)
                 logger.info("process_ble_packet: Successfully decoded iBeacon protobuf data")
                 
                 # Ensure we have all required fields
@@ -133,10 +219,21 @@ class ArubaIoTTelemetryHandler:
             logger.info("process_ble_packet: Not an iBeacon packet, using standard processing")
             processed = self._standard_ble_processing(data, device_id, mac_address, rssi, timestamp, 
                                                     manufacturer_data, service_uuids, location, access_point)
-        
+            # Decode other beacon formats (AltBeacon, Eddystone) from the advertisement
+            beacon = parse_beacon(data)
+            if beacon is not None:
+                logger.info(f"process_ble_packet: Detected {beacon['format']} advertisement")
+                processed.update(beacon)
+                processed['subtype'] = processed.pop('format')
+        
+        STAGE_PROFILER.lap('normalize')
         logger.info("process_ble_packet: Updating BLE analytics")
-        # Update BLE analytics
-        self._update_ble_analytics(device_id, access_point, rssi, timestamp, mac_address)
+        # Update BLE analytics; the filtered RSSI drives the distance estimate
+        proximity = self._update_ble_analytics(device_id, access_point, rssi, timestamp, mac_address,
+                                               processed.get('tx_power', data.get('txPower', 0)))
+        STAGE_PROFILER.lap('analytics')
+        processed['filtered_rssi'] = proximity['avg_rssi']
+        processed['distance'] = proximity['distance']
         logger.info("process_ble_packet: BLE packet processing complete")
         
         return processed
@@ -164,8 +261,13 @@ class ArubaIoTTelemetryHandler:
         logger.info("_standard_ble_processing: Standard BLE processing complete")
         return processed
     
-    def process_enocean_packet(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Process EnOcean Alliance packet data"""
+    def process_enocean_packet(self, data: Dict[str, Any], received_ns: Optional[int] = None) -> Dict[str, Any]:
+        """Process EnOcean Alliance packet data
+
+        Args:
+            data: Decoded JSON packet
+            received_ns: Frame receive time in epoch nanoseconds (defaults to now)
+        """
         logger.info("process_enocean_packet: Processing EnOcean packet")
         
         device_id = data.get('deviceId', 'unknown')
@@ -190,19 +292,30 @@ class ArubaIoTTelemetryHandler:
         else:
             logger.info("process_enocean_packet: No location data present")
         
-        timestamp = datetime.now(timezone.utc).isoformat()
+        timestamp = received_ns if received_ns is not None else now_ns()
         logger.info(f"process_enocean_packet: Timestamp: {timestamp}")
         
+        # Decode sensor values from the telegram according to its EEP; a
+        # decoder failure only loses the decoded values, not the packet
+        try:
+            sensor_values = decode_eep(eep, payload)
+        except Exception as e:
+            logger.warning(f"process_enocean_packet: Could not decode {eep} payload: {e}")
+            sensor_values = {}
+        logger.info(f"process_enocean_packet: Decoded sensor values: {sensor_values or 'None'}")
+        
         # Check if this packet can be encoded with protobuf
-        if is_enocean_data(data):
+        # Classify and encode with the registered codec (it may have been replaced)
+        codec = get_codec('enocean')
+        if codec.classify(data):
             logger.info("process_enocean_packet: Detected EnOcean data, using protobuf encoding")
             try:
                 # Encode to protobuf binary format
-                protobuf_data = encode_enocean_packet(data)
+                protobuf_data = codec.encode(data)
                 logger.info(f"process_enocean_packet: Successfully encoded {len(protobuf_data)} bytes of protobuf data")
                 
                 # Decode from protobuf to verify and get standardized format
-                processed = decode_enocean_packet(protobuf_data)
+                processed = codec.decode(protobuf_data)
                 logger.info("process_enocean_packet: Successfully decoded EnOcean protobuf data")
                 
                 # Ensure we have all required fields
@@ -215,9 +328,14 @@ class ArubaIoTTelemetryHandler:
                     'encoded_with_protobuf': True  # Flag to indicate this was protobuf-encoded
                 })
                 
+                # Keep decoded values without a protobuf field (e.g. rocker actions)
+                for key, value in sensor_values.items():
+                    processed.setdefault(key, value)
+                
                 # Store the binary data for potential future use
                 processed['protobuf_data'] = protobuf_data.hex()  # Store as hex string
                 logger.info("process_enocean_packet: Completed EnOcean protobuf processing")
+                STAGE_PROFILER.lap('normalize')
                 return processed
             except Exception as e:
                 logger.error(f"process_enocean_packet: Error in protobuf processing: {e}")
@@ -238,12 +356,19 @@ class ArubaIoTTelemetryHandler:
             'reported': device_id,
             'encoded_with_protobuf': False  # Flag to indicate this was not protobuf-encoded
         }
+        processed.update(sensor_values)
         
         logger.info("process_enocean_packet: EnOcean packet processing complete")
+        STAGE_PROFILER.lap('normalize')
         return processed
     
-    def process_wifi_packet(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Process WiFi packet data"""
+    def process_wifi_packet(self, data: Dict[str, Any], received_ns: Optional[int] = None) -> Dict[str, Any]:
+        """Process WiFi packet data
+
+        Args:
+            data: Decoded JSON packet
+            received_ns: Frame receive time in epoch nanoseconds (defaults to now)
+        """
         logger.info("process_wifi_packet: Processing WiFi packet")
         
         device_id = data.get('deviceId', 'unknown')
@@ -271,19 +396,21 @@ class ArubaIoTTelemetryHandler:
         else:
             logger.info("process_wifi_packet: No location data present")
         
-        timestamp = datetime.now(timezone.utc).isoformat()
+        timestamp = received_ns if received_ns is not None else now_ns()
         logger.info(f"process_wifi_packet: Timestamp: {timestamp}")
         
         # Check if this packet can be encoded with protobuf
-        if is_wifi_data(data):
+        # Classify and encode with the registered codec (it may have been replaced)
+        codec = get_codec('wifi')
+        if codec.classify(data):
             logger.info("process_wifi_packet: Detected WiFi data, using protobuf encoding")
             try:
                 # Encode to protobuf binary format
-                protobuf_data = encode_wifi_packet(data)
+                protobuf_data = codec.encode(data)
                 logger.info(f"process_wifi_packet: Successfully encoded {len(protobuf_data)} bytes of protobuf data")
                 
                 # Decode from protobuf to verify and get standardized format
-                processed = decode_wifi_packet(protobuf_data)
+                processed = codec.decode(protobuf_data)
                 logger.info("process_wifi_packet: Successfully decoded WiFi protobuf data")
                 
                 # Ensure we have all required fields
@@ -301,6 +428,7 @@ class ArubaIoTTelemetryHandler:
                 # Store the binary data for potential future use
                 processed['protobuf_data'] = protobuf_data.hex()  # Store as hex string
                 logger.info("process_wifi_packet: Completed WiFi protobuf processing")
+                STAGE_PROFILER.lap('normalize')
                 return processed
             except Exception as e:
                 logger.error(f"process_wifi_packet: Error in protobuf processing: {e}")
@@ -324,10 +452,49 @@ class ArubaIoTTelemetryHandler:
         }
         
         logger.info("process_wifi_packet: WiFi packet processing complete")
+        STAGE_PROFILER.lap('normalize')
         return processed
     
-    def process_telemetry(self, raw_data) -> Dict[str, Any]:
-        """Process incoming telemetry data"""
+    def process_telemetry(self, raw_data, session: Optional[ConnectionSession] = None) -> Dict[str, Any]:
+        """
+        Process incoming telemetry data
+        
+        Args:
+            raw_data: WebSocket frame (str or bytes)
+            session: Session of the AP connection the frame arrived on, if any
+        """
+        # Receive time, captured once for everything derived from this frame
+        received_ns = session.now_ns() if session is not None else now_ns()
+        self._rejection = None
+        try:
+            processed = self._process_frame(raw_data, session, received_ns)
+            if processed is None and self.dead_letters is not None and not (session is not None and session.replay):
+                self._dead_letter(raw_data, session, received_ns)
+            return processed
+        finally:
+            # Any frame may have changed stored data; invalidates cached API responses
+            self.data_version += 1
+
+    def _reject(self, error: Exception) -> None:
+        """Record why the current frame failed; the first failure is kept"""
+        if self._rejection is None:
+            self._rejection = (type(error).__name__, str(error))
+
+    def _dead_letter(self, raw_data, session: Optional[ConnectionSession], received_ns: int) -> None:
+        """Queue a rejected frame, as received, for the dead-letter store"""
+        error_class, message = self._rejection or ('Unknown', 'Frame was rejected')
+        if self.dead_letters.add(raw_data, error_class, message, self._frame_source(session), received_ns):
+            DEAD_LETTERS.labels(error_class).inc()
+
+    @staticmethod
+    def _frame_source(session: Optional[ConnectionSession]) -> Optional[str]:
+        """AP name, or address if the AP is not known yet, of a frame's connection"""
+        if session is None:
+            return None
+        return session.access_point or f"{session.client_ip}:{session.client_port}"
+
+    def _process_frame(self, raw_data, session: Optional[ConnectionSession], received_ns: int) -> Dict[str, Any]:
+        """Decode, classify and store one frame (see process_telemetry)"""
         logger.info("process_telemetry: Starting telemetry processing")
         logger.info(f"process_telemetry: Input data type: {type(raw_data)}")
         
@@ -335,6 +502,13 @@ class ArubaIoTTelemetryHandler:
         if isinstance(raw_data, bytes):
             logger.info(f"process_telemetry: Processing binary data of {len(raw_data)} bytes")
             
+            # Length-delimited streams of many protobuf packets in one frame
+            if is_packet_stream(raw_data):
+                stream_result = self.process_telemetry_stream(raw_data, received_ns)
+                if stream_result:
+                    FRAMES_TOTAL.labels('protobuf_stream').inc()
+                return stream_result
+            
             # First check if this might be protobuf data
             # A simple heuristic: protobuf data typically starts with a field tag
             # and doesn't start with common JSON characters like '{', '[', etc.
@@ -345,20 +519,22 @@ class ArubaIoTTelemetryHandler:
                 # which is unlikely to be a common JSON character
                 if first_byte < 32 or first_byte > 126:
                     logger.info("process_telemetry: Data appears to be binary protobuf, attempting protobuf processing")
-                    protobuf_result = self.process_telemetry_protobuf(raw_data)
+                    protobuf_result = self.process_telemetry_protobuf(raw_data, received_ns)
                     if protobuf_result:
                         logger.info("process_telemetry: Successfully processed as protobuf data")
+                        FRAMES_TOTAL.labels('protobuf').inc()
                         return protobuf_result
                     else:
                         logger.info("process_telemetry: Protobuf processing failed, falling back to standard processing")
             except Exception as e:
                 logger.warning(f"process_telemetry: Error in protobuf detection: {e}")
             
-            # Add hexdump of first 128 bytes for debugging binary data
-            logger.info("process_telemetry: First 128 bytes hexdump:")
-            hex_lines = self._hex_dump(raw_data[:128])
-            for line in hex_lines:
-                logger.info(f"process_telemetry: {line}")
+            # Hexdump of the first 128 bytes for debugging binary data (the
+            # quarantine keeps the whole frame, so only at DEBUG level)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("process_telemetry: First 128 bytes hexdump:")
+                for line in self._hex_dump(raw_data[:128]):
+                    logger.debug(f"process_telemetry: {line}")
                 
             # Try different encodings if UTF-8 fails
             try:
@@ -373,6 +549,7 @@ class ArubaIoTTelemetryHandler:
                     logger.warning("process_telemetry: Received non-UTF8 data, falling back to latin-1 encoding")
                 except Exception as e:
                     logger.error(f"process_telemetry: Could not decode binary data with any encoding: {e}")
+                    self._reject(e)
                     return None
         else:
             # Already a string
@@ -385,27 +562,12 @@ class ArubaIoTTelemetryHandler:
         else:
             logger.info(f"process_telemetry: Data: {decoded_data}")
             
-        # Check for common JSON syntax issues
-        if decoded_data:
-            # Remove potential BOM at the beginning of the string
-            if decoded_data.startswith('\ufeff'):
-                logger.warning("process_telemetry: Found BOM at start of string, removing it")
-                decoded_data = decoded_data[1:]
-                
-            # Check for unescaped control characters
-            control_chars = [ord(c) for c in decoded_data if ord(c) < 32 and c not in '\r\n\t']
-            if control_chars:
-                logger.warning(f"process_telemetry: Found {len(control_chars)} unescaped control characters in data")
-                for i, char_code in enumerate(control_chars[:10]):  # Show first 10 only
-                    char_pos = decoded_data.find(chr(char_code))
-                    logger.warning(f"process_telemetry: Control char 0x{char_code:02x} at position {char_pos}")
-                    
-            # Check for basic structure
-            stripped = decoded_data.strip()
-            if not (stripped.startswith('{') and stripped.endswith('}')) and \
-               not (stripped.startswith('[') and stripped.endswith(']')):
-                logger.warning("process_telemetry: Data doesn't appear to have valid JSON structure")
-                logger.warning(f"process_telemetry: Starts with: '{stripped[:10]}', Ends with: '{stripped[-10:]}'")
+        # Remove potential BOM at the beginning of the string. Other defects
+        # (control characters, unquoted keys, ...) are only looked for once
+        # parsing fails, so well-formed frames are not scanned for them
+        if decoded_data.startswith('\ufeff'):
+            logger.warning("process_telemetry: Found BOM at start of string, removing it")
+            decoded_data = decoded_data[1:]
                 
         try:
             # Try to parse the JSON
@@ -413,58 +575,93 @@ class ArubaIoTTelemetryHandler:
             try:
                 data = json.loads(decoded_data)
                 logger.info(f"process_telemetry: JSON parsing successful, keys: {list(data.keys())}")
+                FRAMES_TOTAL.labels('json').inc()
+                STAGE_PROFILER.lap('decode')
             except json.JSONDecodeError as initial_error:
-                # Try to sanitize and parse again
-                logger.warning(f"process_telemetry: Initial JSON parsing failed: {initial_error}")
-                sanitized_data = self._sanitize_json_string(decoded_data)
+                # Try to repair common defects and parse again
+                logger.info(f"process_telemetry: Initial JSON parsing failed: {initial_error}")
+                try:
+                    repaired_data, repairs = repair_json(decoded_data)
+                except RepairBudgetExceeded as budget_error:
+                    JSON_REPAIRS.labels('over_budget').inc()
+                    logger.info(f"process_telemetry: Not repairing malformed JSON: {budget_error}")
+                    raise initial_error
                 
-                if sanitized_data != decoded_data:
-                    logger.info("process_telemetry: Data was sanitized, attempting to parse again")
-                    try:
-                        data = json.loads(sanitized_data)
-                        logger.info(f"process_telemetry: JSON parsing successful after sanitization, keys: {list(data.keys())}")
-                    except json.JSONDecodeError:
-                        # If it still fails, raise the original error for better debugging
-                        logger.error("process_telemetry: JSON parsing failed even after sanitization")
-                        raise initial_error
-                else:
-                    # No changes were made during sanitization, re-raise the original error
+                if not repairs:
+                    # Nothing to repair, re-raise the original error
+                    JSON_REPAIRS.labels('failed').inc()
                     raise
+                logger.info(f"process_telemetry: Repaired {', '.join(repairs)}, attempting to parse again")
+                try:
+                    data = json.loads(repaired_data)
+                except json.JSONDecodeError:
+                    # If it still fails, raise the original error for better debugging
+                    JSON_REPAIRS.labels('failed').inc()
+                    raise initial_error
+                logger.info(f"process_telemetry: JSON parsing successful after repair, keys: {list(data.keys())}")
+                JSON_REPAIRS.labels('repaired').inc()
+                FRAMES_TOTAL.labels('sanitized').inc()
+                STAGE_PROFILER.lap('decode')
+            
+            if session is not None:
+                session.apply_identity(data)
             
             packet_type = data.get('type', '').lower()
             logger.info(f"process_telemetry: Detected packet type: '{packet_type}'")
             
-            if packet_type == 'ble' or 'bluetooth' in packet_type:
-                logger.info(f"process_telemetry: Processing as BLE packet")
-                processed = self.process_ble_packet(data)
-                logger.info(f"process_telemetry: BLE packet processed, device_id: {processed.get('device_id', 'unknown')}")
-            elif packet_type == 'enocean':
-                logger.info(f"process_telemetry: Processing as EnOcean packet")
-                processed = self.process_enocean_packet(data)
-                logger.info(f"process_telemetry: EnOcean packet processed, device_id: {processed.get('device_id', 'unknown')}")
-            elif packet_type == 'wifi':
-                logger.info(f"process_telemetry: Processing as WiFi packet")
-                processed = self.process_wifi_packet(data)
-                logger.info(f"process_telemetry: WiFi packet processed, device_id: {processed.get('device_id', 'unknown')}")
+            # One lookup selects the protocol's codec (None for unknown types)
+            codec = codec_for_type(packet_type)
+            
+            # Collapse copies of a packet already forwarded by another AP
+            signature = None
+            if codec is not None:
+                # None if the payload cannot be hashed; the packet then skips dedup
+                signature = payload_signature(data)
+                duplicate = None
+                if signature is not None:
+                    duplicate = self.packet_dedup.lookup(packet_type, data.get('deviceId', 'unknown'), signature)
+                if duplicate is not None:
+                    return self._merge_duplicate(duplicate, data.get('accessPoint', ''), data.get('rssi', 0),
+                                                 data.get('macAddress', ''), data.get('txPower', 0), received_ns)
+                
+                # Chatty devices: keep analytics current but skip full processing and storage
+                if not self.sampler.should_store(codec.name, data.get('deviceId', 'unknown')):
+                    record = {
+                        'type': codec.name,
+                        'timestamp': received_ns,
+                        'device_id': data.get('deviceId', 'unknown'),
+                        'access_point': data.get('accessPoint', ''),
+                        'rssi': data.get('rssi', 0),
+                    }
+                    return self._record_unstored(record, data.get('macAddress', ''), data.get('txPower', 0))
+            STAGE_PROFILER.lap('classify')
+            
+            if codec is not None:
+                logger.info(f"process_telemetry: Processing as {codec.name} packet")
+                processed = codec.normalize(self, data, received_ns)
+                logger.info(f"process_telemetry: {codec.name} packet processed, device_id: {processed.get('device_id', 'unknown')}")
             else:
                 # Generic processing for unknown packet types
                 logger.info(f"process_telemetry: Unknown packet type '{packet_type}', using generic processing")
                 processed = {
                     'type': packet_type or 'unknown',
-                    'timestamp': datetime.now(timezone.utc).isoformat(),
+                    'timestamp': received_ns,
                     'raw_data': data,
                     'access_point': data.get('accessPoint', '')
                 }
                 logger.info(f"process_telemetry: Generic packet processed with type: {processed['type']}")
+                STAGE_PROFILER.lap('normalize')
+            
+            if codec is not None:
+                processed['ap_rssi'] = {processed.get('access_point', ''): processed.get('rssi', 0)}
+                if signature is not None:
+                    self.packet_dedup.remember(packet_type, data.get('deviceId', 'unknown'), signature, processed)
             
             # Store in memory (in production, use a proper database)
             logger.info("process_telemetry: Adding processed packet to telemetry_data")
+            # Ring buffer; evicts the oldest entry once full
             self.telemetry_data.append(processed)
-            
-            # Keep only last 1000 entries
-            if len(self.telemetry_data) > 1000:
-                logger.info("process_telemetry: Trimming telemetry_data to last 1000 entries")
-                self.telemetry_data = self.telemetry_data[-1000:]
+            self.subscriptions.publish(processed)
             
             # Update device registry
             device_id = processed.get('device_id')
@@ -475,139 +672,217 @@ class ArubaIoTTelemetryHandler:
                     'type': processed['type'],
                     'access_point': processed.get('access_point', '')
                 }
+                self.device_index.touch(device_id, self.device_registry[device_id])
                 logger.info(f"process_telemetry: Device registry updated, total devices: {len(self.device_registry)}")
             else:
                 logger.info("process_telemetry: No valid device_id found for device registry update")
             
+            STAGE_PROFILER.lap('store')
             logger.info(f"process_telemetry: Successfully processed {packet_type} packet from {device_id}")
             return processed
             
         except json.JSONDecodeError as e:
-            logger.error(f"process_telemetry: Failed to parse JSON: {e}")
-            
-            # Log the full raw data for debugging
-            logger.error(f"process_telemetry: Raw data length: {len(decoded_data)} characters")
-            
-            # For better visibility, log chunks of data
-            chunk_size = 1000
-            for i in range(0, len(decoded_data), chunk_size):
-                chunk = decoded_data[i:i+chunk_size]
-                logger.error(f"process_telemetry: Raw data chunk {i//chunk_size + 1}: {chunk}")
-            
-            # For binary/non-printable character detection, add hexdump-style logging
-            logger.error("process_telemetry: Hexdump of problematic area:")
-            
-            # Find the problematic area based on the error message
-            error_msg = str(e)
-            error_pos = None
-            import re
-            match = re.search(r'char (\d+)', error_msg)
-            if match:
-                error_pos = int(match.group(1))
-                
-            if error_pos is not None:
-                # Get data around the error position
-                start_pos = max(0, error_pos - 50)
-                end_pos = min(len(decoded_data), error_pos + 50)
-                error_context = decoded_data[start_pos:end_pos]
-                
-                # Log hexdump of the area
-                hex_lines = []
-                for i in range(0, len(error_context), 16):
-                    chunk = error_context[i:i+16]
-                    hex_values = ' '.join([f'{ord(c):02x}' for c in chunk])
-                    ascii_values = ''.join([c if 32 <= ord(c) < 127 else '.' for c in chunk])
-                    position = start_pos + i
-                    marker = ' <<<< ERROR POSITION' if start_pos + i <= error_pos < start_pos + i + 16 else ''
-                    hex_lines.append(f"{position:08x}: {hex_values.ljust(48)} | {ascii_values} {marker}")
-                
-                for line in hex_lines:
-                    logger.error(f"process_telemetry: {line}")
-            
+            JSON_PARSE_FAILURES.inc()
+            self._reject(e)
+            # Keep the frame for inspection (/api/quarantine) and log one short,
+            # rate-limited line instead of the whole frame
+            source = self._frame_source(session)
+            entry = self.quarantine.add(decoded_data, f"Invalid JSON: {e.msg}", e.pos, source, received_ns)
+            self.bad_frame_log.error(f"process_telemetry: Failed to parse JSON from {source or 'unknown'} "
+                                     f"({entry.size} characters): {e}; quarantined as frame {entry.id}, "
+                                     f"near {entry.context()!r}")
             return None
         except Exception as e:
+            self._reject(e)
             logger.error(f"process_telemetry: Error processing telemetry: {e}")
             logger.error(f"process_telemetry: Exception type: {type(e).__name__}")
-            import traceback
             logger.error(f"process_telemetry: Traceback: {traceback.format_exc()}")
             return None
 
-    def process_telemetry_protobuf(self, binary_data: bytes) -> Dict[str, Any]:
+    def _ingest_decoded(self, processed: Dict[str, Any], received_ns: int) -> Dict[str, Any]:
+        """Store a packet decoded from protobuf and update registry and analytics
+
+        Applies duplicate suppression and sampling policies first, exactly as
+        for JSON packets. The sender's timestamp is kept as 'packet_timestamp';
+        'timestamp' becomes the frame receive time, as for JSON packets.
+        """
+        processed['packet_timestamp'] = processed['timestamp']
+        processed['timestamp'] = received_ns
+        # Collapse copies of a packet already forwarded by another AP
+        signature = payload_signature(processed)
+        duplicate = None
+        if signature is not None:
+            duplicate = self.packet_dedup.lookup(processed['type'], processed.get('device_id', 'unknown'), signature)
+        if duplicate is not None:
+            return self._merge_duplicate(duplicate, processed.get('access_point', ''), processed.get('rssi', 0),
+                                         processed.get('mac_address', ''), processed.get('tx_power', 0), received_ns)
+        if not self.sampler.should_store(processed['type'], processed.get('device_id', 'unknown')):
+            return self._record_unstored(processed, processed.get('mac_address', ''), processed.get('tx_power', 0))
+        processed['ap_rssi'] = {processed.get('access_point', ''): processed.get('rssi', 0)}
+        if signature is not None:
+            self.packet_dedup.remember(processed['type'], processed.get('device_id', 'unknown'), signature, processed)
+        STAGE_PROFILER.lap('classify')
+        
+        # Add to telemetry data and device registry
+        self.telemetry_data.append(processed)
+        self.subscriptions.publish(processed)
+            
+        # Update device registry
+        device_id = processed.get('device_id')
+        if device_id and device_id != 'unknown':
+            self.device_registry[device_id] = {
+                'last_seen': processed['timestamp'],
+                'type': processed['type'],
+                'access_point': processed.get('access_point', '')
+            }
+            self.device_index.touch(device_id, self.device_registry[device_id])
+        STAGE_PROFILER.lap('store')
+            
+        # Update analytics if applicable
+        if processed.get('type') == 'ble':
+            self._update_ble_analytics(
+                processed.get('device_id', 'unknown'),
+                processed.get('access_point', ''),
+                processed.get('rssi', 0),
+                received_ns,
+                processed.get('mac_address', ''),
+                processed.get('tx_power', 0)
+            )
+            STAGE_PROFILER.lap('analytics')
+        
+        return processed
+
+    def process_telemetry_stream(self, binary_data: bytes, received_ns: Optional[int] = None) -> Dict[str, Any]:
+        """Process a length-delimited stream frame carrying many protobuf packets
+
+        Returns:
+            Summary record of the batch, or None if the frame is malformed
+        """
+        logger.info(f"process_telemetry_stream: Processing {len(binary_data)} byte packet stream")
+        
+        decode_start = time.perf_counter()
+        try:
+            packets = decode_packet_stream(binary_data)
+        except Exception as e:
+            logger.error(f"process_telemetry_stream: Failed to decode packet stream: {e}")
+            self._reject(e)
+            return None
+        PROTOBUF_DECODE_SECONDS.observe(time.perf_counter() - decode_start)
+        STAGE_PROFILER.lap('decode')
+        
+        if received_ns is None:
+            received_ns = now_ns()
+        type_counts: Dict[str, int] = {}
+        for processed in packets:
+            self._ingest_decoded(processed, received_ns)
+            type_counts[processed['type']] = type_counts.get(processed['type'], 0) + 1
+        
+        logger.info(f"process_telemetry_stream: Processed {len(packets)} packets: {type_counts}")
+        return {
+            'type': 'batch',
+            'timestamp': received_ns,
+            'packet_count': len(packets),
+            'packet_types': type_counts,
+            'encoded_with_protobuf': True
+        }
+
+    def process_telemetry_protobuf(self, binary_data: bytes, received_ns: Optional[int] = None) -> Dict[str, Any]:
         """Process telemetry data that was received in protobuf format"""
         logger.info("process_telemetry_protobuf: Processing protobuf telemetry data")
         
         try:
-            # Try to detect packet type from first few bytes
-            # This is a simplified approach - in practice, you might need a more robust method
-            # to identify the protobuf message type
-            
-            # First try to decode as iBeacon protobuf
-            try:
-                from protobuf_utils import decode_ibeacon_packet
-                processed = decode_ibeacon_packet(binary_data)
-                logger.info("process_telemetry_protobuf: Successfully decoded as iBeacon protobuf")
-            except Exception as ibeacon_error:
-                # If iBeacon fails, try WiFi
+            # A bare protobuf frame carries no type marker: try each registered
+            # codec in registration order (BLE, WiFi, EnOcean, then plugins)
+            decode_start = time.perf_counter()
+            errors = []
+            for codec in registered_codecs():
+                if codec.decode is None:
+                    continue
                 try:
-                    from protobuf_utils import decode_wifi_packet
-                    processed = decode_wifi_packet(binary_data)
-                    logger.info("process_telemetry_protobuf: Successfully decoded as WiFi protobuf")
-                except Exception as wifi_error:
-                    # If WiFi fails, try EnOcean
-                    try:
-                        from protobuf_utils import decode_enocean_packet
-                        processed = decode_enocean_packet(binary_data)
-                        logger.info("process_telemetry_protobuf: Successfully decoded as EnOcean protobuf")
-                    except Exception as enocean_error:
-                        # If all decoders fail, raise the initial error
-                        logger.error(f"process_telemetry_protobuf: Failed to decode protobuf with any decoder")
-                        logger.error(f"iBeacon error: {ibeacon_error}")
-                        logger.error(f"WiFi error: {wifi_error}")
-                        logger.error(f"EnOcean error: {enocean_error}")
-                        raise ibeacon_error
-            
-            # Add to telemetry data and device registry
-            self.telemetry_data.append(processed)
+                    processed = codec.decode(binary_data)
+                    logger.info(f"process_telemetry_protobuf: Successfully decoded as {codec.name} protobuf")
+                    break
+                except Exception as decode_error:
+                    errors.append((codec.name, decode_error))
+            else:
+                # If all decoders fail, raise the first error
+                logger.error(f"process_telemetry_protobuf: Failed to decode protobuf with any decoder")
+                for name, decode_error in errors:
+                    logger.error(f"{name} error: {decode_error}")
+                if errors:
+                    raise errors[0][1]
+                raise ValueError("No protobuf codecs registered")
+            PROTOBUF_DECODE_SECONDS.observe(time.perf_counter() - decode_start)
+            STAGE_PROFILER.lap('decode')
             
-            # Keep only last 1000 entries
-            if len(self.telemetry_data) > 1000:
-                self.telemetry_data = self.telemetry_data[-1000:]
-                
-            # Update device registry
+            processed = self._ingest_decoded(processed, received_ns if received_ns is not None else now_ns())
             device_id = processed.get('device_id')
-            if device_id and device_id != 'unknown':
-                self.device_registry[device_id] = {
-                    'last_seen': processed['timestamp'],
-                    'type': processed['type'],
-                    'access_point': processed.get('access_point', '')
-                }
-                
-            # Update analytics if applicable
-            if processed.get('type') == 'ble':
-                self._update_ble_analytics(
-                    processed.get('device_id', 'unknown'),
-                    processed.get('access_point', ''),
-                    processed.get('rssi', 0),
-                    processed.get('timestamp', datetime.now(timezone.utc).isoformat()),
-                    processed.get('mac_address', '')
-                )
-                
+            
             logger.info(f"process_telemetry_protobuf: Successfully processed protobuf data for device {device_id}")
             return processed
             
         except Exception as e:
             logger.error(f"process_telemetry_protobuf: Failed to process protobuf data: {e}")
-            # Fall back to normal telemetry processing if protobuf decoding fails
-            # First convert bytes to string if needed
-            try:
-                decoded_data = binary_data.decode('utf-8')
-                return self.process_telemetry(decoded_data)
-            except:
-                logger.error("process_telemetry_protobuf: Could not fall back to standard processing")
-                return None
-
-    def _update_ble_analytics(self, device_id: str, access_point: str, rssi: int, timestamp: str, mac_address: str):
-        """Update BLE analytics data"""
+            self._reject(e)
+            # The caller falls back to standard processing with the frame's
+            # session and quarantines and counts the frame if that fails too
+            return None
+
+    def _merge_duplicate(self, record: Dict[str, Any], access_point: str, rssi: int,
+                         mac_address: str, tx_power: int = 0, received_ns: Optional[int] = None) -> Dict[str, Any]:
+        """Fold a duplicate packet heard by another AP into the stored record
+
+        The record is not stored again; only its per-AP RSSI vector and the
+        BLE proximity analytics for the additional AP are updated.
+        """
+        logger.info(f"_merge_duplicate: Duplicate {record['type']} packet from {record.get('device_id', 'unknown')} "
+                    f"heard by AP {access_point}, merging")
+        if access_point not in record['ap_rssi']:
+            self.telemetry_data.add_to_index(record, 'access_point', access_point)
+        record['ap_rssi'][access_point] = rssi
+        record['duplicate_count'] = record.get('duplicate_count', 0) + 1
+        
+        if record['type'] == 'ble':
+            self._update_ble_analytics(record.get('device_id', 'unknown'), access_point, rssi,
+                                       received_ns if received_ns is not None else now_ns(), mac_address, tx_power)
+        return record
+    
+    def _record_unstored(self, record: Dict[str, Any], mac_address: str, tx_power: int = 0) -> Dict[str, Any]:
+        """Account for a packet that the sampler decided not to store
+
+        The device registry and BLE analytics are still updated so that
+        last-seen times and proximity data stay current.
+        """
+        device_id = record.get('device_id', 'unknown')
+        logger.info(f"_record_unstored: Sampling policy skipped storage for {record['type']} packet from {device_id}")
+        record['stored'] = False
+        
+        if device_id != 'unknown':
+            self.device_registry[device_id] = {
+                'last_seen': record['timestamp'],
+                'type': record['type'],
+                'access_point': record.get('access_point', '')
+            }
+            self.device_index.touch(device_id, self.device_registry[device_id])
+        
+        if record['type'] == 'ble':
+            self._update_ble_analytics(device_id, record.get('access_point', ''), record.get('rssi', 0),
+                                       record['timestamp'], mac_address, tx_power)
+        return record
+    
+    def _update_ble_analytics(self, device_id: str, access_point: str, rssi: int, timestamp: int,
+                              mac_address: str, tx_power: int = 0) -> Dict[str, Any]:
+        """Update BLE analytics data
+
+        RSSI is smoothed by the configured filter stage (see ``rssi_filters``)
+        per AP, per device and per (device, AP) pair; the filtered values feed
+        ``avg_rssi``, ``primary_reporter`` and the distance estimate.
+        ``timestamp`` is the receive time in epoch nanoseconds.
+
+        Returns:
+            The proximity map entry for this device/AP pair
+        """
+        analytics_start = time.perf_counter()
         logger.info(f"_update_ble_analytics: Updating analytics for device {device_id} from AP {access_point}")
         
         # Update reporter (AP) statistics
@@ -616,8 +891,8 @@ class ArubaIoTTelemetryHandler:
             self.ble_analytics['reporter_stats'][access_point] = {
                 'devices_seen': set(),
                 'total_packets': 0,
-                'avg_rssi': 0,
-                'rssi_readings': [],
+                'avg_rssi': rssi,
+                'rssi_filter': self.rssi_filter_factory(),
                 'first_seen': timestamp,
                 'last_seen': timestamp
             }
@@ -632,20 +907,15 @@ class ArubaIoTTelemetryHandler:
             logger.info(f"_update_ble_analytics: AP {access_point} detected a new device (total: {len(ap_stats['devices_seen'])})")
         
         ap_stats['total_packets'] += 1
-        ap_stats['rssi_readings'].append(rssi)
-        ap_stats['avg_rssi'] = sum(ap_stats['rssi_readings']) / len(ap_stats['rssi_readings'])
+        ap_stats['avg_rssi'] = ap_stats['rssi_filter'].update(rssi)
         ap_stats['last_seen'] = timestamp
+        self.reporter_index.touch(access_point)
         
         logger.info(f"_update_ble_analytics: AP {access_point} stats updated - "
                    f"packets: {ap_stats['total_packets']}, "
                    f"devices: {len(ap_stats['devices_seen'])}, "
                    f"avg RSSI: {ap_stats['avg_rssi']:.2f}")
         
-        # Keep only last 100 RSSI readings per AP
-        if len(ap_stats['rssi_readings']) > 100:
-            logger.info(f"_update_ble_analytics: Trimming RSSI history for AP {access_point}")
-            ap_stats['rssi_readings'] = ap_stats['rssi_readings'][-100:]
-        
         # Update device (reported) statistics
         if device_id not in self.ble_analytics['device_stats']:
             logger.info(f"_update_ble_analytics: First time seeing device {device_id}, initializing stats")
@@ -655,7 +925,7 @@ class ArubaIoTTelemetryHandler:
                 'best_rssi': rssi,
                 'worst_rssi': rssi,
                 'avg_rssi': rssi,
-                'rssi_readings': [],
+                'rssi_filter': self.rssi_filter_factory(),
                 'mac_address': mac_address,
                 'first_seen': timestamp,
                 'last_seen': timestamp,
@@ -672,7 +942,6 @@ class ArubaIoTTelemetryHandler:
             logger.info(f"_update_ble_analytics: Device {device_id} detected by a new AP (total: {len(device_stats['reporters'])})")
         
         device_stats['total_packets'] += 1
-        device_stats['rssi_readings'].append(rssi)
         
         # Update RSSI statistics
         old_best_rssi = device_stats['best_rssi']
@@ -685,72 +954,57 @@ class ArubaIoTTelemetryHandler:
         if device_stats['worst_rssi'] < old_worst_rssi:
             logger.info(f"_update_ble_analytics: New worst RSSI for device {device_id}: {device_stats['worst_rssi']}")
         
-        device_stats['avg_rssi'] = sum(device_stats['rssi_readings']) / len(device_stats['rssi_readings'])
+        device_stats['avg_rssi'] = device_stats['rssi_filter'].update(rssi)
         device_stats['last_seen'] = timestamp
+        self.ble_device_index.touch(device_id, device_stats)
         
         logger.info(f"_update_ble_analytics: Device {device_id} stats updated - "
                    f"packets: {device_stats['total_packets']}, "
                    f"APs: {len(device_stats['reporters'])}, "
                    f"avg RSSI: {device_stats['avg_rssi']:.2f}")
         
-        # Update primary reporter (AP with best average signal)
-        old_primary = device_stats['primary_reporter']
-        if len(device_stats['rssi_readings']) > 5:  # Only after some readings
-            # Find AP with best average RSSI for this device
-            best_ap = access_point
-            best_avg = rssi
-            logger.info(f"_update_ble_analytics: Evaluating primary reporter for device {device_id}")
-            
-            for ap in device_stats['reporters']:
-                if ap in self.ble_analytics['proximity_map'].get(device_id, {}):
-                    ap_avg = self.ble_analytics['proximity_map'][device_id][ap]['avg_rssi']
-                    logger.info(f"_update_ble_analytics: AP {ap} has avg RSSI of {ap_avg:.2f} for device {device_id}")
-                    if ap_avg > best_avg:
-                        best_avg = ap_avg
-                        best_ap = ap
-                        logger.info(f"_update_ble_analytics: AP {ap} is now best candidate with RSSI {best_avg:.2f}")
-            
-            device_stats['primary_reporter'] = best_ap
-            if old_primary != best_ap:
-                logger.info(f"_update_ble_analytics: Primary reporter for device {device_id} changed from {old_primary} to {best_ap}")
-        
-        # Keep only last 100 RSSI readings per device
-        if len(device_stats['rssi_readings']) > 100:
-            logger.info(f"_update_ble_analytics: Trimming RSSI history for device {device_id}")
-            device_stats['rssi_readings'] = device_stats['rssi_readings'][-100:]
-        
         # Update proximity mapping
         if device_id not in self.ble_analytics['proximity_map']:
             logger.info(f"_update_ble_analytics: Initializing proximity map for device {device_id}")
             self.ble_analytics['proximity_map'][device_id] = {}
         
-        if access_point not in self.ble_analytics['proximity_map'][device_id]:
+        device_proximity = self.ble_analytics['proximity_map'][device_id]
+        if access_point not in device_proximity:
             logger.info(f"_update_ble_analytics: First proximity data for device {device_id} with AP {access_point}")
-            self.ble_analytics['proximity_map'][device_id][access_point] = {
-                'rssi_readings': [],
+            device_proximity[access_point] = {
+                'rssi_filter': self.rssi_filter_factory(),
                 'avg_rssi': rssi,
+                'distance': None,
                 'packet_count': 0,
                 'first_seen': timestamp,
                 'last_seen': timestamp
             }
         
-        proximity_data = self.ble_analytics['proximity_map'][device_id][access_point]
-        proximity_data['rssi_readings'].append(rssi)
+        proximity_data = device_proximity[access_point]
         old_avg = proximity_data['avg_rssi']
-        proximity_data['avg_rssi'] = sum(proximity_data['rssi_readings']) / len(proximity_data['rssi_readings'])
+        proximity_data['avg_rssi'] = proximity_data['rssi_filter'].update(rssi)
+        proximity_data['distance'] = estimate_distance(proximity_data['avg_rssi'], tx_power)
         proximity_data['packet_count'] += 1
         proximity_data['last_seen'] = timestamp
         
         logger.info(f"_update_ble_analytics: Proximity data updated for device {device_id} with AP {access_point} - "
                   f"avg RSSI: {proximity_data['avg_rssi']:.2f} (was {old_avg:.2f}), "
+                  f"distance: {proximity_data['distance']:.2f} m, "
                   f"packets: {proximity_data['packet_count']}")
         
-        # Keep only last 50 RSSI readings per device-AP pair
-        if len(proximity_data['rssi_readings']) > 50:
-            logger.info(f"_update_ble_analytics: Trimming proximity RSSI history for device {device_id} with AP {access_point}")
-            proximity_data['rssi_readings'] = proximity_data['rssi_readings'][-50:]
+        # Update primary reporter (AP with best filtered signal)
+        old_primary = device_stats['primary_reporter']
+        if device_stats['total_packets'] > 5:  # Only after some readings
+            logger.info(f"_update_ble_analytics: Evaluating primary reporter for device {device_id}")
+            best_ap = max(device_proximity, key=lambda ap: device_proximity[ap]['avg_rssi'])
+            device_stats['primary_reporter'] = best_ap
+            if old_primary != best_ap:
+                logger.info(f"_update_ble_analytics: Primary reporter for device {device_id} changed from {old_primary} to {best_ap} "
+                            f"(filtered RSSI {device_proximity[best_ap]['avg_rssi']:.2f})")
         
         logger.info(f"_update_ble_analytics: Analytics update complete for device {device_id}")
+        BLE_ANALYTICS_SECONDS.observe(time.perf_counter() - analytics_start)
+        return proximity_data
     
     def _hex_dump(self, data, start_offset=0, highlight_pos=None):
         """Generate a hex dump of binary or string data for debugging
@@ -781,122 +1035,71 @@ class ArubaIoTTelemetryHandler:
         
         return hex_lines
 
-    def _sanitize_json_string(self, data):
-        """Attempt to sanitize a problematic JSON string
-        
-        Args:
-            data: The JSON string to sanitize
-            
-        Returns:
-            Sanitized JSON string
-        """
-        logger.info("process_telemetry: Attempting to sanitize problematic JSON")
-        
-        # Remove any leading/trailing whitespace
-        data = data.strip()
-        
-        # Fix common issues:
-        
-        # 1. Remove any BOM characters
-        if data.startswith('\ufeff'):
-            data = data[1:]
-            logger.info("process_telemetry: Removed BOM character")
-            
-        # 2. Fix unescaped newlines in strings
-        import re
-        # This regex finds strings with unescaped newlines and fixes them
-        # It's not perfect but helps with common cases
-        pattern = r'("(?:[^"\\]|\\.)*?)(\n)([^"]*?")'
-        if re.search(pattern, data):
-            data = re.sub(pattern, r'\1\\n\3', data)
-            logger.info("process_telemetry: Fixed unescaped newlines in strings")
-            
-        # 3. Fix missing quotes around keys
-        # This is a simplified approach - not a complete solution
-        unquoted_key_pattern = r'{\s*(\w+)\s*:'
-        if re.search(unquoted_key_pattern, data):
-            data = re.sub(unquoted_key_pattern, r'{"\1":', data)
-            logger.info("process_telemetry: Fixed unquoted keys")
-            
-        # 4. Try to fix trailing commas
-        data = data.replace(',}', '}').replace(',]', ']')
-        
-        # 5. Replace control characters with their escaped versions
-        for i in range(32):
-            if i not in (9, 10, 13):  # Tab, LF, CR
-                data = data.replace(chr(i), f'\\u{i:04x}')
-                
-        return data
+# The built-in protocols normalize through handler methods (they feed the
+# handler's analytics); codecs registered elsewhere bring their own normalizer
+set_normalizer('ble', ArubaIoTTelemetryHandler.process_ble_packet)
+set_normalizer('wifi', ArubaIoTTelemetryHandler.process_wifi_packet)
+set_normalizer('enocean', ArubaIoTTelemetryHandler.process_enocean_packet)
 
 # Initialize telemetry handler
 telemetry_handler = ArubaIoTTelemetryHandler()
 
+# Handler state sampled at scrape time
+REGISTRY.gauge('aruba_telemetry_buffer_records', 'Records held in the telemetry buffer').set_function(
+    lambda: len(telemetry_handler.telemetry_data))
+REGISTRY.gauge('aruba_devices', 'Devices in the device registry').set_function(
+    lambda: len(telemetry_handler.device_registry))
+REGISTRY.gauge('aruba_duplicates_suppressed', 'Cross-AP duplicate packets merged since start').set_function(
+    lambda: telemetry_handler.packet_dedup.suppressed_count)
+REGISTRY.gauge('aruba_samples_not_stored', 'Packets not stored due to sampling policies since start').set_function(
+    lambda: telemetry_handler.sampler.dropped_count)
+REGISTRY.gauge('aruba_quarantined_frames', 'Rejected frames held in the quarantine buffer').set_function(
+    lambda: len(telemetry_handler.quarantine))
+REGISTRY.gauge('aruba_bad_frame_logs_suppressed', 'Bad-frame log lines suppressed by rate limiting in the current interval').set_function(
+    lambda: telemetry_handler.bad_frame_log.suppressed)
+REGISTRY.gauge('aruba_dead_letter_bytes', 'Size of the on-disk dead-letter store').set_function(
+    lambda: telemetry_handler.dead_letters.stats()['bytes'] if telemetry_handler.dead_letters is not None else 0)
+REGISTRY.gauge('aruba_dead_letters_dropped', 'Rejected frames dropped because the dead-letter writer queue was full').set_function(
+    lambda: telemetry_handler.dead_letters.dropped if telemetry_handler.dead_letters is not None else 0)
+REGISTRY.gauge('aruba_web_clients', 'Connected dashboard SocketIO clients').set_function(
+    lambda: len(telemetry_handler.connected_clients))
+REGISTRY.gauge('aruba_subscription_rooms', 'SocketIO telemetry subscription rooms with members').set_function(
+    lambda: telemetry_handler.subscriptions.room_count)
+REGISTRY.gauge('aruba_subscription_records_routed', 'Records queued for subscription rooms since start').set_function(
+    lambda: telemetry_handler.subscriptions.routed_count)
+
 # WebSocket server for receiving data from Aruba APs
 async def aruba_websocket_server(websocket, path):
     """WebSocket server to receive data from Aruba access points with authentication"""
     client_address = websocket.remote_address
     logger.info(f"New connection attempt from {client_address[0]}:{client_address[1]} on path: {path}")
     
-    # Authentication: Check for token in query parameters or headers
-    # Note: '1234' is a temporary token for development/testing purposes only
-    valid_tokens = os.getenv('ARUBA_AUTH_TOKENS', '1234,admin,aruba-iot').split(',')
-    
-    # Default clientID/accessToken for temporary testing purposes
-    valid_client_ids = os.getenv('ARUBA_CLIENT_IDS', 'test-client-1,aruba-ap').split(',')
-    valid_access_tokens = os.getenv('ARUBA_ACCESS_TOKENS', '1234,admin-token').split(',')
-    
-    token = None
-    client_id = None
-    access_token = None
-    
-    # Try to get authentication info from query parameters first
-    if '?' in path:
-        from urllib.parse import parse_qs, urlparse
-        parsed_url = urlparse(path)
-        query_params = parse_qs(parsed_url.query)
-        token = query_params.get('token', [None])[0]
-        client_id = query_params.get('clientID', [None])[0]
-        access_token = query_params.get('accessToken', [None])[0]
-    
-    # If no token in query, check WebSocket headers
-    if not token and not access_token:
-        auth_header = websocket.request_headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header[7:]  # Remove 'Bearer ' prefix
-        else:
-            # Check for custom token header
-            token = websocket.request_headers.get('X-Auth-Token')
-            # Also check for client ID and access token headers
-            client_id = websocket.request_headers.get('X-Client-ID')
-            access_token = websocket.request_headers.get('X-Access-Token')
-    
-    # Validate token (supporting multiple auth methods)
-    is_authenticated = False
-    
-    # Method 1: Simple token
-    if token and token in valid_tokens:
-        is_authenticated = True
-        logger.info(f"Client authenticated using token")
-    
-    # Method 2: ClientID + AccessToken pair
-    if client_id and access_token:
-        if client_id in valid_client_ids and access_token in valid_access_tokens:
-            is_authenticated = True
-            logger.info(f"Client authenticated using clientID/accessToken: {client_id}")
-    
-    if not is_authenticated:
+    # Authenticate once against the preloaded credentials; connection-invariant
+    # state lives on the session for the rest of the connection
+    session = ConnectionSession.open(websocket, path)
+    if session is None:
         logger.warning(f"Authentication failed for {client_address[0]} - Invalid or missing token")
+        WS_CONNECTIONS_TOTAL.labels('rejected').inc()
         await websocket.close(code=1008, reason="Authentication required")
         return
     
+    if session.client_id:
+        logger.info(f"Client authenticated using clientID/accessToken: {session.client_id}")
+    else:
+        logger.info(f"Client authenticated using token")
     logger.info(f"✅ Authenticated Aruba AP connection from {client_address[0]}:{client_address[1]}")
+    WS_CONNECTIONS_TOTAL.labels('accepted').inc()
+    if session.replay:
+        logger.warning(f"Dead-letter replay session from {client_address[0]}:{client_address[1]} "
+                       f"(AP {session.access_point or 'unknown'}): failing frames are not dead-lettered")
+        REPLAY_SESSIONS.inc()
     
     # Send welcome message to confirm connection
     try:
         await websocket.send(json.dumps({
             "status": "authenticated",
             "message": "Aruba IoT Telemetry Server Ready - Authentication Successful",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": format_timestamp(session.now_ns()),
             "server_version": "1.0",
             "client_ip": client_address[0]
         }))
@@ -905,26 +1108,39 @@ async def aruba_websocket_server(websocket, path):
         logger.error(f"Failed to send welcome message: {e}")
         return
     
+    WS_CONNECTIONS.inc()
     try:
         async for message in websocket:
-            try:
-                # Log received message format info
-                if isinstance(message, bytes):
-                    logger.info(f"Received binary message from {client_address[0]} ({len(message)} bytes)")
-                    
-                    # Show first 16 bytes as hex for debugging
-                    preview = ' '.join([f'{b:02x}' for b in message[:16]])
-                    logger.info(f"Binary data preview: {preview}...")
-                else:
-                    msg_preview = message[:200] + "..." if len(message) > 200 else message
-                    logger.info(f"Received text message from {client_address[0]}: {msg_preview}")
-            except Exception as e:
-                logger.info(f"Received message from {client_address[0]} (error previewing: {e})")
+            session.frames += 1
+            # Frame previews are only built when INFO logging was on at connect time
+            if session.log_frames:
+                try:
+                    # Log received message format info
+                    if isinstance(message, bytes):
+                        logger.info(f"Received binary message from {session.client_ip} ({len(message)} bytes)")
+                        
+                        # Show first 16 bytes as hex for debugging
+                        preview = ' '.join([f'{b:02x}' for b in message[:16]])
+                        logger.info(f"Binary data preview: {preview}...")
+                    else:
+                        msg_preview = message[:200] + "..." if len(message) > 200 else message
+                        logger.info(f"Received text message from {session.client_ip}: {msg_preview}")
+                except Exception as e:
+                    logger.info(f"Received message from {session.client_ip} (error previewing: {e})")
             
             # Process the telemetry data (handles both bytes and string)
-            processed_data = telemetry_handler.process_telemetry(message)
+            ingest_start = time.perf_counter()
+            STAGE_PROFILER.begin()
+            processed_data = telemetry_handler.process_telemetry(message, session)
+            INGEST_SECONDS.labels('binary' if isinstance(message, bytes) else 'text').observe(
+                time.perf_counter() - ingest_start)
             
             if processed_data:
+                if processed_data['type'] == 'batch':
+                    for packet_type, count in processed_data['packet_types'].items():
+                        PACKETS_TOTAL.labels(packet_type).inc(count)
+                else:
+                    PACKETS_TOTAL.labels(processed_data['type']).inc()
                 # Store the data for the web interface
                 logger.info(f"Successfully processed {processed_data['type']} packet from {processed_data.get('device_id', 'unknown')}")
                 
@@ -936,26 +1152,30 @@ async def aruba_websocket_server(websocket, path):
                     ack_response = json.dumps({
                         "status": "received",
                         "packet_type": processed_data['type'],
-                        "timestamp": datetime.now().isoformat(),
-                        "protobuf_encoded": was_protobuf
+                        "timestamp": format_timestamp(session.now_ns()),
+                        "protobuf_encoded": was_protobuf,
+                        "packet_count": processed_data.get('packet_count', 1)
                     })
                     await websocket.send(ack_response)
+                    STAGE_PROFILER.lap('ack')
                     logger.info(f"Sent acknowledgment for {processed_data['type']} packet")
                 except Exception as e:
                     logger.error(f"Failed to send acknowledgment: {e}")
             else:
                 logger.warning(f"Failed to process message from {client_address}")
+                FRAME_FAILURES.inc()
                 
                 # Send error acknowledgment
                 try:
                     ack_response = json.dumps({
                         "status": "error",
                         "message": "Failed to process telemetry data",
-                        "timestamp": datetime.now().isoformat()
+                        "timestamp": format_timestamp(session.now_ns())
                     })
                     await websocket.send(ack_response)
                 except Exception as e:
                     logger.error(f"Failed to send error acknowledgment: {e}")
+            STAGE_PROFILER.end()
             
     except websockets.exceptions.ConnectionClosed:
         logger.info(f"Aruba AP {client_address[0]} disconnected")
@@ -963,6 +1183,103 @@ async def aruba_websocket_server(websocket, path):
         logger.info(f"Aruba AP {client_address[0]} connection closed unexpectedly")
     except Exception as e:
         logger.error(f"Error in WebSocket connection {client_address}: {e}", exc_info=True)
+    finally:
+        WS_CONNECTIONS.dec()
+
+# JSON API responses
+RESPONSE_CACHE = ResponseCache(max_entries=int(os.getenv('API_CACHE_ENTRIES', 256)))
+# Distinguishes ETags issued by different server processes
+_ETAG_PREFIX = f"{os.getpid():x}.{now_ns():x}"
+
+def _not_modified(version: int) -> Optional[Response]:
+    """Return a 304 response if the client already has this data version"""
+    etag = f"{_ETAG_PREFIX}.{version}"
+    if request.if_none_match.contains_weak(etag):
+        API_RESPONSES_TOTAL.labels('not_modified').inc()
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    return None
+
+def _built(result):
+    """Split a build result into (payload, headers), like a Flask view's (body, headers) tuple"""
+    if isinstance(result, tuple):
+        return result
+    return result, None
+
+def _body_response(entry, version: int) -> Response:
+    """Build a response for a serialized body, compressed as the client accepts"""
+    body, encoding = entry.encoded(negotiate_encoding(request.headers.get('Accept-Encoding')))
+    response = Response(body, mimetype=JSON_MIMETYPE, headers=entry.headers)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_etag(f"{_ETAG_PREFIX}.{version}", weak=True)
+    return response
+
+def cached_json(build) -> Response:
+    """
+    Serve a JSON payload, reusing the serialized bytes until the data changes
+
+    Args:
+        build: Returns the payload, or (payload, extra headers); only called
+            when no response for this request and data version is cached
+    """
+    version = telemetry_handler.data_version
+    not_modified = _not_modified(version)
+    if not_modified is not None:
+        return not_modified
+    key = request.full_path
+    entry = RESPONSE_CACHE.get(key, version)
+    if entry is None:
+        payload, headers = _built(build())
+        entry = RESPONSE_CACHE.put(key, dumps(payload), version, headers)
+        API_RESPONSES_TOTAL.labels('built').inc()
+    else:
+        API_RESPONSES_TOTAL.labels('cache').inc()
+    return _body_response(entry, version)
+
+def cached_json_object(build, view) -> Response:
+    """
+    Serve a keyed collection as a JSON object, streamed when it is large
+
+    Collections above API_STREAM_THRESHOLD entries are sent as chunked JSON,
+    serialized in batches while the response is written; the complete body
+    is cached once the stream finishes.
+
+    Args:
+        build: Returns the (key, stored value) pairs, or (pairs, extra
+            headers); only called on a cache miss
+        view: Converts a (key, stored value) pair to its API representation
+    """
+    version = telemetry_handler.data_version
+    not_modified = _not_modified(version)
+    if not_modified is not None:
+        return not_modified
+    key = request.full_path
+    entry = RESPONSE_CACHE.get(key, version)
+    if entry is not None:
+        API_RESPONSES_TOTAL.labels('cache').inc()
+        return _body_response(entry, version)
+    
+    # Snapshot the keys/values; ingest keeps updating the dicts while we serialize
+    items, headers = _built(build())
+    snapshot = list(items)
+    if len(snapshot) <= STREAM_THRESHOLD:
+        entry = RESPONSE_CACHE.put(key, b''.join(stream_json_object(snapshot, view)), version, headers)
+        API_RESPONSES_TOTAL.labels('built').inc()
+        return _body_response(entry, version)
+    
+    API_RESPONSES_TOTAL.labels('streamed').inc()
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    chunks = stream_response(stream_json_object(snapshot, view), encoding,
+                             lambda body: RESPONSE_CACHE.put(key, body, version, headers))
+    response = Response(chunks, mimetype=JSON_MIMETYPE, headers=headers)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_etag(f"{_ETAG_PREFIX}.{version}", weak=True)
+    return response
 
 # Flask routes
 @app.route('/')
@@ -970,87 +1287,282 @@ def dashboard():
     """Main dashboard page"""
     return render_template('dashboard.html')
 
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus text exposition of ingest metrics"""
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/debug/profile')
+def debug_profile():
+    """Sample the ingest thread and return collapsed stacks (flamegraph input)"""
+    if not profiling_enabled():
+        return {'error': 'Profiling is disabled, set ENABLE_PROFILING=true'}, 404
+    
+    seconds = request.args.get('seconds', 10, type=float)
+    hz = request.args.get('hz', 200, type=int)
+    thread = request.args.get('thread', 'ingest')
+    
+    thread_id = None
+    if thread != 'all':
+        thread_id = ingest_thread_id()
+        if thread_id is None:
+            return {'error': 'Aruba WebSocket ingest thread is not running'}, 503
+    
+    logger.info(f"debug_profile: Sampling {thread} thread(s) for {seconds}s at {hz} Hz")
+    return Response(sample_stacks(seconds, 1.0 / max(hz, 1), thread_id), mimetype='text/plain')
+
+@app.route('/debug/stages')
+def debug_stages():
+    """Per-stage timing breakdown; ?enable=true|false toggles collection"""
+    if not profiling_enabled():
+        return {'error': 'Profiling is disabled, set ENABLE_PROFILING=true'}, 404
+    
+    enable = request.args.get('enable')
+    if enable is not None:
+        STAGE_PROFILER.enabled = enable.lower() == 'true'
+        logger.info(f"debug_stages: Stage timing {'enabled' if STAGE_PROFILER.enabled else 'disabled'}")
+    
+    return {
+        'enabled': STAGE_PROFILER.enabled,
+        'stages': STAGE_PROFILER.breakdown()
+    }
+
+def _parse_query(default_limit: Optional[int] = None):
+    """Parse paging/filter/projection arguments; returns (query, None) or (None, error response)"""
+    try:
+        return Query.from_args(request.args, default_limit), None
+    except ValueError as e:
+        return None, ({'error': str(e)}, 400)
+
 @app.route('/api/devices')
 def get_devices():
-    """API endpoint to get device registry"""
-    return telemetry_handler.device_registry
+    """API endpoint to get device registry
+
+    Supports limit/cursor paging, type, ap and seen_since filters and fields projection.
+    """
+    query, error = _parse_query()
+    if error:
+        return error
+    
+    def matches(device_id, entry):
+        return ((query.types is None or entry.get('type') in query.types) and
+                (query.aps is None or entry.get('access_point') in query.aps))
+    
+    filters = {'type': query.types, 'access_point': query.aps}
+    return cached_json_object(
+        lambda: telemetry_handler.device_index.page(telemetry_handler.device_registry, query, matches,
+                                                    filters=filters),
+        lambda device_id, entry: api_view(query.project(entry)))
 
 @app.route('/api/telemetry')
 def get_telemetry():
-    """API endpoint to get recent telemetry data"""
-    limit = request.args.get('limit', 100, type=int)
-    return telemetry_handler.telemetry_data[-limit:]
+    """API endpoint to get recent telemetry data
+
+    Supports limit, cursor (older page) and since (incremental) paging,
+    type, ap, seen_since and RSSI filters, and fields projection.
+    """
+    query, error = _parse_query(default_limit=100)
+    if error:
+        return error
+    
+    return _telemetry_page(query)
+
+def _telemetry_page(query: Query) -> Response:
+    """Serve a page of telemetry records selected by a query"""
+    def build():
+        records, headers = telemetry_handler.telemetry_data.query(query)
+        return [api_view(query.project(record)) for record in records], headers
+    
+    return cached_json(build)
+
+@app.route('/api/devices/<device_id>/telemetry')
+def get_device_telemetry(device_id):
+    """API endpoint to get the recent telemetry of one device
+
+    Served from the per-device index; accepts the /api/telemetry parameters.
+    """
+    if device_id not in telemetry_handler.device_registry:
+        return {'error': f"Unknown device '{device_id}'"}, 404
+    query, error = _parse_query(default_limit=100)
+    if error:
+        return error
+    query.devices = frozenset((device_id,))
+    return _telemetry_page(query)
+
+@app.route('/api/aps/<ap_name>/telemetry')
+def get_ap_telemetry(ap_name):
+    """API endpoint to get the recent telemetry heard by one access point
+
+    Served from the per-AP index (including duplicates merged from this AP);
+    accepts the /api/telemetry parameters.
+    """
+    query, error = _parse_query(default_limit=100)
+    if error:
+        return error
+    query.aps = frozenset((ap_name,))
+    return _telemetry_page(query)
 
 @app.route('/api/stats')
 def get_stats():
     """API endpoint to get statistics"""
-    total_packets = len(telemetry_handler.telemetry_data)
-    ble_count = sum(1 for data in telemetry_handler.telemetry_data if data.get('type') == 'ble')
-    wifi_count = sum(1 for data in telemetry_handler.telemetry_data if data.get('type') == 'wifi')
-    enocean_count = sum(1 for data in telemetry_handler.telemetry_data if data.get('type') == 'enocean')
+    return _collect_stats()
+
+def _collect_stats() -> Dict[str, Any]:
+    """Packet and device counts (O(packet types))"""
+    type_counts = telemetry_handler.telemetry_data.count_by('type')
     
     return {
-        'total_packets': total_packets,
-        'ble_packets': ble_count,
-        'wifi_packets': wifi_count,
-        'enocean_packets': enocean_count,
+        'total_packets': len(telemetry_handler.telemetry_data),
+        'ble_packets': type_counts.get('ble', 0),
+        'wifi_packets': type_counts.get('wifi', 0),
+        'enocean_packets': type_counts.get('enocean', 0),
         'total_devices': len(telemetry_handler.device_registry),
         'connected_clients': len(telemetry_handler.connected_clients)
     }
 
+@app.route('/api/quarantine', methods=['GET', 'DELETE'])
+def get_quarantine():
+    """Rejected frames, newest first; ?frame=true includes the stored frame, DELETE clears them"""
+    if request.method == 'DELETE':
+        cleared = telemetry_handler.quarantine.clear()
+        logger.info(f"get_quarantine: Cleared {cleared} quarantined frames")
+        return {'cleared': cleared}
+    
+    limit = request.args.get('limit', 50, type=int)
+    include_frame = request.args.get('frame', 'false').lower() == 'true'
+    quarantine = telemetry_handler.quarantine
+    return {
+        'count': len(quarantine),
+        'total': quarantine.total_count,
+        'frames': [entry.to_dict(include_frame) for entry in quarantine.entries(limit)]
+    }
+
+@app.route('/api/dead-letters')
+def get_dead_letters():
+    """Size and write counts of the dead-letter store (replay with dead_letter.py)"""
+    if telemetry_handler.dead_letters is None:
+        return {'enabled': False}
+    return {'enabled': True, **telemetry_handler.dead_letters.stats()}
+
+def _reporter_view(ap_name: str, stats: Dict[str, Any]) -> Dict[str, Any]:
+    """API representation of a BLE reporter (Access Point)"""
+    return {
+        'name': ap_name,
+        'devices_seen': len(stats['devices_seen']),
+        'total_packets': stats['total_packets'],
+        'avg_rssi': round(stats['avg_rssi'], 1),
+        'first_seen': format_timestamp(stats['first_seen']),
+        'last_seen': format_timestamp(stats['last_seen'])
+    }
+
+def _ble_device_view(device_id: str, stats: Dict[str, Any]) -> Dict[str, Any]:
+    """API representation of a reported BLE device"""
+    return {
+        'device_id': device_id,
+        'mac_address': stats['mac_address'],
+        'reporters_count': len(stats['reporters']),
+        'reporters': list(stats['reporters']),
+        'total_packets': stats['total_packets'],
+        'best_rssi': stats['best_rssi'],
+        'worst_rssi': stats['worst_rssi'],
+        'avg_rssi': round(stats['avg_rssi'], 1),
+        'primary_reporter': stats['primary_reporter'],
+        'first_seen': format_timestamp(stats['first_seen']),
+        'last_seen': format_timestamp(stats['last_seen'])
+    }
+
+def _proximity_view(device_id: str, ap_data: Dict[str, Any], query: Optional[Query] = None) -> Dict[str, Any]:
+    """API representation of a device's proximity to each reporting AP"""
+    proximity = {}
+    for ap_name, prox_data in list(ap_data.items()):
+        if query is not None:
+            if query.aps is not None and ap_name not in query.aps:
+                continue
+            if not query.rssi_matches(prox_data['avg_rssi']):
+                continue
+        view = {
+            'avg_rssi': round(prox_data['avg_rssi'], 1),
+            'distance': round(prox_data['distance'], 2),
+            'packet_count': prox_data['packet_count'],
+            'first_seen': format_timestamp(prox_data['first_seen']),
+            'last_seen': format_timestamp(prox_data['last_seen'])
+        }
+        proximity[ap_name] = query.project(view) if query is not None else view
+    return proximity
+
 @app.route('/api/ble/reporters')
 def get_ble_reporters():
-    """API endpoint to get BLE reporter (Access Point) statistics"""
-    reporters = {}
-    for ap_name, stats in telemetry_handler.ble_analytics['reporter_stats'].items():
-        reporters[ap_name] = {
-            'name': ap_name,
-            'devices_seen': len(stats['devices_seen']),
-            'total_packets': stats['total_packets'],
-            'avg_rssi': round(stats['avg_rssi'], 1),
-            'first_seen': stats['first_seen'],
-            'last_seen': stats['last_seen']
-        }
-    return reporters
+    """API endpoint to get BLE reporter (Access Point) statistics
+
+    Supports limit/cursor paging, ap, seen_since and RSSI filters and fields projection.
+    """
+    query, error = _parse_query()
+    if error:
+        return error
+    
+    def matches(ap_name, stats):
+        return (query.aps is None or ap_name in query.aps) and query.rssi_matches(stats['avg_rssi'])
+    
+    return cached_json_object(
+        lambda: telemetry_handler.reporter_index.page(
+            telemetry_handler.ble_analytics['reporter_stats'], query, matches, keys=query.aps),
+        lambda ap_name, stats: query.project(_reporter_view(ap_name, stats)))
 
 @app.route('/api/ble/devices')
 def get_ble_devices():
-    """API endpoint to get BLE device (reported) statistics"""
-    devices = {}
-    for device_id, stats in telemetry_handler.ble_analytics['device_stats'].items():
-        devices[device_id] = {
-            'device_id': device_id,
-            'mac_address': stats['mac_address'],
-            'reporters_count': len(stats['reporters']),
-            'reporters': list(stats['reporters']),
-            'total_packets': stats['total_packets'],
-            'best_rssi': stats['best_rssi'],
-            'worst_rssi': stats['worst_rssi'],
-            'avg_rssi': round(stats['avg_rssi'], 1),
-            'primary_reporter': stats['primary_reporter'],
-            'first_seen': stats['first_seen'],
-            'last_seen': stats['last_seen']
-        }
-    return devices
+    """API endpoint to get BLE device (reported) statistics
+
+    Supports limit/cursor paging, ap (any reporter), seen_since and RSSI
+    (average) filters and fields projection.
+    """
+    query, error = _parse_query()
+    if error:
+        return error
+    
+    def matches(device_id, stats):
+        return ((query.aps is None or not query.aps.isdisjoint(stats['reporters'])) and
+                query.rssi_matches(stats['avg_rssi']))
+    
+    return cached_json_object(
+        lambda: telemetry_handler.ble_device_index.page(
+            telemetry_handler.ble_analytics['device_stats'], query, matches, filters={'reporters': query.aps}),
+        lambda device_id, stats: query.project(_ble_device_view(device_id, stats)))
 
 @app.route('/api/ble/proximity')
 def get_ble_proximity():
-    """API endpoint to get BLE proximity mapping"""
-    proximity = {}
-    for device_id, ap_data in telemetry_handler.ble_analytics['proximity_map'].items():
-        proximity[device_id] = {}
-        for ap_name, prox_data in ap_data.items():
-            proximity[device_id][ap_name] = {
-                'avg_rssi': round(prox_data['avg_rssi'], 1),
-                'packet_count': prox_data['packet_count'],
-                'first_seen': prox_data['first_seen'],
-                'last_seen': prox_data['last_seen']
-            }
-    return proximity
+    """API endpoint to get BLE proximity mapping
+
+    Supports limit/cursor paging, ap, seen_since and RSSI filters (applied
+    per device/AP pair) and fields projection of the per-AP entries.
+    """
+    query, error = _parse_query()
+    if error:
+        return error
+    
+    def matches(device_id, ap_data):
+        if query.aps is None and query.rssi_min is None and query.rssi_max is None:
+            return True
+        return any((query.aps is None or ap_name in query.aps) and query.rssi_matches(prox_data['avg_rssi'])
+                   for ap_name, prox_data in list(ap_data.items()))
+    
+    def last_seen(ap_data):
+        return max((prox_data['last_seen'] for prox_data in list(ap_data.values())), default=None)
+    
+    # Proximity entries share their keys (device IDs) with the BLE device
+    # statistics, whose reporters include every AP of the device's proximity entry
+    return cached_json_object(
+        lambda: telemetry_handler.ble_device_index.page(
+            telemetry_handler.ble_analytics['proximity_map'], query, matches, last_seen,
+            filters={'reporters': query.aps}),
+        lambda device_id, ap_data: _proximity_view(device_id, ap_data, query))
 
 @app.route('/api/ble/analytics')
 def get_ble_analytics():
     """API endpoint to get comprehensive BLE analytics"""
+    return cached_json(_build_ble_analytics)
+
+def _build_ble_analytics() -> Dict[str, Any]:
+    """Summarize BLE reporters, top devices and signal quality"""
     analytics = {
         'summary': {
             'total_devices': len(telemetry_handler.ble_analytics['device_stats']),
@@ -1102,25 +1614,144 @@ def get_ble_analytics():
     
     return analytics
 
+# Dashboard updates: deltas of the registries pushed at a bounded rate
+DASHBOARD_PUSH_INTERVAL = float(os.getenv('DASHBOARD_PUSH_INTERVAL', 1.0))
+dashboard_feed = DashboardFeed(
+    telemetry_handler.change_clock,
+    {
+        'devices': (lambda: telemetry_handler.device_registry, telemetry_handler.device_index,
+                    lambda device_id, entry: api_view(entry)),
+        'ble_reporters': (lambda: telemetry_handler.ble_analytics['reporter_stats'],
+                          telemetry_handler.reporter_index, _reporter_view),
+        'ble_devices': (lambda: telemetry_handler.ble_analytics['device_stats'],
+                        telemetry_handler.ble_device_index, _ble_device_view),
+    },
+    stats=_collect_stats,
+    telemetry=telemetry_handler.telemetry_data,
+    telemetry_view=api_view,
+    telemetry_per_update=int(os.getenv('DASHBOARD_TELEMETRY_PER_UPDATE', 20)))
+_dashboard_pusher_started = False
+
+def _next_dashboard_delta() -> Optional[Dict[str, Any]]:
+    """Delta to broadcast to dashboard clients, or None (nothing changed or nobody watching)"""
+    if not telemetry_handler.connected_clients:
+        dashboard_feed.skip()
+        return None
+    return dashboard_feed.delta()
+
+def _push_dashboard_deltas():
+    """Background task: broadcast a delta every DASHBOARD_PUSH_INTERVAL seconds if anything changed"""
+    logger.info(f"Dashboard delta push started (every {DASHBOARD_PUSH_INTERVAL}s)")
+    while True:
+        socketio.sleep(DASHBOARD_PUSH_INTERVAL)
+        try:
+            delta = _next_dashboard_delta()
+            if delta is not None:
+                socketio.emit('dashboard_delta', delta)
+        except Exception as e:
+            logger.error(f"_push_dashboard_deltas: Failed to push dashboard delta: {e}", exc_info=True)
+
+# Filtered telemetry streams, flushed to their rooms in batches
+SUBSCRIPTION_FLUSH_INTERVAL = float(os.getenv('SUBSCRIPTION_FLUSH_INTERVAL', 0.25))
+_subscription_flusher_started = False
+
+def _subscription_batches():
+    """Yield (room, telemetry_batch message) for every subscription room with queued records"""
+    for room, records, dropped in telemetry_handler.subscriptions.drain():
+        yield room, {
+            'subscription': room,
+            'records': [api_view(r) for r in records],
+            'dropped': dropped
+        }
+
+def _flush_subscriptions():
+    """Background task: emit the records queued for each subscription room"""
+    logger.info(f"Subscription flush started (every {SUBSCRIPTION_FLUSH_INTERVAL}s)")
+    while True:
+        socketio.sleep(SUBSCRIPTION_FLUSH_INTERVAL)
+        try:
+            for room, message in _subscription_batches():
+                socketio.emit('telemetry_batch', message, to=room)
+        except Exception as e:
+            logger.error(f"_flush_subscriptions: Failed to emit subscription batch: {e}", exc_info=True)
+
+# SocketIO event logic, shared by the threading (Flask-SocketIO) and async servers
+def _client_connected(client_id: str) -> Dict[str, Any]:
+    """Register a dashboard client and return its initial dashboard_snapshot"""
+    telemetry_handler.connected_clients.add(client_id)
+    logger.info(f"Web client {client_id} connected")
+    # Full state (including recent telemetry); deltas follow
+    return dashboard_feed.snapshot()
+
+def _client_disconnected(client_id: str) -> None:
+    telemetry_handler.connected_clients.discard(client_id)
+    telemetry_handler.subscriptions.unsubscribe(client_id)
+    logger.info(f"Web client {client_id} disconnected")
+
+def _subscribe_client(client_id: str, message) -> Tuple[Subscription, Optional[str]]:
+    """
+    Apply a subscribe message
+
+    Returns:
+        (subscription, room the client left or None)
+
+    Raises:
+        ValueError: If the filters are malformed
+    """
+    subscription = Subscription.from_message(message)
+    previous = telemetry_handler.subscriptions.subscribe(client_id, subscription)
+    return subscription, previous
+
 # SocketIO events
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
-    client_id = request.sid
-    telemetry_handler.connected_clients.add(client_id)
-    logger.info(f"Web client {client_id} connected")
+    global _dashboard_pusher_started
+    snapshot = _client_connected(request.sid)
     
-    # Send recent telemetry data to new client
-    recent_data = telemetry_handler.telemetry_data[-10:]
-    for data in recent_data:
-        emit('telemetry_update', data)
+    if not _dashboard_pusher_started:
+        _dashboard_pusher_started = True
+        # Changes made before anyone watched are covered by the snapshot
+        dashboard_feed.skip()
+        socketio.start_background_task(_push_dashboard_deltas)
+    
+    emit('dashboard_snapshot', snapshot)
+
+@socketio.on('dashboard_resync')
+def handle_dashboard_resync():
+    """Resend the full dashboard state to a client that missed a delta"""
+    logger.info(f"Web client {request.sid} requested a dashboard resync")
+    emit('dashboard_snapshot', dashboard_feed.snapshot())
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
-    client_id = request.sid
-    telemetry_handler.connected_clients.discard(client_id)
-    logger.info(f"Web client {client_id} disconnected")
+    _client_disconnected(request.sid)
+
+@socketio.on('subscribe')
+def handle_subscribe(message=None):
+    """Stream the telemetry records matching the client's filters (replaces a previous subscription)"""
+    global _subscription_flusher_started
+    try:
+        subscription, previous = _subscribe_client(request.sid, message)
+    except ValueError as e:
+        emit('subscription_error', {'error': str(e)})
+        return
+    if previous is not None:
+        leave_room(previous)
+    join_room(subscription.room)
+    if not _subscription_flusher_started:
+        _subscription_flusher_started = True
+        socketio.start_background_task(_flush_subscriptions)
+    emit('subscribed', {'subscription': subscription.room, 'filters': subscription.to_dict()})
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe():
+    """Stop the client's filtered telemetry stream"""
+    room = telemetry_handler.subscriptions.unsubscribe(request.sid)
+    if room is not None:
+        leave_room(room)
+    emit('unsubscribed', {'subscription': room})
 
 @socketio.on('request_stats')
 def handle_stats_request():
@@ -1128,12 +1759,106 @@ def handle_stats_request():
     stats = get_stats()
     emit('stats_update', stats)
 
+def register_async_socketio(sio) -> None:
+    """
+    Register the SocketIO events on a python-socketio AsyncServer (SERVER_MODE=async)
+
+    Same events and messages as the Flask-SocketIO handlers above; the
+    background tasks run as coroutines on the server's event loop.
+    """
+    tasks_started = set()
+
+    async def push_dashboard_deltas():
+        logger.info(f"Dashboard delta push started (every {DASHBOARD_PUSH_INTERVAL}s)")
+        while True:
+            await sio.sleep(DASHBOARD_PUSH_INTERVAL)
+            try:
+                delta = _next_dashboard_delta()
+                if delta is not None:
+                    await sio.emit('dashboard_delta', delta)
+            except Exception as e:
+                logger.error(f"push_dashboard_deltas: Failed to push dashboard delta: {e}", exc_info=True)
+
+    async def flush_subscriptions():
+        logger.info(f"Subscription flush started (every {SUBSCRIPTION_FLUSH_INTERVAL}s)")
+        while True:
+            await sio.sleep(SUBSCRIPTION_FLUSH_INTERVAL)
+            try:
+                for room, message in _subscription_batches():
+                    await sio.emit('telemetry_batch', message, to=room)
+            except Exception as e:
+                logger.error(f"flush_subscriptions: Failed to emit subscription batch: {e}", exc_info=True)
+
+    def start_once(name, task):
+        if name not in tasks_started:
+            tasks_started.add(name)
+            sio.start_background_task(task)
+
+    @sio.on('connect')
+    async def connect(sid, environ):
+        snapshot = _client_connected(sid)
+        if 'dashboard' not in tasks_started:
+            dashboard_feed.skip()
+            start_once('dashboard', push_dashboard_deltas)
+        await sio.emit('dashboard_snapshot', snapshot, to=sid)
+
+    @sio.on('dashboard_resync')
+    async def dashboard_resync(sid, *args):
+        logger.info(f"Web client {sid} requested a dashboard resync")
+        await sio.emit('dashboard_snapshot', dashboard_feed.snapshot(), to=sid)
+
+    @sio.on('disconnect')
+    async def disconnect(sid):
+        _client_disconnected(sid)
+
+    @sio.on('subscribe')
+    async def subscribe(sid, message=None):
+        try:
+            subscription, previous = _subscribe_client(sid, message)
+        except ValueError as e:
+            await sio.emit('subscription_error', {'error': str(e)}, to=sid)
+            return
+        if previous is not None:
+            await sio.leave_room(sid, previous)
+        await sio.enter_room(sid, subscription.room)
+        start_once('subscriptions', flush_subscriptions)
+        await sio.emit('subscribed', {'subscription': subscription.room, 'filters': subscription.to_dict()}, to=sid)
+
+    @sio.on('unsubscribe')
+    async def unsubscribe(sid, *args):
+        room = telemetry_handler.subscriptions.unsubscribe(sid)
+        if room is not None:
+            await sio.leave_room(sid, room)
+        await sio.emit('unsubscribed', {'subscription': room}, to=sid)
+
+    @sio.on('request_stats')
+    async def request_stats(sid, *args):
+        await sio.emit('stats_update', _collect_stats(), to=sid)
+
+def check_protobuf_backend() -> str:
+    """Export the protobuf runtime backend as a metric and warn if it is the pure-Python one"""
+    backend = protobuf_backend()
+    PROTOBUF_BACKEND.labels(backend).set(1)
+    if backend == 'python':
+        logger.warning("Protobuf is using its pure-Python backend, which decodes protobuf frames several times "
+                       "slower than the native upb backend. Install a protobuf release with a native wheel for "
+                       "this platform and unset PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION.")
+    else:
+        logger.info(f"Protobuf runtime backend: {backend}")
+    return backend
+
 def start_aruba_websocket_server():
     """Start the WebSocket server for Aruba APs"""
     host = os.getenv('ARUBA_WS_HOST', '0.0.0.0')
     port = int(os.getenv('ARUBA_WS_PORT', 9191))
     
     logger.info(f"Starting Aruba WebSocket server on {host}:{port}")
+    register_ingest_thread()
+    # Protobuf codecs load lazily; load them now so the first frame does not pay for it
+    preload_descriptors()
+    check_protobuf_backend()
+    # Preload AP credentials so connections authenticate with set lookups
+    get_auth_config()
     logger.info(f"WebSocket server will accept connections on ws://{host}:{port}/aruba")
     
     # Create server with proper SSL context if needed
@@ -1153,8 +1878,12 @@ def start_aruba_websocket_server():
     )
     return start_server
 
-if __name__ == '__main__':
-    # Start WebSocket server for Aruba APs in background
+def start_aruba_websocket_thread():
+    """
+    Run the Aruba AP WebSocket server on its own event loop in a daemon thread
+
+    Used by the threading server and by the gunicorn worker (see gunicorn.conf.py).
+    """
     import threading
     
     def run_websocket_server():
@@ -1164,13 +1893,33 @@ if __name__ == '__main__':
         loop.run_until_complete(start_server)
         loop.run_forever()
     
-    ws_thread = threading.Thread(target=run_websocket_server, daemon=True)
+    ws_thread = threading.Thread(target=run_websocket_server, name='aruba-ws', daemon=True)
     ws_thread.start()
-    
-    # Start Flask-SocketIO server
+    return ws_thread
+
+async def serve_aruba_websocket():
+    """Start the Aruba AP WebSocket server on the running event loop and return it"""
+    return await start_aruba_websocket_server()
+
+if __name__ == '__main__':
     host = os.getenv('FLASK_HOST', '0.0.0.0')
     port = int(os.getenv('FLASK_PORT', 5000))
+    server_mode = os.getenv('SERVER_MODE', 'threading').lower()
+    
+    if server_mode == 'async':
+        # HTTP, SocketIO and AP ingest on a single asyncio event loop
+        import async_server
+        logger.info(f"API responses serialized with {serializer_name()}")
+        async_server.run(app, register_async_socketio, serve_aruba_websocket, host, port)
+        raise SystemExit(0)
+    
+    # Start WebSocket server for Aruba APs in background
+    start_aruba_websocket_thread()
+    
+    # Start Flask-SocketIO server
     debug = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     
     logger.info(f"Starting Flask server on {host}:{port}")
+    logger.info(f"API responses serialized with {serializer_name()}")
+    init_socketio()
     socketio.run(app, host=host, port=port, debug=debug, allow_unsafe_werkzeug=True)
@@ -0,0 +1,188 @@
+"""
+Aruba WebSocket connection sessions for Aruba IoT Telemetry Server
+
+Everything that is invariant for the lifetime of an AP connection is derived
+once, when the connection is accepted, and kept on a ``ConnectionSession``:
+the authentication result, the client address and the AP identity.
+Per-message processing then only reads attributes. Receive times come from
+the process-wide ``timestamps.now_ns`` clock, so they are ordered across
+connections.
+
+Credentials are loaded from the environment into sets once per process
+(``ARUBA_AUTH_TOKENS``, ``ARUBA_CLIENT_IDS``, ``ARUBA_ACCESS_TOKENS``), so
+authenticating a connection is a couple of hash lookups. Dead-letter replay
+sessions need one of the separate ``ARUBA_REPLAY_TOKENS`` on top (none by
+default, which disables replay mode).
+"""
+import logging
+import os
+import sys
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from timestamps import now_ns
+
+logger = logging.getLogger('aruba-iot')
+
+
+class AuthConfig:
+    """Accepted Aruba AP credentials"""
+
+    __slots__ = ('tokens', 'client_ids', 'access_tokens', 'replay_tokens')
+
+    def __init__(self, tokens: FrozenSet[str], client_ids: FrozenSet[str], access_tokens: FrozenSet[str],
+                 replay_tokens: FrozenSet[str] = frozenset()):
+        self.tokens = tokens
+        self.client_ids = client_ids
+        self.access_tokens = access_tokens
+        # Tokens allowing a connection to open a dead-letter replay session
+        self.replay_tokens = replay_tokens
+
+    @classmethod
+    def from_env(cls) -> 'AuthConfig':
+        """Load credentials from the ARUBA_* environment variables"""
+        # Note: '1234' is a temporary token for development/testing purposes only
+        def values(name: str, default: str) -> FrozenSet[str]:
+            return frozenset(v.strip() for v in os.getenv(name, default).split(',') if v.strip())
+
+        return cls(values('ARUBA_AUTH_TOKENS', '1234,admin,aruba-iot'),
+                   # Default clientID/accessToken for temporary testing purposes
+                   values('ARUBA_CLIENT_IDS', 'test-client-1,aruba-ap'),
+                   values('ARUBA_ACCESS_TOKENS', '1234,admin-token'),
+                   values('ARUBA_REPLAY_TOKENS', ''))
+
+    def authenticate(self, path: str, headers) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Check the credentials of a connection request
+
+        Credentials are taken from the query string (token, or clientID and
+        accessToken) or, when absent there, from the Authorization
+        (Bearer), X-Auth-Token, X-Client-ID and X-Access-Token headers.
+
+        Args:
+            path: Request path including the query string
+            headers: WebSocket request headers
+
+        Returns:
+            (auth method, client ID), or (None, None) if authentication failed
+        """
+        token = client_id = access_token = None
+        if '?' in path:
+            query_params = parse_qs(urlparse(path).query)
+            token = query_params.get('token', [None])[0]
+            client_id = query_params.get('clientID', [None])[0]
+            access_token = query_params.get('accessToken', [None])[0]
+
+        if not token and not access_token:
+            auth_header = headers.get('Authorization')
+            if auth_header and auth_header.startswith('Bearer '):
+                token = auth_header[7:]  # Remove 'Bearer ' prefix
+            else:
+                token = headers.get('X-Auth-Token')
+                client_id = headers.get('X-Client-ID')
+                access_token = headers.get('X-Access-Token')
+
+        if client_id and access_token and client_id in self.client_ids and access_token in self.access_tokens:
+            return 'client_id', client_id
+        if token and token in self.tokens:
+            return 'token', None
+        return None, None
+
+
+_auth_config: Optional[AuthConfig] = None
+
+
+def get_auth_config() -> AuthConfig:
+    """Return the process-wide credentials, loading them on first use"""
+    global _auth_config
+    if _auth_config is None:
+        _auth_config = AuthConfig.from_env()
+        logger.info(f"get_auth_config: Loaded {len(_auth_config.tokens)} tokens and "
+                    f"{len(_auth_config.client_ids)} client IDs")
+    return _auth_config
+
+
+def reload_auth_config() -> AuthConfig:
+    """Re-read the credentials from the environment (affects new connections only)"""
+    global _auth_config
+    _auth_config = None
+    return get_auth_config()
+
+
+class ConnectionSession:
+    """Connection-invariant state of one authenticated Aruba AP connection"""
+
+    __slots__ = ('client_ip', 'client_port', 'auth_method', 'client_id', 'access_point',
+                 'frames', 'log_frames', 'replay')
+
+    def __init__(self, remote_address, auth_method: str, client_id: Optional[str] = None,
+                 access_point: Optional[str] = None, replay: bool = False):
+        self.client_ip = remote_address[0] if remote_address else 'unknown'
+        self.client_port = remote_address[1] if remote_address else 0
+        self.auth_method = auth_method
+        self.client_id = client_id
+        # AP name, learned from the first packet unless given with ?ap=<name>
+        self.access_point = sys.intern(access_point) if access_point else None
+        self.frames = 0
+        # Frame previews are only built when they will be logged
+        self.log_frames = logger.isEnabledFor(logging.INFO)
+        # Set with ?replay=<replay token> by the dead-letter replay tool; frames
+        # that fail again are not dead-lettered a second time
+        self.replay = replay
+
+    @classmethod
+    def open(cls, websocket, path: str) -> Optional['ConnectionSession']:
+        """
+        Authenticate a connection request and create its session
+
+        A ?replay=<token> parameter opens a dead-letter replay session; the
+        token must be one of ARUBA_REPLAY_TOKENS, otherwise the connection
+        is refused.
+
+        Args:
+            websocket: Incoming WebSocket connection
+            path: Request path including the query string
+
+        Returns:
+            The session, or None if authentication failed
+        """
+        config = get_auth_config()
+        auth_method, client_id = config.authenticate(path, websocket.request_headers)
+        if auth_method is None:
+            return None
+        access_point = None
+        replay = False
+        if '?' in path:
+            query = parse_qs(urlparse(path).query)
+            access_point = query.get('ap', [None])[0]
+            replay_token = query.get('replay', [None])[0]
+            if replay_token is not None:
+                if replay_token not in config.replay_tokens:
+                    logger.warning(f"ConnectionSession: Refused replay session from "
+                                   f"{websocket.remote_address[0] if websocket.remote_address else 'unknown'} "
+                                   f"- invalid replay token")
+                    return None
+                replay = True
+        return cls(websocket.remote_address, auth_method, client_id, access_point, replay)
+
+    def now_ns(self) -> int:
+        """Current time in epoch nanoseconds (the process-wide clock shared by all sessions)"""
+        return now_ns()
+
+    def apply_identity(self, data: Dict[str, Any]) -> None:
+        """
+        Fill in or canonicalize the reporting AP of a decoded JSON packet
+
+        Packets without 'accessPoint' inherit the session's AP. A packet
+        repeating the session's AP name gets the session's interned string,
+        so downstream dictionary lookups compare by identity.
+        """
+        reported = data.get('accessPoint')
+        if not reported:
+            if self.access_point is not None:
+                data['accessPoint'] = self.access_point
+        elif reported == self.access_point:
+            data['accessPoint'] = self.access_point
+        elif self.access_point is None and isinstance(reported, str):
+            self.access_point = sys.intern(reported)
+            logger.info(f"ConnectionSession: {self.client_ip}:{self.client_port} identified as AP {reported}")
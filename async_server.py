@@ -0,0 +1,224 @@
+"""
+Async-native serving mode for Aruba IoT Telemetry Server (SERVER_MODE=async)
+
+The default mode runs Flask-SocketIO on threads beside a separate asyncio loop
+for the Aruba AP WebSocket server, handing data between them across threads,
+and serves HTTP with the Werkzeug development server. In async mode everything
+runs on one asyncio event loop:
+
+- an aiohttp application serves HTTP,
+- a python-socketio ``AsyncServer`` attached to it serves the dashboard's
+  SocketIO connections, with the background pushes as coroutines,
+- the Aruba AP WebSocket server (``websockets``) listens on its own port from
+  the same loop,
+- the Flask routes are called in-process through a small WSGI bridge, on a
+  bounded thread pool (``ASYNC_HTTP_THREADS``), so a slow request (a large
+  export, ``/debug/profile``) never stalls AP ingest on the loop; streamed
+  responses are written chunk by chunk.
+
+aiohttp is an optional dependency that is only needed for this mode.
+"""
+import asyncio
+import io
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import socketio
+
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+logger = logging.getLogger('aruba-iot')
+
+# Threads running Flask routes (HTTP requests served concurrently)
+ASYNC_HTTP_THREADS = int(os.getenv('ASYNC_HTTP_THREADS', 8))
+
+# Request headers that WSGI passes without the HTTP_ prefix
+_UNPREFIXED_HEADERS = {'CONTENT_TYPE', 'CONTENT_LENGTH'}
+
+
+def available() -> bool:
+    """Whether the async serving mode can run (aiohttp is installed)"""
+    return web is not None
+
+
+class WSGIBridge:
+    """
+    aiohttp request handler that calls a WSGI application on a thread pool
+
+    The WSGI call, and the iteration of its response body, run on the
+    bridge's executor, never on the event loop, so ingest and SocketIO keep
+    running while a request is served (the routes share state with ingest
+    exactly as under the threading server). Responses without a
+    Content-Length (streamed JSON) are forwarded chunk by chunk.
+    """
+
+    def __init__(self, wsgi_app: Callable, max_body: int = 1024 * 1024, threads: int = ASYNC_HTTP_THREADS):
+        self.wsgi_app = wsgi_app
+        self.max_body = max_body
+        self.executor = ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix='wsgi')
+
+    def environ(self, request, body: bytes) -> Dict[str, Any]:
+        """Build the WSGI environ of an aiohttp request"""
+        host, _, port = (request.host or '').partition(':')
+        environ = {
+            'REQUEST_METHOD': request.method,
+            'SCRIPT_NAME': '',
+            # WSGI carries the decoded path as latin-1 code points of its UTF-8 bytes
+            'PATH_INFO': request.path.encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': request.query_string,
+            'SERVER_NAME': host or 'localhost',
+            'SERVER_PORT': port or ('443' if request.secure else '80'),
+            'SERVER_PROTOCOL': f"HTTP/{request.version.major}.{request.version.minor}",
+            'REMOTE_ADDR': request.remote or '',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': request.scheme,
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in request.headers.items():
+            key = name.upper().replace('-', '_')
+            if key not in _UNPREFIXED_HEADERS:
+                key = 'HTTP_' + key
+            if key in environ:
+                environ[key] += ',' + value
+            else:
+                environ[key] = value
+        return environ
+
+    async def __call__(self, request):
+        body = await request.read()
+        if len(body) > self.max_body:
+            return web.Response(status=413, text='Request body too large')
+
+        loop = asyncio.get_running_loop()
+        code, reason, headers, body, result = await loop.run_in_executor(
+            self.executor, self._call, self.environ(request, body))
+        if result is None:
+            return web.Response(status=code, reason=reason, headers=headers, body=body)
+        try:
+            response = web.StreamResponse(status=code, reason=reason, headers=headers)
+            await response.prepare(request)
+            chunks = iter(result)
+            while True:
+                # Streamed bodies are generated by route code; run it off the loop too
+                chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await response.write(chunk)
+            await response.write_eof()
+            return response
+        finally:
+            await loop.run_in_executor(self.executor, self._close, result)
+
+    def _call(self, environ: Dict[str, Any]):
+        """
+        Call the WSGI application (on the executor)
+
+        Returns:
+            (status code, reason, headers, body, None) for responses with a
+            Content-Length, or (status code, reason, headers, None, result
+            iterable) for streamed ones
+        """
+        started: List[Tuple[str, List[Tuple[str, str]]]] = []
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+            if exc_info is not None and started:
+                raise exc_info[1].with_traceback(exc_info[2])
+            started[:] = [(status, headers)]
+            return lambda data: None  # legacy write() callable, unused by Flask
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            status, headers = started[0]
+            code = int(status[:3])
+            reason = status[4:] or None
+            if any(name.lower() == 'content-length' for name, _ in headers) or code in (204, 304):
+                body = b''.join(result)
+                self._close(result)
+                return code, reason, headers, body, None
+            return code, reason, headers, None, result
+        except BaseException:
+            self._close(result)
+            raise
+
+    @staticmethod
+    def _close(result) -> None:
+        close = getattr(result, 'close', None)
+        if close is not None:
+            close()
+
+
+def create_app(wsgi_app: Callable, register_socketio: Callable[[Any], None],
+               start_ingest_server: Optional[Callable[[], Awaitable[Any]]] = None,
+               cors_allowed_origins: Any = '*'):
+    """
+    Build the aiohttp application serving HTTP, SocketIO and (optionally) AP ingest
+
+    Args:
+        wsgi_app: WSGI application serving the HTTP routes (the Flask app)
+        register_socketio: Registers the SocketIO event handlers on an AsyncServer
+        start_ingest_server: Coroutine function starting the Aruba AP WebSocket
+            server on the running loop; returns the server
+        cors_allowed_origins: CORS origins accepted by the SocketIO server
+
+    Returns:
+        The aiohttp application
+    """
+    if web is None:
+        raise RuntimeError("SERVER_MODE=async requires aiohttp (pip install aiohttp)")
+
+    sio = socketio.AsyncServer(async_mode='aiohttp', cors_allowed_origins=cors_allowed_origins)
+    register_socketio(sio)
+
+    application = web.Application()
+    application['sio'] = sio
+    # Registered first, so /socket.io/ is matched before the WSGI catch-all
+    sio.attach(application)
+    bridge = WSGIBridge(wsgi_app)
+    application.router.add_route('*', '/{path:.*}', bridge)
+
+    async def stop_bridge(app):
+        bridge.executor.shutdown(wait=False)
+
+    application.on_cleanup.append(stop_bridge)
+
+    if start_ingest_server is not None:
+        async def start_ingest(app):
+            app['ingest_server'] = await start_ingest_server()
+
+        async def stop_ingest(app):
+            server = app.get('ingest_server')
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+
+        application.on_startup.append(start_ingest)
+        application.on_cleanup.append(stop_ingest)
+    return application
+
+
+def run(wsgi_app: Callable, register_socketio: Callable[[Any], None],
+        start_ingest_server: Optional[Callable[[], Awaitable[Any]]], host: str, port: int) -> None:
+    """
+    Serve HTTP, SocketIO and AP ingest on one event loop until interrupted
+
+    Args:
+        wsgi_app: WSGI application serving the HTTP routes (the Flask app)
+        register_socketio: Registers the SocketIO event handlers on an AsyncServer
+        start_ingest_server: Coroutine function starting the Aruba AP WebSocket server
+        host: HTTP listen address
+        port: HTTP listen port
+    """
+    application = create_app(wsgi_app, register_socketio, start_ingest_server)
+    logger.info(f"Starting async server on {host}:{port} (aiohttp, single event loop)")
+    web.run_app(application, host=host, port=port, print=None, access_log=None)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the compact v2 protobuf schemas
+
+Encodes and decodes the same seeded packet corpus with the v1 (string-typed)
+and v2 (binary-typed) message definitions, reporting wire size, encode and
+decode time per packet, and the size of a 500-packet stream frame.
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import protobuf_utils as pu
+from test_multi_protocol import DeviceSimulator
+
+CODECS = {
+    'ibeacon': ('generate_ibeacon_packet',
+                (pu.encode_ibeacon_packet, pu.decode_ibeacon_packet, pu.STREAM_TYPE_IBEACON),
+                (pu.encode_ibeacon_packet_v2, pu.decode_ibeacon_packet_v2, pu.STREAM_TYPE_IBEACON_V2)),
+    'wifi': ('generate_wifi_packet',
+             (pu.encode_wifi_packet, pu.decode_wifi_packet, pu.STREAM_TYPE_WIFI),
+             (pu.encode_wifi_packet_v2, pu.decode_wifi_packet_v2, pu.STREAM_TYPE_WIFI_V2)),
+    'enocean': ('generate_enocean_packet',
+                (pu.encode_enocean_packet, pu.decode_enocean_packet, pu.STREAM_TYPE_ENOCEAN),
+                (pu.encode_enocean_packet_v2, pu.decode_enocean_packet_v2, pu.STREAM_TYPE_ENOCEAN_V2)),
+}
+
+
+def per_call_ns(func, inputs, passes):
+    """Mean time per call in nanoseconds over several passes"""
+    start = time.perf_counter_ns()
+    for _ in range(passes):
+        for item in inputs:
+            func(item)
+    return (time.perf_counter_ns() - start) / (passes * len(inputs))
+
+
+def run(name, corpus, codec, passes):
+    """Benchmark one schema version on a corpus and return its stream frame size"""
+    encode, decode, type_code = codec
+    encoded = [encode(p) for p in corpus]
+    size = sum(len(e) for e in encoded) / len(encoded)
+    encode_ns = per_call_ns(encode, corpus, passes)
+    decode_ns = per_call_ns(decode, encoded, passes)
+    stream = pu.encode_packet_stream([(type_code, e) for e in encoded])
+    print(f"{name:<12} {size:8.1f} B  {encode_ns:10,.0f} ns  {decode_ns:10,.0f} ns  {len(stream):10,} B")
+    return len(stream)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare v1 and v2 protobuf wire size and codec speed")
+    parser.add_argument("--count", type=int, default=500,
+                        help="Packets per protocol (default: 500)")
+    parser.add_argument("--passes", type=int, default=20,
+                        help="Passes over the corpus per measurement (default: 20)")
+    parser.add_argument("--seed", type=int, default=7,
+                        help="Random seed (default: 7)")
+    args = parser.parse_args()
+
+    # The v1 codecs log every call; keep that out of the measurement
+    logging.getLogger('aruba-iot').setLevel(logging.WARNING)
+
+    random.seed(args.seed)
+    simulators = [DeviceSimulator(ap_name=f"AP-Bench-{i}") for i in range(8)]
+
+    print(f"{'schema':<12} {'wire size':>10}  {'encode':>13}  {'decode':>13}  {f'stream[{args.count}]':>12}")
+    for protocol, (generator, v1, v2) in CODECS.items():
+        corpus = [getattr(random.choice(simulators), generator)() for _ in range(args.count)]
+        v1_stream = run(f"{protocol}/v1", corpus, v1, args.passes)
+        v2_stream = run(f"{protocol}/v2", corpus, v2, args.passes)
+        print(f"{'':<12} v2 stream is {v2_stream / v1_stream:.0%} of v1")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the RSSI filter stage
+
+Feeds synthetic RSSI readings (a true level that jumps as the device moves
+between rooms, plus Gaussian noise and occasional multipath fades) through the previous list-mean
+approach and through the EWMA and Kalman filters, reporting throughput and
+tracking error against the true signal.
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rssi_filters import EWMAFilter, KalmanFilter
+
+
+def generate_readings(count, seed=42):
+    """Generate (true_rssi, measured_rssi) pairs"""
+    rng = random.Random(seed)
+    readings = []
+    true_rssi = -65.0
+    for i in range(count):
+        if i and i % 200 == 0:
+            true_rssi = rng.uniform(-85, -45)  # device moved
+        measured = true_rssi + rng.gauss(0, 4)
+        if rng.random() < 0.02:
+            measured -= rng.uniform(10, 20)  # multipath fade
+        readings.append((true_rssi, int(round(measured))))
+    return readings
+
+
+class ListMean:
+    """The previous approach: mean over a trimmed history list"""
+
+    def __init__(self, window=50):
+        self.window = window
+        self.readings = []
+
+    def update(self, rssi):
+        self.readings.append(rssi)
+        value = sum(self.readings) / len(self.readings)
+        if len(self.readings) > self.window:
+            self.readings = self.readings[-self.window:]
+        return value
+
+
+def run(name, rssi_filter, readings):
+    """Run one filter over the readings and print a result line"""
+    update = rssi_filter.update
+    measured = [m for _, m in readings]
+    start = time.perf_counter()
+    outputs = [update(m) for m in measured]
+    elapsed = time.perf_counter() - start
+
+    squared_error = 0.0
+    for (true_rssi, _), value in zip(readings, outputs):
+        squared_error += (value - true_rssi) ** 2
+    rmse = math.sqrt(squared_error / len(readings))
+
+    print(f"{name:<12} {elapsed:8.3f} s  {len(readings) / elapsed / 1e6:6.2f} M/s  "
+          f"{elapsed / len(readings) * 1e9:7.1f} ns/reading  RMSE {rmse:5.2f} dB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RSSI filters on synthetic readings")
+    parser.add_argument("--count", type=int, default=1_000_000,
+                        help="Number of synthetic readings (default: 1000000)")
+    parser.add_argument("--seed", type=int, default=42,
+                        help="Random seed (default: 42)")
+    args = parser.parse_args()
+
+    print(f"Generating {args.count} synthetic RSSI readings...")
+    readings = generate_readings(args.count, args.seed)
+
+    print(f"{'filter':<12} {'time':>10}  {'rate':>9}  {'per call':>14}  tracking error")
+    run('list-mean', ListMean(), readings)
+    run('ewma', EWMAFilter(), readings)
+    run('kalman', KalmanFilter(), readings)
+
+
+if __name__ == "__main__":
+    main()
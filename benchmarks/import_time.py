@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Cold-start import time audit
+
+Imports a module in fresh interpreters with ``python -X importtime`` and
+reports the median total import time, the median wall time of the whole
+process, and the direct imports of the module that cost the most. Each run
+is a new process, so every import is cold (apart from the OS file cache).
+
+Examples:
+    # Audit the server module
+    python benchmarks/import_time.py
+
+    # Fail (exit status 1) when importing app takes longer than 400 ms
+    python benchmarks/import_time.py --budget-ms 400
+
+    # Audit another module, listing deeper imports as well
+    python benchmarks/import_time.py --module protobuf_utils --depth 3
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# import time: <self us> | <cumulative us> | <2 spaces per nesting level><module>
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def measure(module):
+    """
+    Import a module in a fresh interpreter
+
+    Returns:
+        (wall seconds, {name: (depth, cumulative us)}) where depth 0 is the
+        module itself
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    lines = [_LINE.match(line) for line in result.stderr.splitlines()]
+    lines = [m for m in lines if m]
+    # A module's line follows the lines of everything it imported, which are
+    # indented deeper; imports done before it (e.g. by site) are not its own
+    end = max(i for i, m in enumerate(lines) if m.group(4) == module)
+    base = len(lines[end].group(3))
+    imports = {module: (0, int(lines[end].group(2)))}
+    for match in reversed(lines[:end]):
+        indent = len(match.group(3))
+        if indent <= base:
+            break
+        imports.setdefault(match.group(4), ((indent - base) // 2, int(match.group(2))))
+    return wall, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import time audit")
+    parser.add_argument("--module", default="app",
+                        help="Module to import (default: app)")
+    parser.add_argument("--runs", type=int, default=10,
+                        help="Fresh interpreters to measure (default: 10)")
+    parser.add_argument("--depth", type=int, default=1,
+                        help="Deepest nesting level listed (default: 1, direct imports)")
+    parser.add_argument("--top", type=int, default=15,
+                        help="Imports listed (default: 15)")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Exit with status 1 if the median import time exceeds this")
+    args = parser.parse_args()
+
+    walls = []
+    totals = []
+    costs = {}
+    for _ in range(args.runs):
+        wall, imports = measure(args.module)
+        walls.append(wall)
+        totals.append(imports[args.module][1])
+        for name, (depth, cumulative) in imports.items():
+            if 0 < depth <= args.depth:
+                costs.setdefault(name, []).append(cumulative)
+
+    total_ms = statistics.median(totals) / 1000
+    print(f"import {args.module}: {total_ms:.1f} ms median "
+          f"(min {min(totals) / 1000:.1f} ms), process wall {statistics.median(walls) * 1000:.1f} ms, "
+          f"{args.runs} runs")
+    ranked = sorted(costs.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, values in ranked[:args.top]:
+        print(f"  {statistics.median(values) / 1000:8.1f} ms  {name}")
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"FAIL: {total_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Ingest load generator for the Aruba WebSocket server
+
+Simulates a fleet of concurrent access points over localhost, each sending a
+reproducible (seeded) corpus of BLE/iBeacon, WiFi and EnOcean packets as JSON
+or protobuf at a fixed aggregate target rate. Sends are scheduled open-loop
+against absolute send times, so a slow server shows up as latency rather than
+as a silently reduced offered load.
+
+Reports sustained packets/sec, ack latency percentiles (p50/p99/p999) and,
+when the server process is known, its CPU usage and peak RSS.
+
+Examples:
+    # Spawn a local ingest server and drive it with 200 APs at 5000 pkt/s
+    python benchmarks/ingest_load.py --spawn --aps 200 --rate 5000
+
+    # Drive an already running server, sampling its CPU/RSS by PID
+    python benchmarks/ingest_load.py --server ws://localhost:9191 --server-pid 1234
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import deque
+
+import websockets
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from protobuf_utils import encode_ibeacon_packet, encode_wifi_packet, encode_enocean_packet
+from test_multi_protocol import DeviceSimulator
+
+ENCODERS = {
+    'ble': encode_ibeacon_packet,
+    'wifi': encode_wifi_packet,
+    'enocean': encode_enocean_packet,
+}
+
+# Script used to run only the Aruba WebSocket ingest server in a child process
+SERVER_BOOTSTRAP = """
+import asyncio, logging, sys
+import app
+logging.getLogger().setLevel(sys.argv[1])
+loop = asyncio.new_event_loop()
+asyncio.set_event_loop(loop)
+loop.run_until_complete(app.start_aruba_websocket_server())
+print('ready', flush=True)
+loop.run_forever()
+"""
+
+
+def parse_mix(mix):
+    """Parse a protocol mix such as 'ble=0.6,wifi=0.3,enocean=0.1'"""
+    weights = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip().lower()
+        if name not in ENCODERS:
+            raise ValueError(f"Unknown packet type in mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def build_corpus(ap_name, size, mix, encoding, seed):
+    """Pre-generate the frames one AP will cycle through"""
+    random.seed(seed)
+    simulator = DeviceSimulator(ap_name=ap_name)
+    generators = {
+        'ble': simulator.generate_ibeacon_packet,
+        'wifi': simulator.generate_wifi_packet,
+        'enocean': simulator.generate_enocean_packet,
+    }
+    types = list(mix)
+    weights = [mix[t] for t in types]
+    corpus = []
+    for _ in range(size):
+        packet_type = random.choices(types, weights=weights)[0]
+        packet = generators[packet_type]()
+        if encoding == 'protobuf':
+            corpus.append(ENCODERS[packet_type](packet))
+        else:
+            corpus.append(json.dumps(packet))
+    return corpus
+
+
+class ProcessSampler:
+    """Samples CPU time and RSS of a process from /proc (Linux only)"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.ticks = os.sysconf('SC_CLK_TCK')
+        self.peak_rss = 0
+        self.start_cpu = None
+        self.start_wall = None
+
+    def cpu_seconds(self):
+        with open(f'/proc/{self.pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        # utime and stime are fields 14 and 15 of /proc/<pid>/stat
+        return (int(fields[11]) + int(fields[12])) / self.ticks
+
+    def rss_bytes(self):
+        with open(f'/proc/{self.pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def start(self):
+        self.start_cpu = self.cpu_seconds()
+        self.start_wall = time.perf_counter()
+
+    def sample(self):
+        self.peak_rss = max(self.peak_rss, self.rss_bytes())
+
+    def cpu_percent(self):
+        wall = time.perf_counter() - self.start_wall
+        return 100.0 * (self.cpu_seconds() - self.start_cpu) / wall if wall else 0.0
+
+
+class APConnection:
+    """One simulated access point: paced sender plus ack receiver"""
+
+    def __init__(self, uri, corpus, rate, stats):
+        self.uri = uri
+        self.corpus = corpus
+        self.rate = rate
+        self.stats = stats
+        self.in_flight = deque()
+
+    async def run(self, start_at, stop_at, measure_from):
+        async with websockets.connect(self.uri, max_size=None) as websocket:
+            await websocket.recv()  # welcome message
+            receiver = asyncio.create_task(self._receive(websocket, measure_from))
+            try:
+                await self._send(websocket, start_at, stop_at)
+                # Give outstanding acks a moment to arrive
+                deadline = time.perf_counter() + 5.0
+                while self.in_flight and time.perf_counter() < deadline:
+                    await asyncio.sleep(0.01)
+            finally:
+                receiver.cancel()
+
+    async def _send(self, websocket, start_at, stop_at):
+        interval = 1.0 / self.rate
+        corpus = self.corpus
+        index = 0
+        next_send = start_at
+        loop_time = time.perf_counter
+        while next_send < stop_at:
+            delay = next_send - loop_time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.in_flight.append(loop_time())
+            await websocket.send(corpus[index % len(corpus)])
+            self.stats['sent'] += 1
+            index += 1
+            next_send += interval
+
+    async def _receive(self, websocket, measure_from):
+        latencies = self.stats['latencies']
+        async for message in websocket:
+            now = time.perf_counter()
+            if not self.in_flight:
+                continue
+            sent_at = self.in_flight.popleft()
+            if '"error"' in message:
+                self.stats['errors'] += 1
+            else:
+                self.stats['acked'] += 1
+            if sent_at >= measure_from:
+                latencies.append(now - sent_at)
+                self.stats['measured'] += 1
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return float('nan')
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def spawn_server(port, log_level):
+    """Start a child process running only the Aruba WebSocket ingest server"""
+    env = dict(os.environ, ARUBA_WS_HOST='127.0.0.1', ARUBA_WS_PORT=str(port))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen([sys.executable, '-c', SERVER_BOOTSTRAP, log_level],
+                               cwd=root, env=env, stdout=subprocess.PIPE)
+    line = process.stdout.readline().decode().strip()
+    if line != 'ready':
+        process.kill()
+        raise RuntimeError("Ingest server failed to start")
+    return process
+
+
+async def run_benchmark(args):
+    mix = parse_mix(args.mix)
+    uri = f"{args.server.rstrip('/')}/aruba?token={args.token}"
+
+    print(f"Building corpora for {args.aps} APs ({args.encoding}, mix {args.mix})...")
+    rate_per_ap = args.rate / args.aps
+    stats = {'sent': 0, 'acked': 0, 'errors': 0, 'measured': 0, 'latencies': []}
+    connections = [
+        APConnection(uri, build_corpus(f"AP-Load-{i:04d}", args.corpus_size, mix, args.encoding, args.seed + i),
+                     rate_per_ap, stats)
+        for i in range(args.aps)
+    ]
+
+    sampler = ProcessSampler(args.server_pid) if args.server_pid else None
+
+    # Stagger AP phases across one send interval so packets are not synchronized
+    rng = random.Random(args.seed)
+    start_at = time.perf_counter() + 1.0
+    measure_from = start_at + args.warmup
+    stop_at = measure_from + args.duration
+    tasks = [
+        asyncio.create_task(conn.run(start_at + rng.uniform(0, 1.0 / rate_per_ap), stop_at, measure_from))
+        for conn in connections
+    ]
+
+    print(f"Running: {args.rate} pkt/s target, {args.warmup}s warmup, {args.duration}s measured")
+    await asyncio.sleep(max(0.0, measure_from - time.perf_counter()))
+    acked_at_start = stats['acked']
+    if sampler:
+        sampler.start()
+    while time.perf_counter() < stop_at:
+        if sampler:
+            sampler.sample()
+        await asyncio.sleep(0.25)
+    acked_in_window = stats['acked'] - acked_at_start
+    cpu_percent = sampler.cpu_percent() if sampler else None
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    failures = [r for r in results if isinstance(r, Exception)]
+
+    latencies = sorted(stats['latencies'])
+    print()
+    print("Results")
+    print("=======")
+    print(f"APs:               {args.aps} ({len(failures)} failed)")
+    print(f"Sent / acked:      {stats['sent']} / {stats['acked']} ({stats['errors']} error acks)")
+    print(f"Sustained rate:    {acked_in_window / args.duration:,.0f} pkt/s (target {args.rate:,})")
+    print(f"Ack latency p50:   {percentile(latencies, 0.50) * 1000:8.2f} ms")
+    print(f"Ack latency p99:   {percentile(latencies, 0.99) * 1000:8.2f} ms")
+    print(f"Ack latency p999:  {percentile(latencies, 0.999) * 1000:8.2f} ms")
+    if sampler:
+        print(f"Server CPU:        {cpu_percent:.1f}%")
+        print(f"Server peak RSS:   {sampler.peak_rss / (1024 * 1024):.1f} MiB")
+    if failures:
+        print(f"First AP failure:  {failures[0]!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest load generator for the Aruba WebSocket server")
+    parser.add_argument("--server", default="ws://127.0.0.1:9191",
+                        help="WebSocket server URI (default: ws://127.0.0.1:9191)")
+    parser.add_argument("--token", default="1234",
+                        help="Authentication token (default: 1234)")
+    parser.add_argument("--spawn", action="store_true",
+                        help="Start a local ingest server process and measure it")
+    parser.add_argument("--server-pid", type=int, default=None,
+                        help="PID of an external server to sample CPU/RSS from")
+    parser.add_argument("--server-log-level", default="WARNING",
+                        help="Log level for a spawned server (default: WARNING)")
+    parser.add_argument("--aps", type=int, default=100,
+                        help="Number of concurrent simulated APs (default: 100)")
+    parser.add_argument("--rate", type=int, default=2000,
+                        help="Aggregate target packets/sec (default: 2000)")
+    parser.add_argument("--mix", default="ble=0.6,wifi=0.3,enocean=0.1",
+                        help="Protocol mix (default: ble=0.6,wifi=0.3,enocean=0.1)")
+    parser.add_argument("--encoding", choices=["json", "protobuf"], default="json",
+                        help="Frame encoding (default: json)")
+    parser.add_argument("--duration", type=float, default=20,
+                        help="Measured duration in seconds (default: 20)")
+    parser.add_argument("--warmup", type=float, default=3,
+                        help="Warmup seconds excluded from results (default: 3)")
+    parser.add_argument("--corpus-size", type=int, default=200,
+                        help="Pre-generated frames per AP (default: 200)")
+    parser.add_argument("--seed", type=int, default=1,
+                        help="Random seed for reproducible corpora (default: 1)")
+    args = parser.parse_args()
+
+    # Keep the generator's own logging out of the measurement
+    logging.getLogger('aruba-iot').setLevel(logging.WARNING)
+
+    server_process = None
+    if args.spawn:
+        port = int(args.server.rsplit(':', 1)[1].split('/')[0])
+        server_process = spawn_server(port, args.server_log_level)
+        args.server_pid = server_process.pid
+    try:
+        asyncio.run(run_benchmark(args))
+    finally:
+        if server_process:
+            server_process.terminate()
+            server_process.wait()
+
+
+if __name__ == "__main__":
+    main()
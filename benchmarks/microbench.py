@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+In-process micro-benchmarks for the ingest hot path
+
+Measures the per-call cost of protobuf_utils codecs and the telemetry
+handler's hot functions on fixed, seeded corpora, and compares the results
+with stored baselines so performance changes to the ingest path are visible.
+
+Examples:
+    # Run and compare with benchmarks/baselines.json
+    python benchmarks/microbench.py
+
+    # Record new baselines (after an intentional change, on the same machine)
+    python benchmarks/microbench.py --save
+
+    # Only some benchmarks, failing on regressions above 10%
+    python benchmarks/microbench.py --filter decode --threshold 0.10
+
+    # The same benchmarks on the pure-Python protobuf backend
+    python benchmarks/microbench.py --backend python --baseline benchmarks/baselines-python.json
+
+Exits with status 1 when any benchmark regressed beyond the threshold.
+Baselines are machine- and backend-specific; record and compare them on the
+same host with the same protobuf backend.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+CORPUS_SIZE = 500
+
+
+def build_corpora(seed):
+    """Build the fixed packet corpora shared by all benchmarks"""
+    from test_multi_protocol import DeviceSimulator
+    from protobuf_utils import (encode_ibeacon_packet, encode_wifi_packet, encode_ibeacon_collection,
+                                encode_packet_stream, encode_ibeacon_packet_v2, encode_wifi_packet_v2,
+                                encode_enocean_packet_v2, STREAM_TYPE_IBEACON_V2, STREAM_TYPE_WIFI_V2,
+                                STREAM_TYPE_ENOCEAN_V2)
+
+    random.seed(seed)
+    simulators = [DeviceSimulator(ap_name=f"AP-Bench-{i}") for i in range(8)]
+    ibeacons = [random.choice(simulators).generate_ibeacon_packet() for _ in range(CORPUS_SIZE)]
+    wifi = [random.choice(simulators).generate_wifi_packet() for _ in range(CORPUS_SIZE)]
+    enocean = [random.choice(simulators).generate_enocean_packet() for _ in range(CORPUS_SIZE)]
+
+    mixed = ibeacons[:300] + wifi[:150] + enocean[:50]
+    random.shuffle(mixed)
+    stream_encoders = {'ble': (STREAM_TYPE_IBEACON_V2, encode_ibeacon_packet_v2),
+                       'wifi': (STREAM_TYPE_WIFI_V2, encode_wifi_packet_v2),
+                       'enocean': (STREAM_TYPE_ENOCEAN_V2, encode_enocean_packet_v2)}
+    stream_messages = [(stream_encoders[p['type']][0], stream_encoders[p['type']][1](p)) for p in mixed]
+
+    return {
+        'ibeacon_dicts': ibeacons,
+        'wifi_binary': [encode_wifi_packet(p) for p in wifi],
+        'ibeacon_collections': [encode_ibeacon_collection(ibeacons[i:i + 50])
+                                for i in range(0, CORPUS_SIZE, 50)],
+        'mixed_json': [json.dumps(p) for p in mixed],
+        'analytics_args': [(p['deviceId'], p['accessPoint'], p['rssi'], time.time_ns(), p['macAddress'])
+                           for p in ibeacons],
+        'enocean_telegrams': [(p['eep'], p['payload']) for p in enocean],
+        'v2_streams': [encode_packet_stream(stream_messages[i:i + 100])
+                       for i in range(0, len(stream_messages), 100)],
+    }
+
+
+def new_handler():
+    """Create a telemetry handler isolated from the global one"""
+    from app import ArubaIoTTelemetryHandler
+    from dedup import DuplicateSuppressor
+
+    handler = ArubaIoTTelemetryHandler()
+    # Replaying a fixed corpus would otherwise be collapsed as cross-AP duplicates
+    handler.packet_dedup = DuplicateSuppressor(window_ms=0)
+    return handler
+
+
+def define_benchmarks(corpora):
+    """Return {name: (callable, argument list)} for every benchmark"""
+    import enocean_eep
+    import json_responses
+    import protobuf_utils
+
+    telemetry_handler = new_handler()
+    analytics_handler = new_handler()
+    return {
+        'encode_ibeacon_packet': (protobuf_utils.encode_ibeacon_packet, corpora['ibeacon_dicts']),
+        'decode_wifi_packet': (protobuf_utils.decode_wifi_packet, corpora['wifi_binary']),
+        'decode_ibeacon_collection[50]': (protobuf_utils.decode_ibeacon_collection, corpora['ibeacon_collections']),
+        'decode_packet_stream[v2 100]': (protobuf_utils.decode_packet_stream, corpora['v2_streams']),
+        'is_ibeacon_data': (protobuf_utils.is_ibeacon_data, corpora['ibeacon_dicts']),
+        'process_telemetry[json mix]': (telemetry_handler.process_telemetry, corpora['mixed_json']),
+        '_update_ble_analytics': (lambda args: analytics_handler._update_ble_analytics(*args),
+                                  corpora['analytics_args']),
+        'decode_eep': (lambda args: enocean_eep.decode_eep(*args), corpora['enocean_telegrams']),
+        'json_responses.dumps': (json_responses.dumps, corpora['ibeacon_dicts']),
+    }
+
+
+def measure(func, inputs, min_time, repeats):
+    """Best-of-N per-call time in nanoseconds"""
+    # Warm up caches and bring stateful handlers to steady state
+    for item in inputs:
+        func(item)
+
+    # Calibrate how many passes over the corpus fill min_time
+    passes = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(passes):
+            for item in inputs:
+                func(item)
+        elapsed = time.perf_counter_ns() - start
+        if elapsed >= min_time * 1e9:
+            break
+        passes *= 2
+
+    best = elapsed / (passes * len(inputs))
+    for _ in range(repeats - 1):
+        start = time.perf_counter_ns()
+        for _ in range(passes):
+            for item in inputs:
+                func(item)
+        best = min(best, (time.perf_counter_ns() - start) / (passes * len(inputs)))
+    return best
+
+
+def load_baseline(path, backend):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        document = json.load(f)
+    recorded = document.get('protobuf_backend')
+    if recorded and recorded != backend:
+        print(f"Baseline {path} was recorded on the {recorded} protobuf backend, not {backend}; not comparing\n")
+        return {}
+    return document.get('results', {})
+
+
+def save_baseline(path, results, backend):
+    document = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'protobuf_backend': backend,
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': {name: round(value, 1) for name, value in results.items()},
+    }
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+        f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the ingest hot path")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="Baseline file (default: benchmarks/baselines.json)")
+    parser.add_argument("--save", action="store_true",
+                        help="Write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Relative slowdown flagged as a regression (default: 0.15)")
+    parser.add_argument("--filter", default="",
+                        help="Only run benchmarks whose name contains this string")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="Minimum seconds per measurement (default: 0.2)")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="Measurements per benchmark, best is kept (default: 5)")
+    parser.add_argument("--log-level", default="WARNING",
+                        help="Log level while benchmarking (default: WARNING)")
+    parser.add_argument("--seed", type=int, default=7,
+                        help="Corpus random seed (default: 7)")
+    parser.add_argument("--backend", choices=("upb", "cpp", "python"), default=None,
+                        help="Protobuf runtime backend to benchmark (default: the runtime's own choice)")
+    args = parser.parse_args()
+
+    if args.backend:
+        # Read by the protobuf runtime when it is first imported, below
+        os.environ['PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION'] = args.backend
+    import app  # noqa: F401  (configures logging on import)
+    from protobuf_utils import preload_descriptors, protobuf_backend
+    logging.getLogger().setLevel(args.log_level)
+
+    try:
+        # An unavailable backend only fails once the descriptors are loaded
+        preload_descriptors()
+        backend = protobuf_backend()
+    except ImportError as e:
+        parser.error(f"protobuf backend {args.backend} is not available: {e}")
+    if args.backend and backend != args.backend:
+        parser.error(f"protobuf backend {args.backend} is not available (runtime uses {backend})")
+    print(f"protobuf backend: {backend}\n")
+
+    corpora = build_corpora(args.seed)
+    benchmarks = define_benchmarks(corpora)
+    baseline = load_baseline(args.baseline, backend)
+
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<32} {'ns/call':>12} {'baseline':>12} {'change':>9}")
+    for name, (func, inputs) in benchmarks.items():
+        if args.filter and args.filter not in name:
+            continue
+        value = measure(func, inputs, args.min_time, args.repeats)
+        results[name] = value
+        reference = baseline.get(name)
+        if reference:
+            change = (value - reference) / reference
+            flag = '  REGRESSION' if change > args.threshold else ''
+            if flag:
+                regressions.append(name)
+            print(f"{name:<32} {value:12,.0f} {reference:12,.0f} {change:+8.1%}{flag}")
+        else:
+            print(f"{name:<32} {value:12,.0f} {'-':>12} {'-':>9}")
+
+    if args.save:
+        if args.filter:
+            merged = dict(baseline)
+            merged.update(results)
+            results = merged
+        save_baseline(args.baseline, results, backend)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if regressions and not args.save:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
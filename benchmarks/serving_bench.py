@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Startup and HTTP throughput benchmark for the server launch modes
+
+Starts the full server (dashboard API, SocketIO and Aruba WebSocket listener)
+in one of its launch modes, measures the time until the HTTP API answers and
+the AP listener accepts connections, fills the telemetry buffer through the
+listener, then drives the JSON API with concurrent keep-alive clients for a
+fixed duration.
+
+Modes:
+    dev       python app.py (Flask-SocketIO threading + Werkzeug)
+    gunicorn  gunicorn -c gunicorn.conf.py wsgi:application
+    async     SERVER_MODE=async python app.py (requires aiohttp)
+
+Examples:
+    # Compare the development server with the gunicorn entry point
+    python benchmarks/serving_bench.py --mode dev
+    python benchmarks/serving_bench.py --mode gunicorn --clients 32
+
+    # Heavier endpoint, compressed responses
+    python benchmarks/serving_bench.py --mode gunicorn --path '/api/telemetry?limit=500' --gzip
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import websockets
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from test_client import ArubaAPSimulator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = {
+    'dev': [sys.executable, 'app.py'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:application'],
+    'async': [sys.executable, 'app.py'],
+}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return float('nan')
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def spawn(mode, http_port, ws_port):
+    env = dict(os.environ, FLASK_HOST='127.0.0.1', FLASK_PORT=str(http_port), FLASK_DEBUG='False',
+               ARUBA_WS_HOST='127.0.0.1', ARUBA_WS_PORT=str(ws_port))
+    if mode == 'async':
+        env['SERVER_MODE'] = 'async'
+    return subprocess.Popen(COMMANDS[mode], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(process, http_port, ws_port, timeout):
+    """Seconds until GET /api/stats succeeds, and until the AP listener accepts connections"""
+    started = time.perf_counter()
+    http_ready = ws_ready = None
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup with code {process.returncode}")
+        if http_ready is None:
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', http_port, timeout=1)
+                connection.request('GET', '/api/stats')
+                if connection.getresponse().status == 200:
+                    http_ready = time.perf_counter() - started
+                connection.close()
+            except OSError:
+                pass
+        if ws_ready is None:
+            try:
+                socket.create_connection(('127.0.0.1', ws_port), timeout=1).close()
+                ws_ready = time.perf_counter() - started
+            except OSError:
+                pass
+        if http_ready is not None and ws_ready is not None:
+            return http_ready, ws_ready
+        time.sleep(0.02)
+    raise RuntimeError(f"Server not ready after {timeout}s")
+
+
+async def fill(ws_port, packets, aps):
+    """Send packets through the AP listener so the API has data to serve"""
+    async def run_ap(index, count):
+        simulator = ArubaAPSimulator(f"AP-Bench-{index:03d}")
+        async with websockets.connect(f"ws://127.0.0.1:{ws_port}/aruba?token=1234") as websocket:
+            await websocket.recv()  # welcome
+            for _ in range(count):
+                await websocket.send(json.dumps(simulator.generate_ble_packet()))
+                await websocket.recv()
+    await asyncio.gather(*(run_ap(i, packets // aps) for i in range(aps)))
+
+
+def drive(http_port, paths, headers, clients, duration):
+    """Issue requests from concurrent keep-alive clients; returns (count, errors, latencies)"""
+    stop_at = time.perf_counter() + duration
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def client(offset):
+        connection = http.client.HTTPConnection('127.0.0.1', http_port, timeout=10)
+        local = []
+        failed = 0
+        i = offset
+        while time.perf_counter() < stop_at:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', http_port, timeout=10)
+                continue
+            local.append(time.perf_counter() - start)
+        connection.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies), errors[0], sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup and HTTP throughput benchmark for the server launch modes")
+    parser.add_argument("--mode", choices=sorted(COMMANDS), default="gunicorn",
+                        help="Launch mode to benchmark (default: gunicorn)")
+    parser.add_argument("--http-port", type=int, default=5077,
+                        help="HTTP port for the spawned server (default: 5077)")
+    parser.add_argument("--ws-port", type=int, default=9477,
+                        help="Aruba WebSocket port for the spawned server (default: 9477)")
+    parser.add_argument("--packets", type=int, default=2000,
+                        help="Packets ingested before the HTTP measurement (default: 2000)")
+    parser.add_argument("--aps", type=int, default=10,
+                        help="Simulated APs used to ingest the packets (default: 10)")
+    parser.add_argument("--path", action="append", dest="paths",
+                        help="API path to request; repeatable (default: /api/stats and /api/devices)")
+    parser.add_argument("--clients", type=int, default=16,
+                        help="Concurrent keep-alive HTTP clients (default: 16)")
+    parser.add_argument("--duration", type=float, default=10,
+                        help="Measured duration in seconds (default: 10)")
+    parser.add_argument("--gzip", action="store_true",
+                        help="Send Accept-Encoding: gzip")
+    parser.add_argument("--startup-timeout", type=float, default=60,
+                        help="Seconds to wait for the server to start (default: 60)")
+    args = parser.parse_args()
+    paths = args.paths or ['/api/stats', '/api/devices']
+    headers = {'Accept-Encoding': 'gzip'} if args.gzip else {}
+
+    process = spawn(args.mode, args.http_port, args.ws_port)
+    try:
+        http_ready, ws_ready = wait_ready(process, args.http_port, args.ws_port, args.startup_timeout)
+        fill_start = time.perf_counter()
+        asyncio.run(fill(args.ws_port, args.packets, args.aps))
+        fill_seconds = time.perf_counter() - fill_start
+        # Warm the response cache and connections before measuring
+        drive(args.http_port, paths, headers, args.clients, 1.0)
+        count, errors, latencies = drive(args.http_port, paths, headers, args.clients, args.duration)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    print()
+    print("Results")
+    print("=======")
+    print(f"Mode:              {args.mode}")
+    print(f"HTTP ready after:  {http_ready * 1000:8.0f} ms")
+    print(f"AP listener ready: {ws_ready * 1000:8.0f} ms")
+    print(f"Ingest fill:       {args.packets} packets in {fill_seconds:.2f}s")
+    print(f"Paths:             {', '.join(paths)}{' (gzip)' if args.gzip else ''}")
+    print(f"Requests:          {count} ok, {errors} errors, {args.clients} clients")
+    print(f"Throughput:        {count / args.duration:,.0f} req/s")
+    print(f"Latency p50:       {percentile(latencies, 0.50) * 1000:8.2f} ms")
+    print(f"Latency p99:       {percentile(latencies, 0.99) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
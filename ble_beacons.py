@@ -0,0 +1,213 @@
+"""
+BLE beacon advertisement parsing for Aruba IoT Telemetry Server
+
+Decodes the binary beacon formats carried in BLE advertisements:
+
+- iBeacon: Apple manufacturer data (company 0x004C, type 0x02, length 0x15)
+- AltBeacon: manufacturer data with the 0xBEAC beacon code (any company ID)
+- Eddystone UID, URL and TLM: service data for the 0xFEAA service UUID
+
+Payloads are accepted as hex strings (as forwarded by Aruba APs) or bytes.
+Classification is a few byte comparisons followed by one ``struct`` unpack,
+and results are cached per unique payload, since beacons repeat the same
+advertisement many times per second. Cached results are shared and must be
+treated as read-only.
+"""
+import logging
+import struct
+from functools import lru_cache
+from typing import Any, Dict, Optional, Union
+
+logger = logging.getLogger('aruba-iot')
+
+# Number of distinct payloads whose parse result is cached
+BEACON_CACHE_SIZE = 8192
+
+IBEACON_PREFIX = b'\x4c\x00\x02\x15'  # Apple company ID (little-endian), iBeacon type and length
+ALTBEACON_CODE = b'\xbe\xac'
+EDDYSTONE_SERVICE_UUID = 0xFEAA
+
+EDDYSTONE_UID = 0x00
+EDDYSTONE_URL = 0x10
+EDDYSTONE_TLM = 0x20
+
+# uuid(16) major(2) minor(2) measured power(1), after the 4-byte prefix
+_IBEACON = struct.Struct('>16sHHb')
+# company ID(2, little-endian), beacon code(2), beacon ID(20), reference RSSI(1), reserved(1)
+_ALTBEACON = struct.Struct('<H2s20sbB')
+# frame type(1), TX power at 0 m(1), namespace(10), instance(6)
+_EDDYSTONE_UID = struct.Struct('>Bb10s6s')
+# frame type(1), version(1), battery mV(2), temperature 8.8 fixed point(2), PDU count(4), uptime 0.1 s(4)
+_EDDYSTONE_TLM = struct.Struct('>BBHhII')
+
+_EDDYSTONE_URL_SCHEMES = ('http://www.', 'https://www.', 'http://', 'https://')
+_EDDYSTONE_URL_CODES = ('.com/', '.org/', '.edu/', '.net/', '.info/', '.biz/', '.gov/',
+                        '.com', '.org', '.edu', '.net', '.info', '.biz', '.gov')
+
+Payload = Union[str, bytes, bytearray, memoryview]
+
+
+def _to_bytes(payload: Payload) -> Optional[bytes]:
+    """Convert a hex string or bytes-like payload to bytes (None if invalid)"""
+    if isinstance(payload, bytes):
+        return payload
+    if isinstance(payload, (bytearray, memoryview)):
+        return bytes(payload)
+    if isinstance(payload, str):
+        if payload[:2] in ('0x', '0X'):
+            payload = payload[2:]
+        try:
+            return bytes.fromhex(payload)
+        except ValueError:
+            return None
+    return None
+
+
+def _format_uuid(raw: bytes) -> str:
+    digits = raw.hex()
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+
+@lru_cache(maxsize=BEACON_CACHE_SIZE)
+def _parse_manufacturer_data(payload: Union[str, bytes]) -> Optional[Dict[str, Any]]:
+    raw = _to_bytes(payload)
+    if raw is None:
+        return None
+
+    if raw[:4] == IBEACON_PREFIX and len(raw) >= 25:
+        uuid, major, minor, tx_power = _IBEACON.unpack_from(raw, 4)
+        return {'format': 'ibeacon', 'uuid': _format_uuid(uuid),
+                'major': major, 'minor': minor, 'tx_power': tx_power}
+
+    if raw[2:4] == ALTBEACON_CODE and len(raw) >= 26:
+        company_id, _, beacon_id, reference_rssi, reserved = _ALTBEACON.unpack_from(raw)
+        return {'format': 'altbeacon', 'company_id': company_id, 'beacon_id': beacon_id.hex(),
+                'uuid': _format_uuid(beacon_id[:16]),
+                'major': int.from_bytes(beacon_id[16:18], 'big'),
+                'minor': int.from_bytes(beacon_id[18:20], 'big'),
+                'tx_power': reference_rssi, 'mfg_reserved': reserved}
+
+    return None
+
+
+def parse_manufacturer_data(payload: Payload) -> Optional[Dict[str, Any]]:
+    """
+    Parse BLE manufacturer-specific data as an iBeacon or AltBeacon
+
+    Args:
+        payload: Manufacturer data (company ID first), as hex string or bytes
+
+    Returns:
+        Read-only dictionary with 'format' and the decoded beacon fields,
+        or None if the payload is not a recognized beacon
+    """
+    if not payload:
+        return None
+    if isinstance(payload, (bytearray, memoryview)):
+        payload = bytes(payload)
+    elif not isinstance(payload, (str, bytes)):
+        return None
+    return _parse_manufacturer_data(payload)
+
+
+def _decode_eddystone_url(raw: bytes) -> Optional[str]:
+    if len(raw) < 3 or raw[2] >= len(_EDDYSTONE_URL_SCHEMES):
+        return None
+    parts = [_EDDYSTONE_URL_SCHEMES[raw[2]]]
+    for byte in raw[3:]:
+        if byte < len(_EDDYSTONE_URL_CODES):
+            parts.append(_EDDYSTONE_URL_CODES[byte])
+        elif 0x20 < byte < 0x7f:
+            parts.append(chr(byte))
+        else:
+            return None
+    return ''.join(parts)
+
+
+@lru_cache(maxsize=BEACON_CACHE_SIZE)
+def _parse_eddystone(payload: Union[str, bytes]) -> Optional[Dict[str, Any]]:
+    raw = _to_bytes(payload)
+    if not raw:
+        return None
+    # Accept service data with or without the leading 16-bit service UUID
+    if raw[:2] == b'\xaa\xfe':
+        raw = raw[2:]
+    if not raw:
+        return None
+
+    frame_type = raw[0]
+    if frame_type == EDDYSTONE_UID and len(raw) >= 18:
+        _, tx_power, namespace, instance = _EDDYSTONE_UID.unpack_from(raw)
+        return {'format': 'eddystone_uid', 'tx_power': tx_power,
+                'namespace': namespace.hex(), 'instance': instance.hex()}
+
+    if frame_type == EDDYSTONE_URL and len(raw) >= 3:
+        url = _decode_eddystone_url(raw)
+        if url is None:
+            return None
+        return {'format': 'eddystone_url', 'tx_power': struct.unpack_from('b', raw, 1)[0], 'url': url}
+
+    if frame_type == EDDYSTONE_TLM and len(raw) >= 14 and raw[1] == 0x00:
+        _, _, battery_mv, temperature, adv_count, uptime = _EDDYSTONE_TLM.unpack_from(raw)
+        return {'format': 'eddystone_tlm',
+                'battery_mv': battery_mv or None,
+                # 0x8000 means the beacon has no temperature sensor
+                'temperature': None if temperature == -0x8000 else temperature / 256.0,
+                'adv_count': adv_count,
+                'uptime_s': uptime / 10.0}
+
+    return None
+
+
+def parse_eddystone(payload: Payload) -> Optional[Dict[str, Any]]:
+    """
+    Parse Eddystone service data (service UUID 0xFEAA)
+
+    Args:
+        payload: Service data, as hex string or bytes, optionally prefixed
+            with the little-endian service UUID
+
+    Returns:
+        Read-only dictionary with 'format' and the decoded frame fields,
+        or None if the payload is not a recognized Eddystone frame
+    """
+    if not payload:
+        return None
+    if isinstance(payload, (bytearray, memoryview)):
+        payload = bytes(payload)
+    elif not isinstance(payload, (str, bytes)):
+        return None
+    return _parse_eddystone(payload)
+
+
+def _eddystone_service_data(service_data: Any) -> Optional[Payload]:
+    """Find the 0xFEAA entry in an AP-reported serviceData field"""
+    if isinstance(service_data, dict):
+        for key, value in service_data.items():
+            if f"{EDDYSTONE_SERVICE_UUID:04x}" in str(key).lower():
+                return value
+        return None
+    # A single hex string is taken as UUID-prefixed service data
+    if isinstance(service_data, str) and service_data[:4].lower() == 'aafe':
+        return service_data
+    return None
+
+
+def parse_beacon(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Identify and decode the beacon format of a BLE packet
+
+    Args:
+        data: BLE packet dictionary as sent by the AP ('manufacturerData'
+            and/or 'serviceData')
+
+    Returns:
+        Read-only dictionary with 'format' and the decoded fields, or None
+    """
+    beacon = parse_manufacturer_data(data.get('manufacturerData'))
+    if beacon is None:
+        service_data = data.get('serviceData')
+        if service_data:
+            beacon = parse_eddystone(_eddystone_service_data(service_data))
+    return beacon
+
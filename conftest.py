@@ -0,0 +1,14 @@
+"""
+pytest configuration for Aruba IoT Telemetry Server
+
+The unit tests live next to the modules they cover (test_<module>.py). The
+other test_*.py scripts are clients for a running server and are run by
+hand, so they are not collected.
+"""
+collect_ignore = [
+    'test_client.py',
+    'test_ibeacon_protobuf.py',
+    'test_multi_protocol.py',
+    'test_token_connection.py',
+    'test_websocket.py',
+]
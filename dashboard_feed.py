@@ -0,0 +1,114 @@
+"""
+Delta-encoded dashboard updates for Aruba IoT Telemetry Server
+
+The dashboard used to re-fetch every registry on a timer and re-render full
+tables. ``DashboardFeed`` instead builds, at a bounded rate, a delta holding
+only the entries that changed since the previous delta (taken from the
+``RegistryIndex`` change versions), the small stats block and the telemetry
+records stored since then. Clients apply deltas to their local copy and
+request a full snapshot when they connect or miss a delta.
+
+Message formats (SocketIO events)::
+
+    dashboard_snapshot: {'version': V, '<collection>': {key: entry, ...},
+                         'stats': {...}, 'telemetry': [...]}
+    dashboard_delta:    {'base_version': B, 'version': V,
+                         '<collection>': {'upserts': {key: entry}, 'removed': [key]},
+                         'stats': {...}, 'telemetry': [...]}
+
+A client holding version C may apply a delta when ``C >= base_version``
+(upserts carry complete entries, so re-applying one is harmless); otherwise
+it has missed an update and must resync from a snapshot.
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from telemetry_store import ChangeClock, Query, RegistryIndex, TelemetryBuffer
+
+logger = logging.getLogger('aruba-iot')
+
+# registry getter, index, entry view (key, stored entry) -> API representation
+Collection = Tuple[Callable[[], Dict[Any, Any]], RegistryIndex, Callable[[Any, Any], Any]]
+
+
+class DashboardFeed:
+    """Builds dashboard snapshots and deltas from the handler's change-tracked registries"""
+
+    def __init__(self, clock: ChangeClock, collections: Dict[str, Collection],
+                 stats: Callable[[], Dict[str, Any]], telemetry: Optional[TelemetryBuffer] = None,
+                 telemetry_view: Callable[[Dict[str, Any]], Any] = dict, telemetry_per_update: int = 20):
+        """
+        Args:
+            clock: Change clock shared by the collections' indexes
+            collections: Name -> (registry getter, index, entry view)
+            stats: Returns the stats block sent with every update
+            telemetry: Buffer whose new records are included in updates
+            telemetry_view: Converts a stored record to its API representation
+            telemetry_per_update: Maximum telemetry records per update
+        """
+        self.clock = clock
+        self.collections = collections
+        self.stats = stats
+        self.telemetry = telemetry
+        self.telemetry_view = telemetry_view
+        self.telemetry_per_update = telemetry_per_update
+        self.version = clock.version
+        self._telemetry_seq = telemetry.last_seq if telemetry is not None else 0
+        self._lock = threading.Lock()
+
+    def _recent_telemetry(self, since: Optional[int]) -> Tuple[List[Any], int]:
+        if self.telemetry is None:
+            return [], 0
+        query = Query(limit=self.telemetry_per_update, since=since)
+        if since is None:
+            records, _ = self.telemetry.query(query)
+            return [self.telemetry_view(r) for r in records], self.telemetry.last_seq
+        # Only the newest records matter to a live view; skip over a backlog
+        since = max(since, self.telemetry.last_seq - self.telemetry_per_update)
+        records, headers = self.telemetry.query(Query(limit=self.telemetry_per_update, since=since))
+        return [self.telemetry_view(r) for r in records], int(headers['X-Next-Since'])
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Full dashboard state at the current version (O(fleet); sent on connect and resync)"""
+        # Read the version first: changes made while building are resent by the next delta
+        message = {'version': self.clock.version}
+        for name, (registry, _, view) in self.collections.items():
+            message[name] = {key: view(key, value) for key, value in list(registry().items())}
+        message['stats'] = self.stats()
+        message['telemetry'], _ = self._recent_telemetry(None)
+        return message
+
+    def delta(self) -> Optional[Dict[str, Any]]:
+        """
+        Changes since the previous delta, or None if nothing changed
+
+        Costs O(changed entries + new telemetry records).
+        """
+        with self._lock:
+            version = self.clock.version
+            base = self.version
+            last_seq = self.telemetry.last_seq if self.telemetry is not None else 0
+            if version == base and last_seq == self._telemetry_seq:
+                return None
+            message = {'base_version': base, 'version': version}
+            for name, (registry, index, view) in self.collections.items():
+                updated, removed = index.changed_since(base)
+                entries = registry()
+                upserts = {}
+                for key in updated:
+                    value = entries.get(key)
+                    if value is not None:
+                        upserts[key] = view(key, value)
+                message[name] = {'upserts': upserts, 'removed': removed}
+            message['stats'] = self.stats()
+            message['telemetry'], self._telemetry_seq = self._recent_telemetry(self._telemetry_seq)
+            self.version = version
+        return message
+
+    def skip(self) -> None:
+        """Advance past pending changes without building a delta (no clients connected)"""
+        with self._lock:
+            self.version = self.clock.version
+            if self.telemetry is not None:
+                self._telemetry_seq = self.telemetry.last_seq
@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+"""
+Dead-letter store and replay tool for failed telemetry frames
+
+Frames the server cannot process are appended, exactly as received, to a
+bounded on-disk store together with the AP they came from, the receive time
+and the error class. The store is off unless ``DEAD_LETTER_DIR`` names a
+directory (preferably an absolute path). Frames are handed to a background
+writer thread through a bounded queue, so ingest never waits for the disk;
+frames arriving while the queue is full are counted and dropped. Once a
+parser fix is deployed, the replay tool re-feeds them to the server at full
+speed, so a bad-data incident can be reprocessed in bulk without the APs
+sending anything again.
+
+Store layout: a directory of append-only segment files
+(``segment-00000001.dlq``, ...). The oldest segments are deleted once the
+store exceeds ``DEAD_LETTER_MAX_BYTES``. Each record is a 21-byte header
+followed by the AP/source name, the error class, the error message and the
+frame itself:
+
+    crc32 u32 | frame length u32 | received_ns i64 | kind u8 (0 text, 1 binary)
+    | source length u8 | error class length u8 | message length u16
+
+The CRC covers everything after it, so a record torn by a crash ends the
+segment instead of being replayed as garbage.
+
+Examples:
+    # List dead letters, newest last
+    DEAD_LETTER_DIR=/var/lib/aruba-iot/dead_letters python dead_letter.py list
+
+    # Check which frames the current parser accepts, without sending them
+    python dead_letter.py --dir /var/lib/aruba-iot/dead_letters replay --dry-run
+
+    # Replay JSON parse failures to a running server (the replay token is one
+    # of the server's ARUBA_REPLAY_TOKENS)
+    python dead_letter.py --dir /var/lib/aruba-iot/dead_letters replay \
+        --server "ws://localhost:9191/aruba?token=1234" --replay-token "$ARUBA_REPLAY_TOKEN" \
+        --error JSONDecodeError
+"""
+import argparse
+import asyncio
+import atexit
+import json
+import logging
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import quote
+
+from timestamps import format_timestamp, now_ns
+
+logger = logging.getLogger('aruba-iot')
+
+# Directory of the store (relative paths resolve against the working
+# directory); empty, the default, disables dead-lettering
+DEAD_LETTER_DIR = os.getenv('DEAD_LETTER_DIR', '')
+# Total size kept on disk; the oldest segments are deleted beyond it
+DEAD_LETTER_MAX_BYTES = int(os.getenv('DEAD_LETTER_MAX_BYTES', 64 * 1024 * 1024))
+# Size at which a new segment file is started
+DEAD_LETTER_SEGMENT_BYTES = int(os.getenv('DEAD_LETTER_SEGMENT_BYTES', 4 * 1024 * 1024))
+# Frames waiting for the writer thread; further frames are dropped
+DEAD_LETTER_QUEUE_SIZE = int(os.getenv('DEAD_LETTER_QUEUE_SIZE', 1024))
+
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.dlq'
+
+# crc32, frame length, received_ns, kind, source length, error class length, message length
+_HEADER = struct.Struct('<IIqBBBH')
+_KIND_TEXT = 0
+_KIND_BINARY = 1
+_MAX_MESSAGE_BYTES = 1024
+
+
+class DeadLetter:
+    """A failed frame read back from the store"""
+
+    __slots__ = ('received_ns', 'source', 'error_class', 'message', 'frame', 'segment', 'offset')
+
+    def __init__(self, received_ns: int, source: Optional[str], error_class: str, message: str,
+                 frame: Union[str, bytes], segment: str, offset: int):
+        self.received_ns = received_ns
+        self.source = source
+        self.error_class = error_class
+        self.message = message
+        self.frame = frame
+        self.segment = segment
+        self.offset = offset
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            'received_at': format_timestamp(self.received_ns),
+            'source': self.source,
+            'error_class': self.error_class,
+            'message': self.message,
+            'binary': isinstance(self.frame, bytes),
+            'size': len(self.frame),
+            'segment': self.segment,
+            'offset': self.offset,
+        }
+
+
+def _encode_field(value: Optional[str], limit: int) -> bytes:
+    """UTF-8 encode a metadata field, truncated to at most limit bytes"""
+    data = (value or '').encode('utf-8', 'replace')
+    if len(data) > limit:
+        data = data[:limit].decode('utf-8', 'ignore').encode('utf-8')
+    return data
+
+
+def encode_record(frame: Union[str, bytes], received_ns: int, source: Optional[str],
+                  error_class: str, message: str) -> bytes:
+    """Frame one dead letter for the store"""
+    if isinstance(frame, bytes):
+        kind, payload = _KIND_BINARY, frame
+    else:
+        kind, payload = _KIND_TEXT, frame.encode('utf-8', 'surrogatepass')
+    source_bytes = _encode_field(source, 255)
+    class_bytes = _encode_field(error_class, 255)
+    message_bytes = _encode_field(message, _MAX_MESSAGE_BYTES)
+    body = b''.join((_HEADER.pack(0, len(payload), received_ns, kind, len(source_bytes), len(class_bytes),
+                                  len(message_bytes))[4:], source_bytes, class_bytes, message_bytes, payload))
+    return struct.pack('<I', zlib.crc32(body)) + body
+
+
+def segment_paths(directory: str) -> List[str]:
+    """Segment files of a store, oldest first"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    names = sorted(name for name in names if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+    return [os.path.join(directory, name) for name in names]
+
+
+def _segment_index(path: str) -> int:
+    return int(os.path.basename(path)[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+
+class DeadLetterStore:
+    """
+    Bounded on-disk store of failed frames
+
+    add() only queues a frame; a writer thread, started on first use, encodes
+    it and appends it to the newest segment with one write per record, so a
+    crash loses at most the queued frames and the record being written. A new
+    segment is started when the current one reaches segment_bytes and on
+    every start, so a torn record at the end of a previous run is never
+    appended to.
+    """
+
+    def __init__(self, directory: str = DEAD_LETTER_DIR, max_bytes: int = DEAD_LETTER_MAX_BYTES,
+                 segment_bytes: int = DEAD_LETTER_SEGMENT_BYTES, queue_size: int = DEAD_LETTER_QUEUE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = max(1, min(segment_bytes, max_bytes))
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_size = 0
+        self._segments = {path: os.path.getsize(path) for path in segment_paths(directory)}
+        self._next_index = max((_segment_index(path) for path in self._segments), default=0) + 1
+        self.records_written = 0
+        self.write_errors = 0
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(max(1, queue_size))
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional['DeadLetterStore']:
+        """Store configured by DEAD_LETTER_DIR, or None if dead-lettering is disabled"""
+        return cls(DEAD_LETTER_DIR) if DEAD_LETTER_DIR else None
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._segments.values())
+
+    def add(self, frame: Union[str, bytes], error_class: str, message: str = '',
+            source: Optional[str] = None, received_ns: Optional[int] = None) -> bool:
+        """
+        Queue a failed frame for the writer thread
+
+        Args:
+            frame: The frame as received (text or binary)
+            error_class: Class of the error that rejected the frame
+            message: Error message
+            source: AP name or address the frame came from
+            received_ns: Receive time in epoch nanoseconds (now if omitted)
+
+        Returns:
+            Whether the frame was queued; it is dropped (and counted) when the
+            queue is full. Disk errors are logged by the writer, not raised
+        """
+        if self._writer is None:
+            self._start_writer()
+        try:
+            self._queue.put_nowait((frame, received_ns if received_ns is not None else now_ns(),
+                                    source, error_class, message))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"DeadLetterStore: Writer queue full, dropped {self.dropped} frames")
+            return False
+        return True
+
+    def _start_writer(self) -> None:
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, name='dead-letters', daemon=True)
+                self._writer.start()
+                # Write out what is queued when the process exits normally
+                atexit.register(self.close)
+
+    def _run_writer(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self.write(encode_record(item[0], item[1], item[2], item[3], item[4]))
+            except Exception as e:
+                logger.error(f"DeadLetterStore: Failed to encode dead letter: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Wait until the writer has written every queued frame"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def write(self, record: bytes) -> bool:
+        """
+        Append an encoded record (see encode_record) to the store
+
+        Returns:
+            Whether the record was stored; disk errors are logged, not raised
+        """
+        if len(record) > self.max_bytes:
+            return False
+        with self._lock:
+            try:
+                if self._file is None or self._file_size + len(record) > self.segment_bytes:
+                    self._rotate(len(record))
+                self._file.write(record)
+            except OSError as e:
+                self.write_errors += 1
+                if self.write_errors == 1 or self.write_errors % 1000 == 0:
+                    logger.error(f"DeadLetterStore: Failed to write to {self.directory} "
+                                 f"({self.write_errors} failed writes): {e}")
+                self._close()
+                return False
+            self._file_size += len(record)
+            self._segments[self._file.name] = self._file_size
+            self.records_written += 1
+        return True
+
+    def _rotate(self, incoming: int) -> None:
+        """Start a new segment and delete the oldest ones beyond max_bytes"""
+        self._close()
+        # Created on first use, so importing the server does not create it
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{self._next_index:08d}{SEGMENT_SUFFIX}")
+        self._next_index += 1
+        # Unbuffered: each record is written with one write() call
+        self._file = open(path, 'ab', buffering=0)
+        self._file_size = 0
+        self._segments[path] = 0
+        # Leave room for the new segment to fill up
+        room = max(incoming, self.segment_bytes)
+        for old in list(self._segments):
+            if self.total_bytes + room <= self.max_bytes or old == path:
+                break
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+            del self._segments[old]
+
+    def _close(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def close(self) -> None:
+        """Write out the queued frames, stop the writer and close the segment"""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join(timeout=5)
+        with self._lock:
+            self._close()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                'directory': os.path.abspath(self.directory),
+                'segments': len(self._segments),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'records_written': self.records_written,
+                'write_errors': self.write_errors,
+                'queued': self._queue.qsize(),
+                'dropped': self.dropped,
+            }
+
+
+def read_segment(path: str) -> Iterator[DeadLetter]:
+    """
+    Dead letters of one segment, in write order
+
+    Stops at the first incomplete or corrupt record (the tail of a segment
+    torn by a crash, or still being written).
+    """
+    name = os.path.basename(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        crc, frame_len, received_ns, kind, source_len, class_len, message_len = _HEADER.unpack_from(data, offset)
+        end = offset + _HEADER.size + source_len + class_len + message_len + frame_len
+        if end > len(data) or zlib.crc32(data[offset + 4:end]) != crc:
+            if end <= len(data):
+                logger.warning(f"read_segment: Corrupt record in {name} at offset {offset}, skipping rest of segment")
+            return
+        position = offset + _HEADER.size
+        source = data[position:position + source_len].decode('utf-8', 'replace')
+        position += source_len
+        error_class = data[position:position + class_len].decode('utf-8', 'replace')
+        position += class_len
+        message = data[position:position + message_len].decode('utf-8', 'replace')
+        position += message_len
+        frame = data[position:end]
+        if kind == _KIND_TEXT:
+            frame = frame.decode('utf-8', 'surrogatepass')
+        yield DeadLetter(received_ns, source or None, error_class, message, frame, name, offset)
+        offset = end
+
+
+def read_dead_letters(directory: str = DEAD_LETTER_DIR, error_classes: Optional[List[str]] = None,
+                      sources: Optional[List[str]] = None) -> Iterator[DeadLetter]:
+    """Dead letters of a store, oldest first, optionally filtered by error class and source"""
+    for path in segment_paths(directory):
+        try:
+            records = read_segment(path)
+            for record in records:
+                if error_classes and record.error_class not in error_classes:
+                    continue
+                if sources and record.source not in sources:
+                    continue
+                yield record
+        except FileNotFoundError:
+            # Deleted by the server's retention while we were reading
+            continue
+
+
+def local_handler():
+    """Telemetry handler of this checkout, with dead-lettering and per-frame logging off"""
+    from app import telemetry_handler
+    # Still-failing frames are reported in the summary, not one log line each
+    logging.disable(logging.ERROR)
+    telemetry_handler.dead_letters = None
+    return telemetry_handler
+
+
+def replay_in_process(records: List[DeadLetter], telemetry_handler) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """
+    Feed dead letters through a local telemetry handler (see local_handler)
+
+    Nothing is sent or stored; this checks which frames the parser in this
+    checkout now accepts.
+
+    Returns:
+        (accepted counts, still failing counts), each keyed by error class
+    """
+    accepted: Dict[str, int] = {}
+    failed: Dict[str, int] = {}
+    for record in records:
+        counts = accepted if telemetry_handler.process_telemetry(record.frame) else failed
+        counts[record.error_class] = counts.get(record.error_class, 0) + 1
+    return accepted, failed
+
+
+async def replay_to_server(records: List[DeadLetter], server: str,
+                           replay_token: str) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """
+    Send dead letters to a running server, one connection per source AP
+
+    Frames are sent back to back with acknowledgments read concurrently, in
+    their original order per source. Connections identify their AP with
+    ?ap=<source> and open a replay session with ?replay=<replay token> (one
+    of the server's ARUBA_REPLAY_TOKENS), so frames that fail again are not
+    dead-lettered a second time.
+
+    Returns:
+        (accepted counts, still failing counts), each keyed by error class
+    """
+    import websockets
+
+    by_source: Dict[Optional[str], List[DeadLetter]] = {}
+    for record in records:
+        by_source.setdefault(record.source, []).append(record)
+    accepted: Dict[str, int] = {}
+    failed: Dict[str, int] = {}
+
+    async def replay_source(source: Optional[str], batch: List[DeadLetter]) -> None:
+        url = server + ('&' if '?' in server else '?') + f"replay={quote(replay_token)}"
+        # Addresses (ip:port) identify unnamed APs and are not AP names
+        if source and ':' not in source:
+            url += f"&ap={quote(source)}"
+        async with websockets.connect(url, max_size=None) as websocket:
+            await websocket.recv()  # welcome
+
+            async def send_all():
+                for record in batch:
+                    await websocket.send(record.frame)
+
+            sender = asyncio.ensure_future(send_all())
+            try:
+                for record in batch:
+                    ack = json.loads(await websocket.recv())
+                    counts = accepted if ack.get('status') == 'received' else failed
+                    counts[record.error_class] = counts.get(record.error_class, 0) + 1
+            finally:
+                sender.cancel()
+
+    await asyncio.gather(*(replay_source(source, batch) for source, batch in by_source.items()))
+    return accepted, failed
+
+
+def _print_counts(accepted: Dict[str, int], failed: Dict[str, int]) -> None:
+    for error_class in sorted(set(accepted) | set(failed)):
+        print(f"  {error_class:<28} {accepted.get(error_class, 0):8d} accepted {failed.get(error_class, 0):8d} failing")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay dead-lettered telemetry frames")
+    parser.add_argument("--dir", default=DEAD_LETTER_DIR,
+                        help="Dead-letter directory (default: DEAD_LETTER_DIR)")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    for name, description in (("list", "List dead letters, oldest first"),
+                              ("replay", "Re-feed dead letters to the server")):
+        command = subcommands.add_parser(name, help=description)
+        command.add_argument("--error", action="append", dest="error_classes",
+                             help="Only this error class, e.g. JSONDecodeError; repeatable")
+        command.add_argument("--source", action="append", dest="sources",
+                             help="Only frames from this AP or address; repeatable")
+        command.add_argument("--limit", type=int, default=None,
+                             help="Only the oldest N matching frames")
+    subcommands.choices["list"].add_argument("--json", action="store_true",
+                                             help="One JSON object per line")
+    replay = subcommands.choices["replay"]
+    target = replay.add_mutually_exclusive_group(required=True)
+    target.add_argument("--server",
+                        help="Aruba WebSocket URL including credentials, e.g. ws://localhost:9191/aruba?token=1234")
+    replay.add_argument("--replay-token", default=os.getenv('ARUBA_REPLAY_TOKEN'),
+                        help="One of the server's ARUBA_REPLAY_TOKENS (default: ARUBA_REPLAY_TOKEN)")
+    target.add_argument("--dry-run", action="store_true",
+                        help="Parse the frames in this process instead of sending them")
+    args = parser.parse_args()
+    if not args.dir:
+        parser.error("no dead-letter directory: pass --dir or set DEAD_LETTER_DIR")
+    if args.command == "replay" and args.server and not args.replay_token:
+        parser.error("--server needs a replay token: pass --replay-token or set ARUBA_REPLAY_TOKEN")
+
+    records = read_dead_letters(args.dir, args.error_classes, args.sources)
+    if args.limit is not None:
+        records = (record for _, record in zip(range(args.limit), records))
+
+    if args.command == "list":
+        count = 0
+        for record in records:
+            count += 1
+            if args.json:
+                print(json.dumps(record.to_dict()))
+            else:
+                print(f"{format_timestamp(record.received_ns)}  {record.source or '-':<20} "
+                      f"{record.error_class:<20} {len(record.frame):7d} bytes  {record.message[:80]}")
+        if not args.json:
+            print(f"{count} dead letters in {args.dir}")
+        return
+
+    records = list(records)
+    if not records:
+        print(f"No matching dead letters in {args.dir}")
+        return
+    if args.dry_run:
+        handler = local_handler()
+        start = time.perf_counter()
+        accepted, failed = replay_in_process(records, handler)
+    else:
+        start = time.perf_counter()
+        accepted, failed = asyncio.run(replay_to_server(records, args.server, args.replay_token))
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {len(records)} frames in {elapsed:.2f}s ({len(records) / elapsed:,.0f} frames/s)"
+          f"{' (dry run)' if args.dry_run else ''}")
+    _print_counts(accepted, failed)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
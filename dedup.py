@@ -0,0 +1,143 @@
+"""
+Cross-AP duplicate packet suppression for Aruba IoT Telemetry Server
+
+In dense deployments the same advertisement or telegram is heard and forwarded
+by several access points within a few milliseconds. This module keeps a
+fixed-size, time-bounded table keyed on (device, payload hash, time bucket) so
+the handler can collapse those copies into a single telemetry record that
+carries the RSSI reported by every hearing AP.
+"""
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger('aruba-iot')
+
+# Fields identifying the over-the-air payload, in both the raw AP JSON naming
+# and the normalized/protobuf naming. AP-specific fields (accessPoint, rssi,
+# timestamp, location) are deliberately excluded.
+SIGNATURE_FIELDS = (
+    'manufacturerData', 'manufacturer_data',
+    'serviceUuids', 'service_uuids',
+    'serviceData',
+    'uuid', 'major', 'minor',
+    'eep', 'payload',
+    'ssid', 'channel',
+)
+
+
+def _freeze(value: Any) -> Any:
+    """Hashable canonical form of a decoded JSON value (lists and objects at any depth)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    return value
+
+
+def payload_signature(data: Dict[str, Any]) -> Optional[int]:
+    """
+    Compute a hash of the AP-independent part of a packet
+
+    Args:
+        data: Raw or normalized packet dictionary
+
+    Returns:
+        Integer hash of the payload fields, or None if they cannot be hashed
+        (the packet is then not checked for duplicates)
+    """
+    values = []
+    try:
+        for field in SIGNATURE_FIELDS:
+            value = data.get(field)
+            if value is not None:
+                values.append((field, value if isinstance(value, (str, int)) else _freeze(value)))
+        return hash(tuple(values))
+    except TypeError:
+        # Unhashable leaves, or object keys that do not sort
+        return None
+
+
+class DuplicateSuppressor:
+    """Fixed-size, time-bounded table of recently seen packets"""
+
+    def __init__(self, window_ms: Optional[int] = None, max_entries: Optional[int] = None):
+        """
+        Args:
+            window_ms: Duplicate window in milliseconds (0 disables suppression);
+                defaults to the DEDUP_WINDOW_MS environment variable
+            max_entries: Table capacity; defaults to DEDUP_MAX_ENTRIES
+        """
+        if window_ms is None:
+            window_ms = int(os.getenv('DEDUP_WINDOW_MS', 50))
+        if max_entries is None:
+            max_entries = int(os.getenv('DEDUP_MAX_ENTRIES', 8192))
+        self.window = window_ms / 1000.0
+        self.max_entries = max_entries
+        self.enabled = window_ms > 0
+        self._entries: 'OrderedDict[Tuple[Any, ...], Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self.suppressed_count = 0
+
+    def _expire(self, now: float) -> None:
+        """Drop entries that fell out of the window or exceed capacity"""
+        entries = self._entries
+        horizon = now - self.window
+        while entries:
+            first_seen = next(iter(entries.values()))[0]
+            if first_seen >= horizon and len(entries) <= self.max_entries:
+                break
+            entries.popitem(last=False)
+
+    def lookup(self, packet_type: str, device_id: str, signature: int,
+               now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Find the record already stored for this packet, if it is a duplicate
+
+        Args:
+            packet_type: Packet type ('ble', 'wifi', 'enocean', ...)
+            device_id: Reported device identifier
+            signature: Result of payload_signature()
+            now: Monotonic time in seconds (defaults to time.monotonic())
+
+        Returns:
+            The previously stored telemetry record, or None
+        """
+        if not self.enabled:
+            return None
+        if now is None:
+            now = time.monotonic()
+        bucket = int(now / self.window)
+        # Copies may straddle a bucket boundary, so also check the previous one
+        for candidate in (bucket, bucket - 1):
+            entry = self._entries.get((packet_type, device_id, signature, candidate))
+            if entry is not None and now - entry[0] <= self.window:
+                self.suppressed_count += 1
+                return entry[1]
+        return None
+
+    def remember(self, packet_type: str, device_id: str, signature: int,
+                 record: Dict[str, Any], now: Optional[float] = None) -> None:
+        """
+        Store the record produced for a first-seen packet
+
+        Args:
+            packet_type: Packet type ('ble', 'wifi', 'enocean', ...)
+            device_id: Reported device identifier
+            signature: Result of payload_signature()
+            record: Telemetry record that later duplicates are merged into
+            now: Monotonic time in seconds (defaults to time.monotonic())
+        """
+        if not self.enabled:
+            return
+        if now is None:
+            now = time.monotonic()
+        key = (packet_type, device_id, signature, int(now / self.window))
+        self._entries[key] = (now, record)
+        self._expire(now)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,241 @@
+"""
+EnOcean Equipment Profile (EEP) decoders for Aruba IoT Telemetry Server
+
+Decodes the data bytes of EnOcean telegrams into sensor values for the
+profiles most common in buildings:
+
+- A5-02-xx: temperature sensors
+- A5-04-xx: temperature and humidity sensors
+- A5-06-xx: light sensors
+- D5-00-01: single input contact (window/door)
+- F6-02-xx: light and blind control rocker switches
+
+Every supported EEP is compiled once at import into a decoder closure with its
+struct layout and scaling constants bound, kept in a table keyed by the EEP
+string, so decoding a telegram is a dictionary lookup, one unpack and a few
+multiplications. Decoded keys use the EnOceanPacket field names
+(temperature, humidity, illuminance, contact_state, ...).
+"""
+import logging
+import struct
+from typing import Any, Callable, Dict, Optional, Union
+
+logger = logging.getLogger('aruba-iot')
+
+RORG_4BS = 0xA5
+RORG_1BS = 0xD5
+RORG_RPS = 0xF6
+
+# Telegram data length per RORG (4BS: DB3..DB0, 1BS and RPS: DB0)
+DATA_LENGTH = {RORG_4BS: 4, RORG_1BS: 1, RORG_RPS: 1}
+
+_4BS = struct.Struct('>BBBB')
+
+EEPDecoder = Callable[[bytes], Dict[str, Any]]
+
+# EEP string ('A5-02-05') -> decoder taking the telegram data bytes
+EEP_DECODERS: Dict[str, EEPDecoder] = {}
+
+
+def register_eep_decoder(eep: str, decoder: EEPDecoder) -> None:
+    """Register (or replace) the decoder used for an EEP"""
+    EEP_DECODERS[eep.upper()] = decoder
+
+
+def _linear(raw_min: int, raw_max: int, scale_min: float, scale_max: float):
+    """Precompute (factor, offset) mapping a raw range linearly onto a scale"""
+    factor = (scale_max - scale_min) / (raw_max - raw_min)
+    return factor, scale_min - raw_min * factor
+
+
+# --- A5-02: temperature sensors ---------------------------------------------
+
+# 8-bit types: DB1 = 255..0 over the range
+_A5_02_RANGES = {
+    0x01: (-40, 0), 0x02: (-30, 10), 0x03: (-20, 20), 0x04: (-10, 30), 0x05: (0, 40),
+    0x06: (10, 50), 0x07: (20, 60), 0x08: (30, 70), 0x09: (40, 80), 0x0A: (50, 90),
+    0x0B: (60, 100), 0x10: (-60, 20), 0x11: (-50, 30), 0x12: (-40, 40), 0x13: (-30, 50),
+    0x14: (-20, 60), 0x15: (-10, 70), 0x16: (0, 80), 0x17: (10, 90), 0x18: (20, 100),
+    0x19: (30, 110), 0x1A: (40, 120), 0x1B: (50, 130),
+}
+# 10-bit types: DB2 bits 1..0 and DB1 = 1023..0 over the range
+_A5_02_RANGES_10BIT = {0x20: (-10, 41.2), 0x30: (-40, 62.3)}
+
+
+def _compile_a5_02(low: float, high: float) -> EEPDecoder:
+    factor, offset = _linear(255, 0, low, high)
+    unpack = _4BS.unpack_from
+
+    def decode(data: bytes) -> Dict[str, Any]:
+        _, _, db1, _ = unpack(data)
+        return {'temperature': round(db1 * factor + offset, 2)}
+    return decode
+
+
+def _compile_a5_02_10bit(low: float, high: float) -> EEPDecoder:
+    factor, offset = _linear(1023, 0, low, high)
+    unpack = _4BS.unpack_from
+
+    def decode(data: bytes) -> Dict[str, Any]:
+        _, db2, db1, _ = unpack(data)
+        return {'temperature': round(((db2 & 0x03) << 8 | db1) * factor + offset, 2)}
+    return decode
+
+
+# --- A5-04: temperature and humidity sensors ---------------------------------
+
+def _compile_a5_04(temp_low: float, temp_high: float) -> EEPDecoder:
+    """A5-04-01/02: DB2 humidity 0..250, DB1 temperature 0..250, DB0.1 temperature available"""
+    humidity_factor, humidity_offset = _linear(0, 250, 0, 100)
+    temp_factor, temp_offset = _linear(0, 250, temp_low, temp_high)
+    unpack = _4BS.unpack_from
+
+    def decode(data: bytes) -> Dict[str, Any]:
+        _, db2, db1, db0 = unpack(data)
+        values = {'humidity': round(db2 * humidity_factor + humidity_offset, 2)}
+        if db0 & 0x02:
+            values['temperature'] = round(db1 * temp_factor + temp_offset, 2)
+        return values
+    return decode
+
+
+def _compile_a5_04_03() -> EEPDecoder:
+    """A5-04-03: DB3 humidity 0..255, DB2 bits 1..0 and DB1 temperature 0..1023 (-20..60)"""
+    humidity_factor, humidity_offset = _linear(0, 255, 0, 100)
+    temp_factor, temp_offset = _linear(0, 1023, -20, 60)
+    unpack = _4BS.unpack_from
+
+    def decode(data: bytes) -> Dict[str, Any]:
+        db3, db2, db1, _ = unpack(data)
+        return {'humidity': round(db3 * humidity_factor + humidity_offset, 2),
+                'temperature': round(((db2 & 0x03) << 8 | db1) * temp_factor + temp_offset, 2)}
+    return decode
+
+
+# --- A5-06: light sensors -----------------------------------------------------
+
+def _compile_a5_06(ill1_range, ill2_range) -> EEPDecoder:
+    """A5-06-01/02: DB3 supply voltage, DB2 ILL2, DB1 ILL1, DB0.0 range select (0: ILL1, 1: ILL2)"""
+    ill1_factor, ill1_offset = _linear(0, 255, *ill1_range)
+    ill2_factor, ill2_offset = _linear(0, 255, *ill2_range)
+    voltage_factor, voltage_offset = _linear(0, 255, 0, 5.1)
+    unpack = _4BS.unpack_from
+
+    def decode(data: bytes) -> Dict[str, Any]:
+        db3, db2, db1, db0 = unpack(data)
+        if db0 & 0x01:
+            illuminance = db2 * ill2_factor + ill2_offset
+        else:
+            illuminance = db1 * ill1_factor + ill1_offset
+        return {'illuminance': round(illuminance, 1),
+                'supply_voltage': round(db3 * voltage_factor + voltage_offset, 2)}
+    return decode
+
+
+def _compile_a5_06_03() -> EEPDecoder:
+    """A5-06-03: DB3 supply voltage, DB2 and DB1 bits 7..6 illuminance 0..1000 lx"""
+    voltage_factor, voltage_offset = _linear(0, 250, 0, 5.0)
+    unpack = _4BS.unpack_from
+
+    def decode(data: bytes) -> Dict[str, Any]:
+        db3, db2, db1, _ = unpack(data)
+        return {'illuminance': float(min(db2 << 2 | db1 >> 6, 1000)),
+                'supply_voltage': round(db3 * voltage_factor + voltage_offset, 2)}
+    return decode
+
+
+# --- D5-00-01: contact ----------------------------------------------------------
+
+def _decode_d5_00_01(data: bytes) -> Dict[str, Any]:
+    """DB0.0 contact: 1 = closed, 0 = open; DB0.3 = 0 marks a teach-in telegram"""
+    db0 = data[0]
+    if not db0 & 0x08:
+        return {'teach_in': True}
+    return {'contact_state': bool(db0 & 0x01)}
+
+
+# --- F6-02: rocker switches -----------------------------------------------------
+
+_ROCKER_ACTIONS = ('AI', 'A0', 'BI', 'B0')
+
+
+def _decode_f6_02(data: bytes) -> Dict[str, Any]:
+    """DB0 bits 7..5 first action, bit 4 energy bow, bits 3..1 second action, bit 0 second action valid"""
+    db0 = data[0]
+    if not db0 & 0x10:
+        return {'rocker_pressed': False}
+    actions = [_ROCKER_ACTIONS[db0 >> 5 & 0x03]]
+    if db0 & 0x01:
+        actions.append(_ROCKER_ACTIONS[db0 >> 1 & 0x03])
+    return {'rocker_pressed': True, 'rocker_action': '+'.join(actions)}
+
+
+def _build_registry() -> None:
+    for eep_type, (low, high) in _A5_02_RANGES.items():
+        register_eep_decoder(f"A5-02-{eep_type:02X}", _compile_a5_02(low, high))
+    for eep_type, (low, high) in _A5_02_RANGES_10BIT.items():
+        register_eep_decoder(f"A5-02-{eep_type:02X}", _compile_a5_02_10bit(low, high))
+    register_eep_decoder('A5-04-01', _compile_a5_04(0, 40))
+    register_eep_decoder('A5-04-02', _compile_a5_04(-20, 60))
+    register_eep_decoder('A5-04-03', _compile_a5_04_03())
+    register_eep_decoder('A5-06-01', _compile_a5_06((600, 60000), (300, 30000)))
+    register_eep_decoder('A5-06-02', _compile_a5_06((0, 1020), (0, 510)))
+    register_eep_decoder('A5-06-03', _compile_a5_06_03())
+    register_eep_decoder('D5-00-01', _decode_d5_00_01)
+    for eep_type in (0x01, 0x02, 0x03):
+        register_eep_decoder(f"F6-02-{eep_type:02X}", _decode_f6_02)
+
+
+_build_registry()
+
+
+def _telegram_data(rorg: int, payload: Union[str, bytes]) -> Optional[bytes]:
+    """Extract the data bytes (DB3..DB0) from a payload, with or without the leading RORG"""
+    if isinstance(payload, str):
+        try:
+            payload = bytes.fromhex(payload)
+        except ValueError:
+            return None
+    length = DATA_LENGTH.get(rorg)
+    if length is None or len(payload) < length:
+        return None
+    if payload[0] == rorg and len(payload) > length:
+        return payload[1:1 + length]
+    return payload[:length]
+
+
+def decode_eep(eep: str, payload: Union[str, bytes]) -> Dict[str, Any]:
+    """
+    Decode the sensor values of an EnOcean telegram
+
+    Args:
+        eep: EnOcean Equipment Profile, e.g. 'A5-02-05'
+        payload: Telegram data as hex string or bytes, optionally starting
+            with the RORG byte
+
+    Returns:
+        Dictionary of decoded values keyed by EnOceanPacket field name;
+        {'teach_in': True} for 4BS/1BS teach-in telegrams; empty if the EEP
+        is not supported or the payload is invalid (including an EEP that is
+        not a string, or a payload that is neither a string nor bytes)
+    """
+    if not eep or not payload:
+        return {}
+    if not isinstance(eep, str) or not isinstance(payload, (str, bytes, bytearray)):
+        return {}
+    eep = eep.upper()
+    decoder = EEP_DECODERS.get(eep)
+    if decoder is None:
+        return {}
+    try:
+        rorg = int(eep[:2], 16)
+    except ValueError:
+        return {}
+
+    data = _telegram_data(rorg, payload)
+    if data is None:
+        return {}
+    # 4BS telegrams with LRN bit DB0.3 cleared are teach-in telegrams without sensor data
+    if rorg == RORG_4BS and not data[3] & 0x08:
+        return {'teach_in': True}
+    return decoder(data)
@@ -0,0 +1,42 @@
+"""
+Gunicorn configuration for Aruba IoT Telemetry Server
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Worker model: one gthread worker process owns the telemetry state (buffer,
+registries, analytics, response cache) and runs both the HTTP/SocketIO
+handlers on its thread pool and the Aruba AP WebSocket listener on its own
+event loop thread. HTTP threads read the state the listener writes in the
+same address space, so no state is copied between processes. Only one
+worker is supported: a second worker would hold a separate, partial copy of
+the state, and SocketIO clients would need sticky sessions.
+
+The application is preloaded in the master (imports and protobuf
+descriptors), so a restarted worker starts serving right after fork.
+"""
+import logging
+import os
+
+logger = logging.getLogger('aruba-iot')
+
+bind = f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', 5000)}"
+workers = 1
+worker_class = 'gthread'
+# Concurrent HTTP requests plus open SocketIO connections
+threads = int(os.getenv('GUNICORN_THREADS', 64))
+preload_app = True
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 10))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+if int(os.getenv('GUNICORN_WORKERS', 1)) != 1:
+    logger.warning("gunicorn.conf: GUNICORN_WORKERS is ignored; the telemetry state lives in a "
+                   "single worker process (use GUNICORN_THREADS to scale request handling)")
+
+
+def post_worker_init(worker):
+    """Start the Aruba AP WebSocket listener in the worker that owns the state"""
+    from app import start_aruba_websocket_thread
+    start_aruba_websocket_thread()
+    worker.log.info(f"Aruba WebSocket listener started in worker {worker.pid}")
@@ -0,0 +1,137 @@
+"""
+Bounded-cost repair of malformed JSON frames for Aruba IoT Telemetry Server
+
+Some AP firmware and hand-written test clients send almost-JSON: raw control
+characters or newlines inside strings, unquoted keys, trailing commas, a
+leading byte order mark. ``repair_json`` fixes these in one pass over the
+frame's tokens and leaves everything else for ``json.loads`` to judge.
+
+The tokenizer is a compiled regular expression. Runs of text that need no
+repair (well-formed strings, numbers, literals, punctuation) are matched as
+one token, so Python only handles the tokens being repaired and the cost is
+one linear regex scan instead of repeated passes over the whole text. Every
+token is bounded in length (long strings are consumed in chunks), so the
+clock can be checked between tokens: frames larger than
+``JSON_REPAIR_MAX_BYTES`` are not repaired at all, and a repair still
+running after ``JSON_REPAIR_MAX_MS`` is abandoned within about a kilobyte of
+scanning. A malformed frame of the maximum WebSocket message size therefore
+costs a bounded amount of CPU.
+
+Repairs:
+
+- ``bom``: byte order marks outside strings are removed
+- ``control_chars``: control characters inside strings are escaped
+  (``\\n``, ``\\r``, ``\\t``, ``\\u00XX``); outside strings they are removed
+- ``unquoted_keys``: bare identifiers followed by ``:`` are quoted
+- ``trailing_commas``: commas directly before ``}`` or ``]`` are removed
+"""
+import os
+import re
+import time
+from typing import List, Tuple
+
+# Frames longer than this (in characters) are not repaired
+JSON_REPAIR_MAX_BYTES = int(os.getenv('JSON_REPAIR_MAX_BYTES', 64 * 1024))
+# Time budget of one repair
+JSON_REPAIR_MAX_MS = float(os.getenv('JSON_REPAIR_MAX_MS', 10))
+
+# The time budget is checked every this many tokens, and whenever this many
+# characters were scanned since the last check
+_BUDGET_CHECK_INTERVAL = 64
+_BUDGET_CHECK_CHARS = 1024
+
+# Every alternative is bounded in length: at most 16 pieces of plain text
+# (strings, literals and other runs up to 256 characters), identifiers and
+# string chunks up to 1024 characters. Unquoted keys longer than that are not repaired.
+_TOKEN = re.compile(r'''
+    (?P<plain>(?:"(?:[^"\\\x00-\x1f]|\\.){0,256}"                      # well-formed strings
+               |[^"\x00-\x08\x0b\x0c\x0e-\x1f,A-Za-z_$\ufeff]{1,256}   # numbers, whitespace, punctuation
+               |,(?![ \t\n\r]*[}\]])                                   # commas followed by a value
+               |[A-Za-z_$][\w$-]{0,255}(?![\w$-]|[ \t\n\r]*:)          # true, false, null (not keys)
+               ){1,16})
+  | (?P<raw_string>"(?:[^"\\]|\\.){0,1024}(?P<close>"|\\?\Z)?)       # raw control characters, long or unterminated
+  | (?P<key>[A-Za-z_$][\w$-]{0,1023}(?![\w$-])(?=[ \t\n\r]*:))         # unquoted key
+  | (?P<word>[A-Za-z_$][\w$-]{0,1023}(?![\w$-]))                       # literal too long for plain
+  | (?P<trailing_comma>,)
+  | (?P<stray>[\x00-\x08\x0b\x0c\x0e-\x1f\ufeff])              # control character or BOM outside a string
+  | (?P<other>.)                                               # anything else
+''', re.VERBOSE | re.DOTALL)
+# Continuation of a string longer than one raw_string token, up to its
+# closing quote (or the end of the frame)
+_STRING_PART = re.compile(r'(?:[^"\\]|\\.){0,1024}(?P<close>"|\\?\Z)?', re.DOTALL)
+
+# Escapes for the control characters JSON does not allow raw inside strings
+_CONTROL_ESCAPES = {i: f'\\u{i:04x}' for i in range(32)}
+_CONTROL_ESCAPES.update({ord('\n'): '\\n', ord('\r'): '\\r', ord('\t'): '\\t'})
+
+
+class RepairBudgetExceeded(ValueError):
+    """Raised when a frame is too large to repair or its repair runs out of time"""
+
+
+def repair_json(text: str, max_chars: int = JSON_REPAIR_MAX_BYTES,
+                max_seconds: float = JSON_REPAIR_MAX_MS / 1000) -> Tuple[str, List[str]]:
+    """
+    Repair common defects of a malformed JSON document in one pass
+
+    Args:
+        text: Frame that failed to parse as JSON
+        max_chars: Largest frame that is repaired
+        max_seconds: Time budget of the repair
+
+    Returns:
+        (repaired text, names of the repairs applied); the text is returned
+        unchanged with an empty list when there was nothing to repair
+
+    Raises:
+        RepairBudgetExceeded: If the frame is larger than max_chars or the
+            repair takes longer than max_seconds
+    """
+    if len(text) > max_chars:
+        raise RepairBudgetExceeded(f"{len(text)} characters exceeds the {max_chars} character repair limit")
+    deadline = time.perf_counter() + max_seconds
+
+    out: List[str] = []
+    append = out.append
+    repairs = set()
+    token_match = _TOKEN.match
+    end = len(text)
+    position = 0
+    next_check = _BUDGET_CHECK_CHARS
+    count = 0
+    in_string = False
+    while position < end:
+        count += 1
+        if count % _BUDGET_CHECK_INTERVAL == 0 or position >= next_check:
+            if time.perf_counter() > deadline:
+                raise RepairBudgetExceeded(f"repair exceeded {max_seconds * 1000:g} ms after {position} characters")
+            next_check = position + _BUDGET_CHECK_CHARS
+        if in_string:
+            match = _STRING_PART.match(text, position)
+            kind = 'raw_string'
+        else:
+            match = token_match(text, position)
+            kind = match.lastgroup
+        token = match.group()
+        position = match.end()
+        if kind == 'raw_string':
+            # A string longer than one chunk stays open until its closing quote
+            in_string = match.group('close') is None
+            escaped = token.translate(_CONTROL_ESCAPES)
+            if escaped != token:
+                token = escaped
+                repairs.add('control_chars')
+        elif kind == 'key':
+            token = f'"{token}"'
+            repairs.add('unquoted_keys')
+        elif kind == 'trailing_comma':
+            repairs.add('trailing_commas')
+            continue
+        elif kind == 'stray':
+            repairs.add('bom' if token == '\ufeff' else 'control_chars')
+            continue
+        append(token)
+
+    if not repairs:
+        return text, []
+    return ''.join(out), sorted(repairs)
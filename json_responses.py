@@ -0,0 +1,265 @@
+"""
+JSON response layer for Aruba IoT Telemetry Server API
+
+Serializes API payloads straight to bytes with orjson when it is installed
+(falling back to the standard library ``json``), negotiates gzip or brotli
+content encoding from ``Accept-Encoding``, and keeps serialized bodies in a
+``ResponseCache`` keyed by request and tagged with the telemetry data version,
+so dashboards polling between ingest updates get the same bytes back without
+rebuilding or re-serializing the payload. Compressed variants are produced
+once per cached body.
+
+Large collections (such as the BLE proximity map) can be streamed as chunked
+JSON with ``stream_json_object``, which serializes entries in batches instead
+of building the whole document in memory first.
+
+This module has no Flask dependency; app.py wraps the results in responses.
+"""
+import gzip
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger('aruba-iot')
+
+JSON_MIMETYPE = 'application/json'
+
+# Bodies smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = int(os.getenv('API_COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.getenv('API_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('API_BROTLI_QUALITY', 5))
+# Collections with more entries than this are streamed as chunked JSON
+STREAM_THRESHOLD = int(os.getenv('API_STREAM_THRESHOLD', 2000))
+# Entries serialized per streamed chunk
+STREAM_BATCH = 256
+
+# Content codings in order of preference
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def _default(obj: Any) -> Any:
+    """Serialize values the JSON encoders do not handle natively"""
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.hex()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize an object to compact UTF-8 JSON bytes"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:
+    _encoder = json.JSONEncoder(default=_default, separators=(',', ':'), ensure_ascii=False)
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize an object to compact UTF-8 JSON bytes"""
+        return _encoder.encode(obj).encode('utf-8')
+
+
+def serializer_name() -> str:
+    """Name of the JSON serializer in use"""
+    return 'orjson' if orjson is not None else 'json'
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the content coding for a response from an Accept-Encoding header
+
+    Args:
+        accept_encoding: Value of the request's Accept-Encoding header
+
+    Returns:
+        'br' or 'gzip', or None to send the body uncompressed
+    """
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q=') and params[2:] in ('0', '0.0', '0.00', '0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    for coding in SUPPORTED_ENCODINGS:
+        if coding in accepted or '*' in accepted:
+            return coding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body with the given content coding ('gzip' or 'br')"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class SerializedBody:
+    """Serialized JSON body, its extra response headers and lazily built compressed variants"""
+
+    __slots__ = ('version', 'body', 'headers', '_encoded')
+
+    def __init__(self, body: bytes, version: Any = None, headers: Optional[Dict[str, str]] = None):
+        self.version = version
+        self.body = body
+        self.headers = headers
+        self._encoded: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """
+        Return the body for a negotiated content coding
+
+        Args:
+            encoding: Negotiated coding, or None
+
+        Returns:
+            (body bytes, Content-Encoding value or None)
+        """
+        if encoding is None or len(self.body) < COMPRESS_MIN_BYTES:
+            return self.body, None
+        data = self._encoded.get(encoding)
+        if data is None:
+            data = self._encoded[encoding] = compress(self.body, encoding)
+        return data, encoding
+
+
+class ResponseCache:
+    """
+    Serialized API responses, valid while the data version is unchanged
+
+    Entries are keyed by request (path and query string) and tagged with the
+    data version they were built from; a lookup with a newer version misses.
+    Least recently used entries are evicted beyond ``max_entries``.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Any, SerializedBody]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, version: Any) -> Optional[SerializedBody]:
+        """Return the cached body for a key if it was built from this version"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Any, body: bytes, version: Any, headers: Optional[Dict[str, str]] = None) -> SerializedBody:
+        """Store a serialized body (and its extra headers) built from the given data version"""
+        entry = SerializedBody(body, version, headers)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _StreamCompressor:
+    """Incremental gzip/brotli compressor for chunked responses"""
+
+    def __init__(self, encoding: str):
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._compress = self._compressor.process
+            self._sync = self._compressor.flush
+            self._finish = self._compressor.finish
+        else:
+            # wbits 31: zlib deflate with a gzip header and trailer
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._compress = self._compressor.compress
+            self._sync = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._compressor.flush
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress a chunk and flush it so the client can decode it immediately"""
+        return self._compress(data) + self._sync()
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def stream_json_object(items: Iterable[Tuple[Any, Any]],
+                       value: Optional[Callable[[Any, Any], Any]] = None,
+                       batch: int = STREAM_BATCH) -> Iterator[bytes]:
+    """
+    Serialize (key, value) pairs as one JSON object, in chunks
+
+    Args:
+        items: Key/value pairs of the object
+        value: Converts a stored (key, value) pair to the API representation
+            of the value; values are serialized as-is if omitted
+        batch: Entries serialized per chunk
+
+    Yields:
+        Consecutive pieces of the JSON document
+    """
+    parts = [b'{']
+    first = True
+    for count, (key, item) in enumerate(items, 1):
+        if not first:
+            parts.append(b',')
+        first = False
+        parts.append(dumps(str(key)))
+        parts.append(b':')
+        parts.append(dumps(value(key, item) if value is not None else item))
+        if count % batch == 0:
+            yield b''.join(parts)
+            parts = []
+    parts.append(b'}')
+    yield b''.join(parts)
+
+
+def stream_response(chunks: Iterator[bytes], encoding: Optional[str],
+                    on_complete: Optional[Callable[[bytes], None]] = None) -> Iterator[bytes]:
+    """
+    Compress a chunked JSON stream on the fly
+
+    Args:
+        chunks: Serialized pieces of the document (from ``stream_json_object``)
+        encoding: Negotiated content coding, or None
+        on_complete: Called with the complete uncompressed document once the
+            stream finished, e.g. to populate a ``ResponseCache``
+
+    Yields:
+        Response body chunks
+    """
+    compressor = _StreamCompressor(encoding) if encoding else None
+    collected = [] if on_complete is not None else None
+    for chunk in chunks:
+        if collected is not None:
+            collected.append(chunk)
+        if compressor is not None:
+            chunk = compressor.chunk(chunk)
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        yield compressor.finish()
+    if collected is not None:
+        on_complete(b''.join(collected))
@@ -0,0 +1,140 @@
+"""
+Opt-in live profiling for Aruba IoT Telemetry Server
+
+Two diagnostics for ingest latency spikes in production:
+
+- ``sample_stacks``: a statistical sampler that periodically captures the
+  stack of the Aruba WebSocket ingest thread and returns collapsed stacks
+  (one ``frame;frame;frame count`` line per unique stack), ready for
+  flamegraph.pl, speedscope or similar tools.
+- ``StageProfiler``: a per-stage timing breakdown of frame processing
+  (decode, classify, normalize, analytics, store, ack). When disabled, each
+  instrumentation point costs a single attribute check.
+
+Both are exposed under ``/debug`` only when ``ENABLE_PROFILING=true``; stage
+timing can also be switched on at startup with ``PROFILE_STAGES=true``.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from typing import Dict, Optional
+
+from metrics import REGISTRY
+
+# Upper bound for a single sampling request
+MAX_PROFILE_SECONDS = 60
+
+# Thread running the Aruba WebSocket server event loop, once started
+_ingest_thread_id: Optional[int] = None
+
+
+def profiling_enabled() -> bool:
+    """Whether the /debug profiling endpoints are enabled"""
+    return os.getenv('ENABLE_PROFILING', 'False').lower() == 'true'
+
+
+def register_ingest_thread() -> None:
+    """Record the calling thread as the WebSocket ingest thread"""
+    global _ingest_thread_id
+    _ingest_thread_id = threading.get_ident()
+
+
+def ingest_thread_id() -> Optional[int]:
+    return _ingest_thread_id
+
+
+def _collapse(frame) -> str:
+    """Render a frame chain root-first as 'file:function;file:function'"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    names.reverse()
+    return ';'.join(names)
+
+
+def sample_stacks(seconds: float, interval: float = 0.005, thread_id: Optional[int] = None) -> str:
+    """
+    Sample thread stacks and return them in collapsed-stack format
+
+    Args:
+        seconds: Sampling duration (capped at MAX_PROFILE_SECONDS)
+        interval: Delay between samples in seconds
+        thread_id: Thread to sample; None samples every thread except the caller
+
+    Returns:
+        Collapsed stacks, one 'frames count' line per unique stack
+    """
+    seconds = min(max(seconds, 0.0), MAX_PROFILE_SECONDS)
+    own_thread = threading.get_ident()
+    stacks = StackCounter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        frames = sys._current_frames()
+        if thread_id is not None:
+            frame = frames.get(thread_id)
+            if frame is not None:
+                stacks[_collapse(frame)] += 1
+        else:
+            for ident, frame in frames.items():
+                if ident != own_thread:
+                    stacks[_collapse(frame)] += 1
+        del frames
+        time.sleep(interval)
+    return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class StageProfiler:
+    """Per-stage timing breakdown of frame processing
+
+    Call ``begin()`` when a frame arrives, ``lap(stage)`` after each stage
+    (the time since the previous mark is attributed to that stage) and
+    ``end()`` when the frame is done. Stage durations are recorded in the
+    ``aruba_stage_seconds`` histogram.
+    """
+
+    STAGES = ('decode', 'classify', 'normalize', 'analytics', 'store', 'ack')
+
+    def __init__(self):
+        self.enabled = os.getenv('PROFILE_STAGES', 'False').lower() == 'true'
+        self._last: Optional[float] = None
+        self._histogram = REGISTRY.histogram('aruba_stage_seconds',
+                                             'Time spent per frame processing stage (when profiling is enabled)',
+                                             ('stage',))
+        self._children = {stage: self._histogram.labels(stage) for stage in self.STAGES}
+
+    def begin(self) -> None:
+        if self.enabled:
+            self._last = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        if self._last is None:
+            return
+        now = time.perf_counter()
+        child = self._children.get(stage)
+        if child is None:
+            child = self._children[stage] = self._histogram.labels(stage)
+        child.observe(now - self._last)
+        self._last = now
+
+    def end(self) -> None:
+        self._last = None
+
+    def breakdown(self) -> Dict[str, Dict[str, float]]:
+        """Summarize recorded stage timings"""
+        summary = {}
+        for stage, child in self._children.items():
+            if child.count:
+                summary[stage] = {
+                    'count': child.count,
+                    'total_ms': round(child.sum * 1000, 3),
+                    'mean_us': round(child.sum / child.count * 1e6, 2),
+                }
+        return summary
+
+
+# Process-wide stage profiler used by the telemetry handler
+STAGE_PROFILER = StageProfiler()
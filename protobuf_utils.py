@@ -4,18 +4,65 @@ Protobuf utilities for Aruba IoT Telemetry Server
 This module provides utility functions to encode and decode protobuf messages
 for the Aruba IoT Telemetry Server.
 """
+import importlib
 import logging
-from datetime import datetime, timezone
-from typing import Dict, Any, Optional, List, Union
+from operator import attrgetter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Iterator, Optional, List, Tuple, Union
 
-# Import the generated protobuf classes
-from protos.generated.ibeacon_pb2 import IBeaconPacket, IBeaconPacketCollection
-from protos.wifi_pb2 import WiFiPacket, WiFiPacketCollection
-from protos.enocean_pb2 import EnOceanPacket, EnOceanPacketCollection
+from ble_beacons import parse_manufacturer_data
+from enocean_eep import decode_eep
+from timestamps import epoch_to_ns, format_timestamp, now_ns
 
 # Configure logging
 logger = logging.getLogger('aruba-iot')
 
+# Generated protobuf classes and their modules. A module (and the protobuf
+# runtime behind it) is imported when a codec first needs one of its classes,
+# so importing this module does not load any descriptors; servers load them
+# up front with preload_descriptors().
+_MESSAGE_MODULES = {
+    'IBeaconPacket': 'protos.generated.ibeacon_pb2',
+    'IBeaconPacketCollection': 'protos.generated.ibeacon_pb2',
+    'WiFiPacket': 'protos.wifi_pb2',
+    'WiFiPacketCollection': 'protos.wifi_pb2',
+    'EnOceanPacket': 'protos.enocean_pb2',
+    'EnOceanPacketCollection': 'protos.enocean_pb2',
+    'IBeaconPacketV2': 'protos.ibeacon_v2_pb2',
+    'WiFiPacketV2': 'protos.wifi_v2_pb2',
+    'EnOceanPacketV2': 'protos.enocean_v2_pb2',
+}
+_messages: Dict[str, type] = {}
+
+def _message(name: str) -> type:
+    """Return a generated message class, importing its module on first use"""
+    message_class = _messages.get(name)
+    if message_class is None:
+        message_class = getattr(importlib.import_module(_MESSAGE_MODULES[name]), name)
+        _messages[name] = message_class
+    return message_class
+
+def __getattr__(name: str):
+    # Message classes stay importable from this module: from protobuf_utils import WiFiPacket
+    if name in _MESSAGE_MODULES:
+        return _message(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _packet_timestamp(timestamp: Any) -> str:
+    """ISO timestamp for a packet's string timestamp field
+
+    Strings are kept as sent; numeric epoch times (seconds to nanoseconds)
+    are formatted, and a missing or unusable value becomes the current time.
+    """
+    if isinstance(timestamp, str) and timestamp:
+        return timestamp
+    if isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool):
+        try:
+            return format_timestamp(epoch_to_ns(timestamp))
+        except (OverflowError, ValueError):
+            pass
+    return format_timestamp(now_ns())
+
 def encode_ibeacon_packet(data: Dict[str, Any]) -> bytes:
     """
     Encode a BLE packet with iBeacon data to protobuf binary format
@@ -31,14 +78,14 @@ def encode_ibeacon_packet(data: Dict[str, Any]) -> bytes:
     # Extract device information
     device_mac = data.get('macAddress', '')
     device_id = data.get('deviceId', 'unknown')
-    timestamp = datetime.now(timezone.utc).isoformat()
+    timestamp = _packet_timestamp(data.get('timestamp'))
     rssi = data.get('rssi', 0)
     ap_mac = data.get('accessPoint', '')
     
     # Log key values
     logger.info(f"encode_ibeacon_packet: Device ID: {device_id}, MAC: {device_mac}, RSSI: {rssi}")
     
-    # Extract iBeacon specific data (need to parse from manufacturer data)
+    # Extract iBeacon specific data
     manufacturer_data = data.get('manufacturerData', '')
     uuid = ''
     major = 0
@@ -46,21 +93,23 @@ def encode_ibeacon_packet(data: Dict[str, Any]) -> bytes:
     tx_power = 0
     device_name = data.get('deviceName', '')
     
-    # Check if we have valid iBeacon manufacturer data
-    # This is a simplified example - real iBeacon parsing would be more complex
-    if manufacturer_data:
-        logger.info(f"encode_ibeacon_packet: Extracting iBeacon data from manufacturer data")
-        
-        # Basic iBeacon parsing from manufacturer data
-        # In real app, you'd need to properly parse based on iBeacon format
-        # This is placeholder logic
+    # Decode iBeacon fields from the manufacturer data when it carries an
+    # iBeacon advertisement, otherwise use the values reported by the AP
+    beacon = parse_manufacturer_data(manufacturer_data)
+    if beacon is not None and beacon['format'] == 'ibeacon':
+        logger.info(f"encode_ibeacon_packet: Decoded iBeacon data from manufacturer data")
+        uuid = beacon['uuid']
+        major = beacon['major']
+        minor = beacon['minor']
+        tx_power = beacon['tx_power']
+    elif manufacturer_data or 'uuid' in data:
         uuid = data.get('uuid', '')
         major = data.get('major', 0)
         minor = data.get('minor', 0)
         tx_power = data.get('txPower', 0)
     
     # Create protobuf message
-    packet = IBeaconPacket(
+    packet = _message('IBeaconPacket')(
         device_mac=device_mac,
         timestamp=timestamp,
         rssi=rssi,
@@ -81,7 +130,6 @@ def encode_ibeacon_packet(data: Dict[str, Any]) -> bytes:
         # Basic distance calculation formula (very approximate)
         # distance = 10 ^ ((txPower - RSSI) / 20)
         try:
-            import math
             distance = 10 ** ((tx_power - rssi) / 20)
             packet.distance = distance
             logger.info(f"encode_ibeacon_packet: Calculated distance: {distance:.2f} meters")
@@ -107,35 +155,44 @@ def decode_ibeacon_packet(binary_data: bytes) -> Dict[str, Any]:
     logger.info(f"decode_ibeacon_packet: Decoding {len(binary_data)} bytes of protobuf data")
     
     # Parse protobuf message
-    packet = IBeaconPacket()
+    packet = _message('IBeaconPacket')()
     packet.ParseFromString(binary_data)
     
-    # Convert to dictionary
+    result = _ibeacon_to_dict(packet)
+    
+    logger.info(f"decode_ibeacon_packet: Successfully decoded protobuf data")
+    return result
+
+# Converters read the always-present fields with one attrgetter call and the
+# optional ones through a bound HasField; per message this is cheaper than
+# separate attribute reads or ListFields() on the upb backend
+_IBEACON_FIELDS = attrgetter('device_mac', 'timestamp', 'rssi', 'uuid', 'major', 'minor', 'tx_power')
+
+def _ibeacon_to_dict(packet: 'IBeaconPacket') -> Dict[str, Any]:
+    """Convert a parsed IBeaconPacket message to a packet dictionary"""
+    device_mac, timestamp, rssi, uuid, major, minor, tx_power = _IBEACON_FIELDS(packet)
     result = {
         'type': 'ble',
         'subtype': 'ibeacon',
-        'device_id': packet.device_mac,  # Using MAC as device ID
-        'mac_address': packet.device_mac,
-        'timestamp': packet.timestamp,
-        'rssi': packet.rssi,
-        'uuid': packet.uuid,
-        'major': packet.major,
-        'minor': packet.minor,
-        'tx_power': packet.tx_power,
+        'device_id': device_mac,  # Using MAC as device ID
+        'mac_address': device_mac,
+        'timestamp': timestamp,
+        'rssi': rssi,
+        'uuid': uuid,
+        'major': major,
+        'minor': minor,
+        'tx_power': tx_power,
     }
     
     # Add optional fields if present
-    if packet.HasField('ap_mac'):
-        result['access_point'] = packet.ap_mac
-        result['reporter'] = packet.ap_mac
-    
-    if packet.HasField('device_name'):
+    has_field = packet.HasField
+    if has_field('ap_mac'):
+        result['access_point'] = result['reporter'] = packet.ap_mac
+    if has_field('device_name'):
         result['device_name'] = packet.device_name
-    
-    if packet.HasField('distance'):
+    if has_field('distance'):
         result['distance'] = packet.distance
     
-    logger.info(f"decode_ibeacon_packet: Successfully decoded protobuf data")
     return result
 
 def encode_ibeacon_collection(packets: List[Dict[str, Any]]) -> bytes:
@@ -151,14 +208,14 @@ def encode_ibeacon_collection(packets: List[Dict[str, Any]]) -> bytes:
     logger.info(f"encode_ibeacon_collection: Encoding collection of {len(packets)} packets")
     
     # Create a collection message
-    collection = IBeaconPacketCollection()
+    collection = _message('IBeaconPacketCollection')()
     
     # Add each packet to the collection
     for packet_data in packets:
         # Create a new IBeaconPacket
-        packet = IBeaconPacket(
+        packet = _message('IBeaconPacket')(
             device_mac=packet_data.get('macAddress', ''),
-            timestamp=packet_data.get('timestamp', datetime.now(timezone.utc).isoformat()),
+            timestamp=_packet_timestamp(packet_data.get('timestamp')),
             rssi=packet_data.get('rssi', 0),
             uuid=packet_data.get('uuid', ''),
             major=packet_data.get('major', 0),
@@ -201,37 +258,11 @@ def decode_ibeacon_collection(binary_data: bytes) -> List[Dict[str, Any]]:
     logger.info(f"decode_ibeacon_collection: Decoding {len(binary_data)} bytes of protobuf data")
     
     # Parse protobuf message
-    collection = IBeaconPacketCollection()
+    collection = _message('IBeaconPacketCollection')()
     collection.ParseFromString(binary_data)
     
     # Convert each packet to dictionary
-    results = []
-    for packet in collection.packets:
-        result = {
-            'type': 'ble',
-            'subtype': 'ibeacon',
-            'device_id': packet.device_mac,
-            'mac_address': packet.device_mac,
-            'timestamp': packet.timestamp,
-            'rssi': packet.rssi,
-            'uuid': packet.uuid,
-            'major': packet.major,
-            'minor': packet.minor,
-            'tx_power': packet.tx_power,
-        }
-        
-        # Add optional fields if present
-        if packet.HasField('ap_mac'):
-            result['access_point'] = packet.ap_mac
-            result['reporter'] = packet.ap_mac
-        
-        if packet.HasField('device_name'):
-            result['device_name'] = packet.device_name
-        
-        if packet.HasField('distance'):
-            result['distance'] = packet.distance
-        
-        results.append(result)
+    results = [_ibeacon_to_dict(packet) for packet in collection.packets]
     
     logger.info(f"decode_ibeacon_collection: Successfully decoded {len(results)} packets")
     return results
@@ -240,33 +271,26 @@ def is_ibeacon_data(data: Dict[str, Any]) -> bool:
     """
     Check if the data appears to be an iBeacon packet
     
+    The manufacturer data is parsed as a BLE advertisement (Apple company ID
+    0x004C followed by the 0x02 0x15 iBeacon type and length). Packets without
+    manufacturer data count as iBeacons only when the AP already decoded them
+    (subtype 'ibeacon' with a 'uuid').
+    
     Args:
         data: Dictionary containing packet data
         
     Returns:
         True if the data appears to be an iBeacon packet
     """
-    # This is a simplified check - in practice you'd need to examine the
-    # manufacturer data format and structure according to iBeacon specs
     if data.get('type', '').lower() != 'ble':
         return False
     
-    # Check for iBeacon indicators
-    # Real implementation would parse manufacturer data properly
-    manufacturer_data = data.get('manufacturerData', '')
-    if not manufacturer_data:
-        return False
-    
-    # Examples of iBeacon indicators:
-    # - Company ID for Apple (0x004C) at the start of manufacturer data
-    # - Followed by iBeacon type code (0x02, 0x15)
-    # - Then 16 bytes of UUID, 2 bytes major, 2 bytes minor, 1 byte tx power
+    manufacturer_data = data.get('manufacturerData')
+    if manufacturer_data:
+        beacon = parse_manufacturer_data(manufacturer_data)
+        return beacon is not None and beacon['format'] == 'ibeacon'
     
-    # This is a placeholder for actual iBeacon detection logic
-    # In reality, you'd examine the binary structure of manufacturer data
-    return 'ibeacon' in str(data).lower() or \
-           'uuid' in data or \
-           (manufacturer_data and len(str(manufacturer_data)) >= 20)  # Minimum expected length
+    return data.get('subtype') == 'ibeacon' and 'uuid' in data
 
 def encode_wifi_packet(data: Dict[str, Any]) -> bytes:
     """
@@ -283,7 +307,7 @@ def encode_wifi_packet(data: Dict[str, Any]) -> bytes:
     # Extract device information
     device_mac = data.get('macAddress', '')
     device_id = data.get('deviceId', 'unknown')
-    timestamp = datetime.now(timezone.utc).isoformat()
+    timestamp = _packet_timestamp(data.get('timestamp'))
     rssi = data.get('rssi', 0)
     ap_mac = data.get('accessPoint', '')
     
@@ -300,7 +324,7 @@ def encode_wifi_packet(data: Dict[str, Any]) -> bytes:
     signal_level = data.get('signalLevel', 0)
     
     # Create protobuf message
-    packet = WiFiPacket(
+    packet = _message('WiFiPacket')(
         device_mac=device_mac,
         timestamp=timestamp,
         rssi=rssi,
@@ -325,7 +349,6 @@ def encode_wifi_packet(data: Dict[str, Any]) -> bytes:
     # Calculate distance if RSSI is available
     if rssi:
         try:
-            import math
             # Basic distance calculation (simplified formula)
             # distance = 10 ^ ((RSSI at 1m - RSSI) / 20)
             # Using -40 as a reference RSSI at 1m
@@ -354,44 +377,38 @@ def decode_wifi_packet(binary_data: bytes) -> Dict[str, Any]:
     logger.info(f"decode_wifi_packet: Decoding {len(binary_data)} bytes of protobuf data")
     
     # Parse protobuf message
-    packet = WiFiPacket()
+    packet = _message('WiFiPacket')()
     packet.ParseFromString(binary_data)
     
-    # Convert to dictionary
+    result = _wifi_to_dict(packet)
+    
+    logger.info(f"decode_wifi_packet: Successfully decoded protobuf data")
+    return result
+
+_WIFI_FIELDS = attrgetter('device_mac', 'timestamp', 'rssi', 'ssid', 'channel')
+_WIFI_OPTIONAL = ('device_name', 'distance', 'security', 'frequency', 'vendor', 'signal_level')
+
+def _wifi_to_dict(packet: 'WiFiPacket') -> Dict[str, Any]:
+    """Convert a parsed WiFiPacket message to a packet dictionary"""
+    device_mac, timestamp, rssi, ssid, channel = _WIFI_FIELDS(packet)
     result = {
         'type': 'wifi',
-        'device_id': packet.device_mac,  # Using MAC as device ID
-        'mac_address': packet.device_mac,
-        'timestamp': packet.timestamp,
-        'rssi': packet.rssi,
-        'ssid': packet.ssid,
-        'channel': packet.channel,
+        'device_id': device_mac,  # Using MAC as device ID
+        'mac_address': device_mac,
+        'timestamp': timestamp,
+        'rssi': rssi,
+        'ssid': ssid,
+        'channel': channel,
     }
     
     # Add optional fields if present
-    if packet.HasField('ap_mac'):
-        result['access_point'] = packet.ap_mac
-        result['reporter'] = packet.ap_mac
-    
-    if packet.HasField('device_name'):
-        result['device_name'] = packet.device_name
+    has_field = packet.HasField
+    if has_field('ap_mac'):
+        result['access_point'] = result['reporter'] = packet.ap_mac
+    for field in _WIFI_OPTIONAL:
+        if has_field(field):
+            result[field] = getattr(packet, field)
     
-    if packet.HasField('distance'):
-        result['distance'] = packet.distance
-        
-    if packet.HasField('security'):
-        result['security'] = packet.security
-        
-    if packet.HasField('frequency'):
-        result['frequency'] = packet.frequency
-        
-    if packet.HasField('vendor'):
-        result['vendor'] = packet.vendor
-        
-    if packet.HasField('signal_level'):
-        result['signal_level'] = packet.signal_level
-    
-    logger.info(f"decode_wifi_packet: Successfully decoded protobuf data")
     return result
 
 def is_wifi_data(data: Dict[str, Any]) -> bool:
@@ -424,7 +441,7 @@ def encode_enocean_packet(data: Dict[str, Any]) -> bytes:
     
     # Extract device information
     device_id = data.get('deviceId', 'unknown')
-    timestamp = datetime.now(timezone.utc).isoformat()
+    timestamp = _packet_timestamp(data.get('timestamp'))
     rssi = data.get('rssi', 0)
     ap_mac = data.get('accessPoint', '')
     
@@ -436,15 +453,17 @@ def encode_enocean_packet(data: Dict[str, Any]) -> bytes:
     payload = data.get('payload', '')
     device_name = data.get('deviceName', '')
     
-    # Optional sensor data
-    temperature = data.get('temperature')
-    humidity = data.get('humidity')
-    contact_state = data.get('contactState')
-    illuminance = data.get('illuminance')
+    # Optional sensor data; values reported by the AP take precedence over
+    # values decoded from the payload with the EEP decoder
+    decoded = decode_eep(eep, payload)
+    temperature = data.get('temperature', decoded.get('temperature'))
+    humidity = data.get('humidity', decoded.get('humidity'))
+    contact_state = data.get('contactState', decoded.get('contact_state'))
+    illuminance = data.get('illuminance', decoded.get('illuminance'))
     battery_level = data.get('batteryLevel')
     
     # Create protobuf message
-    packet = EnOceanPacket(
+    packet = _message('EnOceanPacket')(
         device_id=device_id,
         timestamp=timestamp,
         rssi=rssi,
@@ -473,7 +492,6 @@ def encode_enocean_packet(data: Dict[str, Any]) -> bytes:
     # Calculate distance if RSSI is available
     if rssi:
         try:
-            import math
             # Basic distance calculation (simplified formula)
             # distance = 10 ^ ((RSSI at 1m - RSSI) / 20)
             # Using -40 as a reference RSSI at 1m for EnOcean
@@ -502,47 +520,38 @@ def decode_enocean_packet(binary_data: bytes) -> Dict[str, Any]:
     logger.info(f"decode_enocean_packet: Decoding {len(binary_data)} bytes of protobuf data")
     
     # Parse protobuf message
-    packet = EnOceanPacket()
+    packet = _message('EnOceanPacket')()
     packet.ParseFromString(binary_data)
     
-    # Convert to dictionary
+    result = _enocean_to_dict(packet)
+    
+    logger.info(f"decode_enocean_packet: Successfully decoded protobuf data")
+    return result
+
+_ENOCEAN_FIELDS = attrgetter('device_id', 'timestamp', 'rssi', 'eep', 'payload')
+_ENOCEAN_OPTIONAL = ('device_name', 'distance', 'temperature', 'humidity', 'contact_state',
+                     'illuminance', 'battery_level')
+
+def _enocean_to_dict(packet: 'EnOceanPacket') -> Dict[str, Any]:
+    """Convert a parsed EnOceanPacket message to a packet dictionary"""
+    device_id, timestamp, rssi, eep, payload = _ENOCEAN_FIELDS(packet)
     result = {
         'type': 'enocean',
-        'device_id': packet.device_id,
-        'timestamp': packet.timestamp,
-        'rssi': packet.rssi,
-        'eep': packet.eep,
-        'payload': packet.payload
+        'device_id': device_id,
+        'timestamp': timestamp,
+        'rssi': rssi,
+        'eep': eep,
+        'payload': payload
     }
     
-    # Add optional fields if present
-    if packet.HasField('ap_mac'):
-        result['access_point'] = packet.ap_mac
-        result['reporter'] = packet.ap_mac
-    
-    if packet.HasField('device_name'):
-        result['device_name'] = packet.device_name
+    # Add optional fields (including sensor data) if present
+    has_field = packet.HasField
+    if has_field('ap_mac'):
+        result['access_point'] = result['reporter'] = packet.ap_mac
+    for field in _ENOCEAN_OPTIONAL:
+        if has_field(field):
+            result[field] = getattr(packet, field)
     
-    if packet.HasField('distance'):
-        result['distance'] = packet.distance
-    
-    # Add sensor data if present
-    if packet.HasField('temperature'):
-        result['temperature'] = packet.temperature
-    
-    if packet.HasField('humidity'):
-        result['humidity'] = packet.humidity
-    
-    if packet.HasField('contact_state'):
-        result['contact_state'] = packet.contact_state
-    
-    if packet.HasField('illuminance'):
-        result['illuminance'] = packet.illuminance
-    
-    if packet.HasField('battery_level'):
-        result['battery_level'] = packet.battery_level
-    
-    logger.info(f"decode_enocean_packet: Successfully decoded protobuf data")
     return result
 
 def is_enocean_data(data: Dict[str, Any]) -> bool:
@@ -560,3 +569,649 @@ def is_enocean_data(data: Dict[str, Any]) -> bool:
     
     # Check for EnOcean indicators
     return 'eep' in data or 'payload' in data or 'enocean' in str(data).lower()
+
+# ---------------------------------------------------------------------------
+# Compact v2 messages
+#
+# The v2 schemas carry MAC addresses as fixed64, UUIDs and EnOcean payloads as
+# raw bytes, RSSI as zigzag sint32, EEPs as a packed uint32 and timestamps as
+# epoch microseconds. Decoders return the same dictionary shape as v1.
+# ---------------------------------------------------------------------------
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _mac_to_int(mac: str) -> int:
+    """Pack a 'aa:bb:cc:dd:ee:ff' MAC address into an integer (0 if invalid)"""
+    try:
+        return int(mac.replace(':', '').replace('-', ''), 16) if mac else 0
+    except ValueError:
+        return 0
+
+def _int_to_mac(value: int) -> str:
+    """Format a packed MAC address as 'aa:bb:cc:dd:ee:ff'"""
+    return value.to_bytes(6, 'big').hex(':')
+
+def _uuid_to_bytes(uuid: str) -> bytes:
+    """Pack a hyphenated UUID string into 16 bytes (empty if invalid)"""
+    try:
+        packed = bytes.fromhex(uuid.replace('-', '')) if uuid else b''
+    except ValueError:
+        return b''
+    return packed if len(packed) == 16 else b''
+
+def _bytes_to_uuid(packed: bytes) -> str:
+    """Format 16 UUID bytes as a hyphenated string"""
+    if len(packed) != 16:
+        return ''
+    digits = packed.hex()
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+def _eep_to_int(eep: str) -> int:
+    """Pack an 'RR-FF-TT' EnOcean Equipment Profile into RORG << 16 | FUNC << 8 | TYPE"""
+    try:
+        rorg, func, eep_type = (int(part, 16) for part in eep.split('-'))
+    except (AttributeError, ValueError):
+        return 0
+    return (rorg & 0xFF) << 16 | (func & 0xFF) << 8 | (eep_type & 0xFF)
+
+def _int_to_eep(value: int) -> str:
+    """Format a packed EnOcean Equipment Profile as 'RR-FF-TT'"""
+    if not value:
+        return ''
+    return f"{value >> 16 & 0xFF:02X}-{value >> 8 & 0xFF:02X}-{value & 0xFF:02X}"
+
+def _timestamp_to_us(timestamp: Union[str, int, float, None]) -> int:
+    """Convert an ISO timestamp or numeric epoch time to epoch microseconds (now if missing or invalid)"""
+    if isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool):
+        try:
+            return epoch_to_ns(timestamp) // 1000
+        except (OverflowError, ValueError):
+            return now_ns() // 1000
+    if timestamp:
+        try:
+            moment = datetime.fromisoformat(timestamp)
+        except (TypeError, ValueError):
+            return now_ns() // 1000
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return (moment - _EPOCH) // timedelta(microseconds=1)
+    return now_ns() // 1000
+
+def _us_to_timestamp(timestamp_us: int) -> str:
+    """Convert epoch microseconds to an ISO timestamp (as datetime.isoformat())"""
+    return format_timestamp(timestamp_us * 1000)
+
+def encode_ibeacon_packet_v2(data: Dict[str, Any]) -> bytes:
+    """
+    Encode a BLE packet with iBeacon data to the compact v2 protobuf format
+    
+    Args:
+        data: Dictionary containing the iBeacon packet data
+        
+    Returns:
+        Binary protobuf message
+    """
+    rssi = data.get('rssi', 0)
+    beacon = parse_manufacturer_data(data.get('manufacturerData'))
+    if beacon is None or beacon['format'] != 'ibeacon':
+        beacon = {'uuid': data.get('uuid', ''), 'major': data.get('major', 0),
+                  'minor': data.get('minor', 0), 'tx_power': data.get('txPower', 0)}
+    tx_power = beacon['tx_power']
+    packet = _message('IBeaconPacketV2')(
+        device_mac=_mac_to_int(data.get('macAddress', '')),
+        timestamp_us=_timestamp_to_us(data.get('timestamp')),
+        rssi=rssi,
+        uuid=_uuid_to_bytes(beacon['uuid']),
+        major=beacon['major'],
+        minor=beacon['minor'],
+        tx_power=tx_power
+    )
+    
+    # Set optional fields only if they're available
+    ap_mac = data.get('accessPoint')
+    if ap_mac:
+        packet.ap_mac = ap_mac
+    device_name = data.get('deviceName')
+    if device_name:
+        packet.device_name = device_name
+    if rssi and tx_power:
+        packet.distance = 10 ** ((tx_power - rssi) / 20)
+    
+    return packet.SerializeToString()
+
+def decode_ibeacon_packet_v2(binary_data: bytes) -> Dict[str, Any]:
+    """
+    Decode a compact v2 protobuf message to an iBeacon packet dictionary
+    
+    Args:
+        binary_data: Protobuf binary data
+        
+    Returns:
+        Dictionary with decoded packet data (same shape as decode_ibeacon_packet)
+    """
+    packet = _message('IBeaconPacketV2')()
+    packet.ParseFromString(binary_data)
+    return _ibeacon_v2_to_dict(packet)
+
+_IBEACON_V2_FIELDS = attrgetter('device_mac', 'timestamp_us', 'rssi', 'uuid', 'major', 'minor', 'tx_power')
+
+def _ibeacon_v2_to_dict(packet: 'IBeaconPacketV2') -> Dict[str, Any]:
+    """Convert a parsed IBeaconPacketV2 message to a packet dictionary"""
+    device_mac, timestamp_us, rssi, uuid, major, minor, tx_power = _IBEACON_V2_FIELDS(packet)
+    mac_address = _int_to_mac(device_mac)
+    result = {
+        'type': 'ble',
+        'subtype': 'ibeacon',
+        'device_id': mac_address,  # Using MAC as device ID
+        'mac_address': mac_address,
+        'timestamp': _us_to_timestamp(timestamp_us),
+        'rssi': rssi,
+        'uuid': _bytes_to_uuid(uuid),
+        'major': major,
+        'minor': minor,
+        'tx_power': tx_power,
+    }
+    
+    has_field = packet.HasField
+    if has_field('ap_mac'):
+        result['access_point'] = result['reporter'] = packet.ap_mac
+    if has_field('device_name'):
+        result['device_name'] = packet.device_name
+    if has_field('distance'):
+        result['distance'] = packet.distance
+    
+    return result
+
+def encode_wifi_packet_v2(data: Dict[str, Any]) -> bytes:
+    """
+    Encode a WiFi packet to the compact v2 protobuf format
+    
+    Args:
+        data: Dictionary containing the WiFi packet data
+        
+    Returns:
+        Binary protobuf message
+    """
+    rssi = data.get('rssi', 0)
+    packet = _message('WiFiPacketV2')(
+        device_mac=_mac_to_int(data.get('macAddress', '')),
+        timestamp_us=_timestamp_to_us(data.get('timestamp')),
+        rssi=rssi,
+        ssid=data.get('ssid', ''),
+        channel=data.get('channel', 0)
+    )
+    
+    # Set optional fields only if they're available
+    for key, field in (('accessPoint', 'ap_mac'), ('deviceName', 'device_name'), ('security', 'security'),
+                       ('frequency', 'frequency'), ('vendor', 'vendor'), ('signalLevel', 'signal_level')):
+        value = data.get(key)
+        if value:
+            setattr(packet, field, value)
+    if rssi:
+        # Using -40 as a reference RSSI at 1m, as in encode_wifi_packet
+        packet.distance = 10 ** ((-40 - rssi) / 20)
+    
+    return packet.SerializeToString()
+
+def decode_wifi_packet_v2(binary_data: bytes) -> Dict[str, Any]:
+    """
+    Decode a compact v2 protobuf message to a WiFi packet dictionary
+    
+    Args:
+        binary_data: Protobuf binary data
+        
+    Returns:
+        Dictionary with decoded packet data (same shape as decode_wifi_packet)
+    """
+    packet = _message('WiFiPacketV2')()
+    packet.ParseFromString(binary_data)
+    return _wifi_v2_to_dict(packet)
+
+_WIFI_V2_FIELDS = attrgetter('device_mac', 'timestamp_us', 'rssi', 'ssid', 'channel')
+
+def _wifi_v2_to_dict(packet: 'WiFiPacketV2') -> Dict[str, Any]:
+    """Convert a parsed WiFiPacketV2 message to a packet dictionary"""
+    device_mac, timestamp_us, rssi, ssid, channel = _WIFI_V2_FIELDS(packet)
+    mac_address = _int_to_mac(device_mac)
+    result = {
+        'type': 'wifi',
+        'device_id': mac_address,  # Using MAC as device ID
+        'mac_address': mac_address,
+        'timestamp': _us_to_timestamp(timestamp_us),
+        'rssi': rssi,
+        'ssid': ssid,
+        'channel': channel,
+    }
+    
+    has_field = packet.HasField
+    if has_field('ap_mac'):
+        result['access_point'] = result['reporter'] = packet.ap_mac
+    for field in _WIFI_OPTIONAL:
+        if has_field(field):
+            result[field] = getattr(packet, field)
+    
+    return result
+
+def encode_enocean_packet_v2(data: Dict[str, Any]) -> bytes:
+    """
+    Encode an EnOcean packet to the compact v2 protobuf format
+    
+    Args:
+        data: Dictionary containing the EnOcean packet data
+        
+    Returns:
+        Binary protobuf message
+    """
+    rssi = data.get('rssi', 0)
+    try:
+        payload = bytes.fromhex(data.get('payload', '') or '')
+    except ValueError:
+        logger.warning(f"encode_enocean_packet_v2: Payload is not hex, sending it as UTF-8")
+        payload = str(data.get('payload')).encode()
+    
+    packet = _message('EnOceanPacketV2')(
+        device_id=data.get('deviceId', 'unknown'),
+        timestamp_us=_timestamp_to_us(data.get('timestamp')),
+        rssi=rssi,
+        eep=_eep_to_int(data.get('eep', '')),
+        payload=payload
+    )
+    
+    # Set optional fields only if they're available
+    ap_mac = data.get('accessPoint')
+    if ap_mac:
+        packet.ap_mac = ap_mac
+    device_name = data.get('deviceName')
+    if device_name:
+        packet.device_name = device_name
+    
+    # Set sensor data if available, decoding it from the payload when the AP did not
+    decoded = decode_eep(data.get('eep', ''), payload)
+    for key, field in (('temperature', 'temperature'), ('humidity', 'humidity'),
+                       ('illuminance', 'illuminance'), ('batteryLevel', 'battery_level')):
+        value = data.get(key, decoded.get(field))
+        if value is not None:
+            setattr(packet, field, float(value))
+    contact_state = data.get('contactState', decoded.get('contact_state'))
+    if contact_state is not None:
+        packet.contact_state = bool(contact_state)
+    if rssi:
+        # Using -40 as a reference RSSI at 1m, as in encode_enocean_packet
+        packet.distance = 10 ** ((-40 - rssi) / 20)
+    
+    return packet.SerializeToString()
+
+def decode_enocean_packet_v2(binary_data: bytes) -> Dict[str, Any]:
+    """
+    Decode a compact v2 protobuf message to an EnOcean packet dictionary
+    
+    Args:
+        binary_data: Protobuf binary data
+        
+    Returns:
+        Dictionary with decoded packet data (same shape as decode_enocean_packet)
+    """
+    packet = _message('EnOceanPacketV2')()
+    packet.ParseFromString(binary_data)
+    return _enocean_v2_to_dict(packet)
+
+_ENOCEAN_V2_FIELDS = attrgetter('device_id', 'timestamp_us', 'rssi', 'eep', 'payload')
+
+def _enocean_v2_to_dict(packet: 'EnOceanPacketV2') -> Dict[str, Any]:
+    """Convert a parsed EnOceanPacketV2 message to a packet dictionary"""
+    device_id, timestamp_us, rssi, eep, payload = _ENOCEAN_V2_FIELDS(packet)
+    result = {
+        'type': 'enocean',
+        'device_id': device_id,
+        'timestamp': _us_to_timestamp(timestamp_us),
+        'rssi': rssi,
+        'eep': _int_to_eep(eep),
+        'payload': payload.hex()
+    }
+    
+    has_field = packet.HasField
+    if has_field('ap_mac'):
+        result['access_point'] = result['reporter'] = packet.ap_mac
+    for field in _ENOCEAN_OPTIONAL:
+        if has_field(field):
+            result[field] = getattr(packet, field)
+    
+    return result
+
+# ---------------------------------------------------------------------------
+# Length-delimited packet streams
+#
+# A stream frame packs many typed messages into one WebSocket frame:
+#
+#     STREAM_MAGIC  STREAM_VERSION  { type_code  varint(length)  message }*
+#
+# The magic byte can never start one of the bare packet messages above (it
+# would be a multi-byte tag for a field number > 15), so stream frames and
+# bare protobuf frames can share the same connection.
+# ---------------------------------------------------------------------------
+
+STREAM_MAGIC = 0xAB
+STREAM_VERSION = 0x01
+
+STREAM_TYPE_IBEACON = 1
+STREAM_TYPE_WIFI = 2
+STREAM_TYPE_ENOCEAN = 3
+STREAM_TYPE_IBEACON_V2 = 4
+STREAM_TYPE_WIFI_V2 = 5
+STREAM_TYPE_ENOCEAN_V2 = 6
+
+# type_code -> codec decoding it (filled by register_codec)
+_STREAM_CODECS: Dict[int, 'ProtocolCodec'] = {}
+
+class StreamFormatError(ValueError):
+    """Raised when a packet stream frame is truncated or malformed"""
+
+def is_packet_stream(binary_data: bytes) -> bool:
+    """
+    Check if a binary frame is a length-delimited packet stream
+    
+    Args:
+        binary_data: Raw WebSocket frame
+        
+    Returns:
+        True if the frame starts with the stream header
+    """
+    return len(binary_data) >= 2 and binary_data[0] == STREAM_MAGIC and binary_data[1] == STREAM_VERSION
+
+def _encode_varint(value: int) -> bytes:
+    """Encode an unsigned integer as a protobuf base-128 varint"""
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def encode_packet_stream(messages: List[Tuple[int, bytes]]) -> bytes:
+    """
+    Pack serialized messages into one length-delimited stream frame
+    
+    Args:
+        messages: (type_code, serialized message) pairs
+        
+    Returns:
+        Stream frame bytes
+    """
+    parts = [bytes((STREAM_MAGIC, STREAM_VERSION))]
+    for type_code, payload in messages:
+        parts.append(bytes((type_code,)))
+        parts.append(_encode_varint(len(payload)))
+        parts.append(payload)
+    return b''.join(parts)
+
+def iter_packet_stream(binary_data: bytes) -> Iterator[Tuple[int, memoryview]]:
+    """
+    Iterate over the typed messages of a stream frame without copying them
+    
+    Args:
+        binary_data: Stream frame (bytes, bytearray or memoryview)
+        
+    Yields:
+        (type_code, memoryview slice of the serialized message)
+    """
+    view = memoryview(binary_data)
+    end = len(view)
+    pos = 2  # skip magic and version
+    while pos < end:
+        type_code = view[pos]
+        pos += 1
+        
+        # Inline varint decode of the message length
+        length = 0
+        shift = 0
+        while True:
+            if pos >= end:
+                raise StreamFormatError("Truncated length prefix in packet stream")
+            byte = view[pos]
+            pos += 1
+            length |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+            if shift > 28:
+                raise StreamFormatError("Length prefix too long in packet stream")
+        
+        if pos + length > end:
+            raise StreamFormatError(f"Message of {length} bytes overruns packet stream at offset {pos}")
+        yield type_code, view[pos:pos + length]
+        pos += length
+
+def decode_packet_stream(binary_data: bytes) -> List[Dict[str, Any]]:
+    """
+    Decode every message of a stream frame to packet dictionaries
+    
+    Consecutive messages of the same type are handed to their codec's batch
+    decoder together. Messages with an unknown type code are skipped.
+    
+    Args:
+        binary_data: Stream frame
+        
+    Returns:
+        List of dictionaries with decoded packet data, in stream order
+    """
+    results = []
+    skipped = 0
+    run_code = None
+    run: List[memoryview] = []
+    for type_code, payload in iter_packet_stream(binary_data):
+        if type_code != run_code:
+            if run:
+                skipped += _decode_run(run_code, run, results)
+                run = []
+            run_code = type_code
+        run.append(payload)
+    if run:
+        skipped += _decode_run(run_code, run, results)
+    
+    if skipped:
+        logger.warning(f"decode_packet_stream: Skipped {skipped} messages with unknown type codes")
+    logger.info(f"decode_packet_stream: Decoded {len(results)} packets from {len(binary_data)} byte stream")
+    return results
+
+def _decode_run(type_code: int, payloads: List[memoryview], results: List[Dict[str, Any]]) -> int:
+    """Decode consecutive messages of one type into results; returns the number skipped"""
+    codec = _STREAM_CODECS.get(type_code)
+    if codec is None:
+        return len(payloads)
+    results.extend(codec.decode_batch(type_code, payloads))
+    return 0
+
+# ---------------------------------------------------------------------------
+# Protocol codec registry
+#
+# Every telemetry protocol registers one ProtocolCodec bundling its JSON
+# classifier and normalizer, its protobuf encoder/decoder and its stream
+# message types with a batch decoder. The handler dispatches a JSON packet
+# with a single codec_for_type() lookup on its 'type' and tries the
+# registered protobuf decoders in registration order; the normalizers
+# classify and encode through the codec's callables, so a new protocol
+# (Zigbee, serial, BLE periodic advertising, ...) is added by registering
+# a codec rather than by editing the dispatch code.
+# ---------------------------------------------------------------------------
+
+# Marks JSON types codec_for_type() has not resolved yet
+_UNRESOLVED = object()
+# Resolved JSON types cached beyond the registered names and aliases
+_MAX_RESOLVED_TYPES = 1024
+
+class ProtocolCodec:
+    """Classifier, JSON normalizer and protobuf codecs of one telemetry protocol"""
+
+    __slots__ = ('name', 'aliases', 'type_keywords', 'classify', 'normalize', 'encode', 'decode',
+                 'stream_types', 'decode_batch')
+
+    def __init__(self, name: str, aliases: Tuple[str, ...] = (), type_keywords: Tuple[str, ...] = (),
+                 classify=None, normalize=None, encode=None, decode=None,
+                 stream_types: Optional[Dict[int, Tuple[str, Any]]] = None, decode_batch=None):
+        """
+        Args:
+            name: Packet type of the protocol's records (and of its JSON packets)
+            aliases: Further JSON 'type' values of the protocol
+            type_keywords: JSON types containing one of these words also map to
+                the protocol (e.g. 'bluetooth' for 'bluetooth_le')
+            classify: data -> bool, whether a JSON packet carries a payload
+                the protobuf encoder handles
+            normalize: (handler, data, received_ns) -> record, converts a JSON
+                packet to the stored record (which needs at least 'type' and
+                'timestamp')
+            encode: data -> bytes, protobuf encoder
+            decode: bytes -> record, protobuf decoder for bare frames
+            stream_types: Stream type code -> (message class name, converter
+                from a parsed message to a record)
+            decode_batch: (type_code, payloads) -> records, batch decoder for
+                consecutive stream messages; defaults to parsing every payload
+                into one reused message
+        """
+        self.name = name
+        self.aliases = tuple(aliases)
+        self.type_keywords = tuple(type_keywords)
+        self.classify = classify
+        self.normalize = normalize
+        self.encode = encode
+        self.decode = decode
+        self.stream_types = dict(stream_types or {})
+        self.decode_batch = decode_batch or self._decode_messages
+
+    def _decode_messages(self, type_code: int, payloads: List[memoryview]) -> List[Dict[str, Any]]:
+        """Parse stream messages into one reused message and convert each to a record"""
+        message_name, to_dict = self.stream_types[type_code]
+        packet = _message(message_name)()
+        parse = packet.ParseFromString
+        records = []
+        append = records.append
+        for payload in payloads:
+            parse(payload)
+            append(to_dict(packet))
+        return records
+
+    def __repr__(self) -> str:
+        return f"ProtocolCodec({self.name!r})"
+
+# Codecs by name, in registration order
+_CODECS: Dict[str, ProtocolCodec] = {}
+# Lower-case JSON 'type' -> codec (None for types no codec handles)
+_CODECS_BY_TYPE: Dict[str, Optional[ProtocolCodec]] = {}
+
+def register_codec(codec: ProtocolCodec, replace: bool = False) -> ProtocolCodec:
+    """
+    Register a protocol codec
+    
+    Args:
+        codec: Codec to register
+        replace: Replace a registered codec of the same name
+        
+    Returns:
+        The codec
+        
+    Raises:
+        ValueError: If the name or a stream type code is already registered
+    """
+    previous = _CODECS.get(codec.name)
+    if previous is not None and not replace:
+        raise ValueError(f"Codec '{codec.name}' is already registered")
+    for type_code in codec.stream_types:
+        owner = _STREAM_CODECS.get(type_code)
+        if owner is not None and owner is not previous:
+            raise ValueError(f"Stream type {type_code} is already registered by codec '{owner.name}'")
+    if previous is not None:
+        for type_code in previous.stream_types:
+            _STREAM_CODECS.pop(type_code, None)
+    _CODECS[codec.name] = codec
+    for type_code in codec.stream_types:
+        _STREAM_CODECS[type_code] = codec
+    _rebuild_type_index()
+    logger.info(f"register_codec: Registered {codec.name} codec")
+    return codec
+
+def _rebuild_type_index() -> None:
+    _CODECS_BY_TYPE.clear()
+    for codec in _CODECS.values():
+        for packet_type in (codec.name,) + codec.aliases:
+            _CODECS_BY_TYPE.setdefault(packet_type.lower(), codec)
+
+def codec_for_type(packet_type: str) -> Optional[ProtocolCodec]:
+    """
+    Codec handling JSON packets of a (lower-case) 'type' value
+    
+    A single dictionary lookup once a type has been seen; types matched by
+    keyword are resolved on first sight and cached.
+    """
+    codec = _CODECS_BY_TYPE.get(packet_type, _UNRESOLVED)
+    if codec is _UNRESOLVED:
+        codec = None
+        for candidate in _CODECS.values():
+            if any(keyword in packet_type for keyword in candidate.type_keywords):
+                codec = candidate
+                break
+        if len(_CODECS_BY_TYPE) < _MAX_RESOLVED_TYPES:
+            _CODECS_BY_TYPE[packet_type] = codec
+    return codec
+
+def get_codec(name: str) -> Optional[ProtocolCodec]:
+    """Registered codec of a protocol, or None"""
+    return _CODECS.get(name)
+
+def registered_codecs() -> List[ProtocolCodec]:
+    """Registered codecs in registration order"""
+    return list(_CODECS.values())
+
+def set_normalizer(name: str, normalize) -> None:
+    """
+    Attach the JSON normalizer of a registered codec
+    
+    The built-in protocols' normalizers are methods of the telemetry handler
+    (they feed its analytics), so app.py attaches them after registration.
+    """
+    _CODECS[name].normalize = normalize
+
+register_codec(ProtocolCodec(
+    'ble', type_keywords=('bluetooth',),
+    classify=is_ibeacon_data, encode=encode_ibeacon_packet, decode=decode_ibeacon_packet,
+    stream_types={STREAM_TYPE_IBEACON: ('IBeaconPacket', _ibeacon_to_dict),
+                  STREAM_TYPE_IBEACON_V2: ('IBeaconPacketV2', _ibeacon_v2_to_dict)}))
+register_codec(ProtocolCodec(
+    'wifi',
+    classify=is_wifi_data, encode=encode_wifi_packet, decode=decode_wifi_packet,
+    stream_types={STREAM_TYPE_WIFI: ('WiFiPacket', _wifi_to_dict),
+                  STREAM_TYPE_WIFI_V2: ('WiFiPacketV2', _wifi_v2_to_dict)}))
+register_codec(ProtocolCodec(
+    'enocean',
+    classify=is_enocean_data, encode=encode_enocean_packet, decode=decode_enocean_packet,
+    stream_types={STREAM_TYPE_ENOCEAN: ('EnOceanPacket', _enocean_to_dict),
+                  STREAM_TYPE_ENOCEAN_V2: ('EnOceanPacketV2', _enocean_v2_to_dict)}))
+
+def protobuf_backend() -> str:
+    """
+    Name of the protobuf runtime implementation: 'upb', 'cpp' or 'python'
+
+    The pure-Python backend is selected when no native wheel is available
+    for the platform or PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION=python is
+    set; it decodes several times slower than the native ones. Asking
+    imports the runtime, so call it when the descriptors are loaded anyway.
+    """
+    from google.protobuf.internal import api_implementation
+    return api_implementation.Type()
+
+def preload_descriptors() -> int:
+    """
+    Load every protobuf message type and exercise its parser and serializer once
+
+    Message modules are otherwise imported on first use. Servers call this
+    at startup so the first frame does not pay for it, and before forking
+    workers (see gunicorn.conf.py) so the descriptor pool and the runtime's
+    lazily built message layouts are shared copy-on-write by the workers.
+    
+    Returns:
+        Number of message types loaded
+    """
+    message_classes = [_message(name) for name in _MESSAGE_MODULES]
+    for message_class in message_classes:
+        message_class.FromString(message_class().SerializeToString())
+    logger.info(f"preload_descriptors: Loaded {len(message_classes)} protobuf message types "
+                f"({protobuf_backend()} backend)")
+    return len(message_classes)
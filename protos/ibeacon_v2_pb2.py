@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: protos/ibeacon_v2.proto
+# Protobuf Python Version: 6.31.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    6,
+    31,
+    1,
+    '',
+    'protos/ibeacon_v2.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x17protos/ibeacon_v2.proto\x12\taruba.iot\"\xf5\x01\n\x0fIBeaconPacketV2\x12\x12\n\ndevice_mac\x18\x01 \x01(\x06\x12\x14\n\x0ctimestamp_us\x18\x02 \x01(\x03\x12\x0c\n\x04rssi\x18\x03 \x01(\x11\x12\x0c\n\x04uuid\x18\x04 \x01(\x0c\x12\r\n\x05major\x18\x05 \x01(\r\x12\r\n\x05minor\x18\x06 \x01(\r\x12\x10\n\x08tx_power\x18\x07 \x01(\x11\x12\x13\n\x06\x61p_mac\x18\x08 \x01(\tH\x00\x88\x01\x01\x12\x18\n\x0b\x64\x65vice_name\x18\t \x01(\tH\x01\x88\x01\x01\x12\x15\n\x08\x64istance\x18\n \x01(\x02H\x02\x88\x01\x01\x42\t\n\x07_ap_macB\x0e\n\x0c_device_nameB\x0b\n\t_distance\"H\n\x19IBeaconPacketV2Collection\x12+\n\x07packets\x18\x01 \x03(\x0b\x32\x1a.aruba.iot.IBeaconPacketV2b\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'protos.ibeacon_v2_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_IBEACONPACKETV2']._serialized_start=39
+  _globals['_IBEACONPACKETV2']._serialized_end=284
+  _globals['_IBEACONPACKETV2COLLECTION']._serialized_start=286
+  _globals['_IBEACONPACKETV2COLLECTION']._serialized_end=358
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: protos/wifi_v2.proto
+# Protobuf Python Version: 6.31.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    6,
+    31,
+    1,
+    '',
+    'protos/wifi_v2.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14protos/wifi_v2.proto\x12\taruba.iot\"\xe9\x02\n\x0cWiFiPacketV2\x12\x12\n\ndevice_mac\x18\x01 \x01(\x06\x12\x14\n\x0ctimestamp_us\x18\x02 \x01(\x03\x12\x0c\n\x04rssi\x18\x03 \x01(\x11\x12\x0c\n\x04ssid\x18\x04 \x01(\t\x12\x0f\n\x07\x63hannel\x18\x05 \x01(\r\x12\x13\n\x06\x61p_mac\x18\x06 \x01(\tH\x00\x88\x01\x01\x12\x18\n\x0b\x64\x65vice_name\x18\x07 \x01(\tH\x01\x88\x01\x01\x12\x15\n\x08\x64istance\x18\x08 \x01(\x02H\x02\x88\x01\x01\x12\x15\n\x08security\x18\t \x01(\tH\x03\x88\x01\x01\x12\x16\n\tfrequency\x18\n \x01(\rH\x04\x88\x01\x01\x12\x13\n\x06vendor\x18\x0b \x01(\tH\x05\x88\x01\x01\x12\x19\n\x0csignal_level\x18\x0c \x01(\rH\x06\x88\x01\x01\x42\t\n\x07_ap_macB\x0e\n\x0c_device_nameB\x0b\n\t_distanceB\x0b\n\t_securityB\x0c\n\n_frequencyB\t\n\x07_vendorB\x0f\n\r_signal_level\"B\n\x16WiFiPacketV2Collection\x12(\n\x07packets\x18\x01 \x03(\x0b\x32\x17.aruba.iot.WiFiPacketV2b\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'protos.wifi_v2_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_WIFIPACKETV2']._serialized_start=36
+  _globals['_WIFIPACKETV2']._serialized_end=397
+  _globals['_WIFIPACKETV2COLLECTION']._serialized_start=399
+  _globals['_WIFIPACKETV2COLLECTION']._serialized_end=465
+# @@protoc_insertion_point(module_scope)
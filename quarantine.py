@@ -0,0 +1,175 @@
+"""
+Quarantine for rejected frames of Aruba IoT Telemetry Server
+
+Frames that cannot be parsed used to be written to the log in full (in
+1000-character chunks plus a hexdump), so a burst of large malformed frames
+flooded the log and cost as much CPU to format as to reject. Instead, a
+rejected frame is now kept in a bounded in-memory ``QuarantineBuffer``
+(inspected at ``/api/quarantine``) and reported with one short log line.
+``LogLimiter`` caps how many of those lines are written per interval and
+reports how many were suppressed.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Union
+
+from timestamps import format_timestamp, now_ns
+
+logger = logging.getLogger('aruba-iot')
+
+# Rejected frames kept in memory; the oldest is evicted first
+QUARANTINE_SIZE = int(os.getenv('QUARANTINE_SIZE', 100))
+# Longer frames are quarantined truncated to this many bytes (characters for text)
+QUARANTINE_MAX_FRAME_BYTES = int(os.getenv('QUARANTINE_MAX_FRAME_BYTES', 16 * 1024))
+# Bad-frame error lines logged per minute; the rest are counted
+BAD_FRAME_LOG_RATE = int(os.getenv('BAD_FRAME_LOG_RATE', 10))
+
+# Characters of a frame shown in previews and around the error position
+PREVIEW_CHARS = 200
+CONTEXT_CHARS = 40
+
+
+class QuarantinedFrame:
+    """A rejected frame and why it was rejected"""
+
+    __slots__ = ('id', 'received_ns', 'source', 'reason', 'error_pos', 'size', 'frame', 'truncated')
+
+    def __init__(self, frame_id: int, received_ns: int, source: Optional[str], reason: str,
+                 error_pos: Optional[int], frame: Union[str, bytes], max_bytes: int):
+        self.id = frame_id
+        self.received_ns = received_ns
+        self.source = source
+        self.reason = reason
+        self.error_pos = error_pos
+        self.size = len(frame)
+        self.truncated = len(frame) > max_bytes
+        self.frame = frame[:max_bytes] if self.truncated else frame
+
+    def context(self) -> Optional[str]:
+        """Text around the error position, or None if it is unknown or was truncated away"""
+        if self.error_pos is None or self.error_pos > len(self.frame):
+            return None
+        start = max(0, self.error_pos - CONTEXT_CHARS)
+        text = self.frame[start:self.error_pos + CONTEXT_CHARS]
+        if isinstance(text, bytes):
+            text = text.decode('latin-1')
+        return text
+
+    def to_dict(self, include_frame: bool = False) -> Dict[str, Any]:
+        preview = self.frame[:PREVIEW_CHARS]
+        result = {
+            'id': self.id,
+            'received_at': format_timestamp(self.received_ns),
+            'source': self.source,
+            'reason': self.reason,
+            'error_pos': self.error_pos,
+            'size': self.size,
+            'binary': isinstance(self.frame, bytes),
+            'truncated': self.truncated,
+            'preview': preview.hex() if isinstance(preview, bytes) else preview,
+            'context': self.context(),
+        }
+        if include_frame:
+            result['frame'] = self.frame.hex() if isinstance(self.frame, bytes) else self.frame
+        return result
+
+
+class QuarantineBuffer:
+    """Bounded buffer of the most recently rejected frames"""
+
+    def __init__(self, capacity: int = QUARANTINE_SIZE, max_frame_bytes: int = QUARANTINE_MAX_FRAME_BYTES):
+        self.max_frame_bytes = max_frame_bytes
+        self._frames: Deque[QuarantinedFrame] = deque(maxlen=max(1, capacity))
+        self._lock = threading.Lock()
+        self.total_count = 0
+
+    def add(self, frame: Union[str, bytes], reason: str, error_pos: Optional[int] = None,
+            source: Optional[str] = None, received_ns: Optional[int] = None) -> QuarantinedFrame:
+        """
+        Quarantine a rejected frame
+
+        Args:
+            frame: The frame as received (text or binary)
+            reason: Why the frame was rejected
+            error_pos: Position of the error in the frame, if known
+            source: AP name or address the frame came from
+            received_ns: Receive time in epoch nanoseconds (now if omitted)
+
+        Returns:
+            The quarantined entry
+        """
+        with self._lock:
+            self.total_count += 1
+            entry = QuarantinedFrame(self.total_count, received_ns if received_ns is not None else now_ns(),
+                                     source, reason, error_pos, frame, self.max_frame_bytes)
+            self._frames.append(entry)
+        return entry
+
+    def entries(self, limit: Optional[int] = None) -> List[QuarantinedFrame]:
+        """Quarantined frames, newest first"""
+        with self._lock:
+            frames = list(self._frames)
+        frames.reverse()
+        return frames[:limit] if limit is not None else frames
+
+    def get(self, frame_id: int) -> Optional[QuarantinedFrame]:
+        with self._lock:
+            for entry in self._frames:
+                if entry.id == frame_id:
+                    return entry
+        return None
+
+    def clear(self) -> int:
+        """Drop every quarantined frame; returns how many were dropped"""
+        with self._lock:
+            count = len(self._frames)
+            self._frames.clear()
+        return count
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+
+class LogLimiter:
+    """
+    Writes at most ``limit`` log lines per ``interval`` seconds
+
+    Lines beyond the limit are counted, and the count is appended to the
+    first line written in a later interval. Lines are truncated to
+    ``max_length`` characters.
+    """
+
+    def __init__(self, limit: int = BAD_FRAME_LOG_RATE, interval: float = 60.0, max_length: int = 500):
+        self.limit = limit
+        self.interval = interval
+        self.max_length = max_length
+        self._window_start = float('-inf')
+        self._written = 0
+        self.suppressed = 0
+
+    def log(self, level: int, message: str, now: Optional[float] = None) -> bool:
+        """Log a message unless the limit is reached; returns whether it was written"""
+        now = time.monotonic() if now is None else now
+        if now - self._window_start >= self.interval:
+            self._window_start = now
+            self._written = 0
+        if self._written >= self.limit:
+            self.suppressed += 1
+            return False
+        self._written += 1
+        if len(message) > self.max_length:
+            message = message[:self.max_length] + f"... ({len(message)} characters)"
+        if self.suppressed:
+            message += f" ({self.suppressed} similar messages suppressed)"
+            self.suppressed = 0
+        logger.log(level, message)
+        return True
+
+    def error(self, message: str) -> bool:
+        return self.log(logging.ERROR, message)
+
+    def warning(self, message: str) -> bool:
+        return self.log(logging.WARNING, message)
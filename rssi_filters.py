@@ -0,0 +1,132 @@
+"""
+RSSI smoothing filters for Aruba IoT Telemetry Server
+
+This module provides small, constant-memory filters used to smooth raw RSSI
+readings per (device, access point) pair. Each filter keeps O(1) state in a
+slotted object, so updating it costs a handful of float operations instead of
+re-averaging a history list on every packet.
+
+The filter used by the telemetry handler is selected with the ``RSSI_FILTER``
+environment variable (``ewma`` or ``kalman``).
+"""
+import logging
+import os
+from typing import Callable, Dict, Optional, Type
+
+logger = logging.getLogger('aruba-iot')
+
+# Typical iBeacon measured power (RSSI at 1 meter) when the packet carries none
+DEFAULT_REFERENCE_RSSI = -59
+
+# Log-distance path loss exponent used by the existing encoders (free space)
+PATH_LOSS_EXPONENT = 2.0
+
+
+class EWMAFilter:
+    """Exponentially weighted moving average of RSSI readings"""
+
+    __slots__ = ('alpha', 'value', 'count')
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self.value = 0.0
+        self.count = 0
+
+    def update(self, rssi: float) -> float:
+        """Feed one reading and return the smoothed value"""
+        if self.count:
+            self.value += self.alpha * (rssi - self.value)
+        else:
+            self.value = float(rssi)
+        self.count += 1
+        return self.value
+
+
+class KalmanFilter:
+    """One-dimensional Kalman filter for a slowly varying RSSI level
+
+    Models RSSI as a constant with process noise ``q`` observed through
+    measurement noise ``r`` (both in dBm^2).
+    """
+
+    __slots__ = ('q', 'r', 'value', 'p', 'count')
+
+    def __init__(self, q: float = 0.125, r: float = 4.0):
+        self.q = q
+        self.r = r
+        self.value = 0.0
+        self.p = 1.0
+        self.count = 0
+
+    def update(self, rssi: float) -> float:
+        """Feed one reading and return the filtered estimate"""
+        if self.count:
+            p = self.p + self.q
+            gain = p / (p + self.r)
+            self.value += gain * (rssi - self.value)
+            self.p = (1.0 - gain) * p
+        else:
+            self.value = float(rssi)
+            self.p = self.r
+        self.count += 1
+        return self.value
+
+
+# Registry of available filter implementations, keyed by RSSI_FILTER name
+RSSI_FILTERS: Dict[str, Type] = {
+    'ewma': EWMAFilter,
+    'kalman': KalmanFilter,
+}
+
+
+def register_rssi_filter(name: str, filter_class: Type) -> None:
+    """
+    Register an additional RSSI filter implementation
+
+    Args:
+        name: Name used to select the filter via RSSI_FILTER
+        filter_class: Class with an ``update(rssi) -> float`` method
+    """
+    RSSI_FILTERS[name.lower()] = filter_class
+
+
+def create_rssi_filter_factory(name: Optional[str] = None) -> Callable[[], object]:
+    """
+    Build a zero-argument factory for the configured RSSI filter
+
+    Args:
+        name: Filter name; defaults to the RSSI_FILTER environment variable
+
+    Returns:
+        Callable returning a fresh filter instance
+    """
+    name = (name or os.getenv('RSSI_FILTER', 'ewma')).lower()
+    filter_class = RSSI_FILTERS.get(name)
+    if filter_class is None:
+        logger.warning(f"create_rssi_filter_factory: Unknown RSSI filter '{name}', using 'ewma'")
+        name, filter_class = 'ewma', EWMAFilter
+
+    if filter_class is EWMAFilter:
+        alpha = float(os.getenv('RSSI_EWMA_ALPHA', 0.3))
+        return lambda: EWMAFilter(alpha)
+    if filter_class is KalmanFilter:
+        q = float(os.getenv('RSSI_KALMAN_Q', 0.125))
+        r = float(os.getenv('RSSI_KALMAN_R', 4.0))
+        return lambda: KalmanFilter(q, r)
+    return filter_class
+
+
+def estimate_distance(rssi: float, reference_rssi: Optional[float] = None) -> float:
+    """
+    Estimate distance in meters from a (filtered) RSSI value
+
+    Args:
+        rssi: RSSI in dBm
+        reference_rssi: RSSI measured at 1 meter (iBeacon txPower)
+
+    Returns:
+        Approximate distance in meters
+    """
+    if not reference_rssi:
+        reference_rssi = DEFAULT_REFERENCE_RSSI
+    return 10 ** ((reference_rssi - rssi) / (10 * PATH_LOSS_EXPONENT))
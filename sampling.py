@@ -0,0 +1,161 @@
+"""
+Per-device rate limiting and sampling for Aruba IoT Telemetry Server
+
+Some beacons advertise at 10 Hz or faster. Storing every advertisement lets a
+handful of chatty devices evict useful data from the telemetry buffer. This
+module decides, per packet, whether the record should be stored, while the
+handler keeps updating the device registry and analytics for every packet.
+
+Policies are configured with the ``SAMPLING_POLICIES`` environment variable,
+a JSON object keyed by ``type:<packet type>`` or ``device:<device id>``::
+
+    SAMPLING_POLICIES={"type:ble": {"max_rate": 2, "store_every": 5},
+                       "device:ibeacon-1234": {"max_rate": 0.2}}
+
+``max_rate`` is the maximum number of stored records per second (0 means
+unlimited) and ``store_every`` stores one in K packets. Device policies take
+precedence over type policies.
+"""
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger('aruba-iot')
+
+# Seconds without traffic after which a device's bucket may be pruned
+IDLE_TIMEOUT = 60.0
+
+
+class SamplingPolicy:
+    """Storage policy for one device or packet type"""
+
+    __slots__ = ('max_rate', 'store_every')
+
+    def __init__(self, max_rate: float = 0.0, store_every: int = 1):
+        self.max_rate = float(max_rate)
+        self.store_every = max(1, int(store_every))
+
+    @property
+    def unlimited(self) -> bool:
+        """True when the policy stores every packet"""
+        return self.max_rate <= 0 and self.store_every == 1
+
+
+UNLIMITED = SamplingPolicy()
+
+
+class _DeviceBucket:
+    """Token bucket and 1-in-K counter for a single device"""
+
+    __slots__ = ('policy', 'tokens', 'last_refill', 'counter')
+
+    def __init__(self, policy: SamplingPolicy, now: float):
+        self.policy = policy
+        # Allow a burst of one second's worth of records (at least one)
+        self.tokens = max(1.0, policy.max_rate)
+        self.last_refill = now
+        self.counter = 0
+
+
+class TelemetrySampler:
+    """Decides which packets are stored, using a per-device token-bucket table"""
+
+    def __init__(self, policies: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Args:
+            policies: Policy mapping as described in the module docstring;
+                defaults to the SAMPLING_POLICIES environment variable
+        """
+        if policies is None:
+            try:
+                policies = json.loads(os.getenv('SAMPLING_POLICIES', '') or '{}')
+            except json.JSONDecodeError as e:
+                logger.error(f"TelemetrySampler: Invalid SAMPLING_POLICIES, sampling disabled: {e}")
+                policies = {}
+
+        self.type_policies: Dict[str, SamplingPolicy] = {}
+        self.device_policies: Dict[str, SamplingPolicy] = {}
+        for key, options in policies.items():
+            scope, _, name = key.partition(':')
+            policy = SamplingPolicy(options.get('max_rate', 0), options.get('store_every', 1))
+            if scope == 'type':
+                self.type_policies[name.lower()] = policy
+            elif scope == 'device':
+                self.device_policies[name] = policy
+            else:
+                logger.warning(f"TelemetrySampler: Ignoring sampling policy with unknown scope '{key}'")
+
+        self.enabled = bool(self.type_policies or self.device_policies)
+        self._buckets: Dict[str, _DeviceBucket] = {}
+        self._prune_threshold = 1024
+        self.dropped_count = 0
+
+    def policy_for(self, packet_type: str, device_id: str) -> SamplingPolicy:
+        """Resolve the policy for a device, falling back to its packet type"""
+        policy = self.device_policies.get(device_id)
+        if policy is None:
+            policy = self.type_policies.get(packet_type, UNLIMITED)
+        return policy
+
+    def should_store(self, packet_type: str, device_id: str, now: Optional[float] = None) -> bool:
+        """
+        Check whether a packet from this device should be stored
+
+        Args:
+            packet_type: Packet type ('ble', 'wifi', 'enocean', ...)
+            device_id: Reported device identifier
+            now: Monotonic time in seconds (defaults to time.monotonic())
+
+        Returns:
+            True if the record should be stored in the telemetry buffer
+        """
+        if not self.enabled:
+            return True
+
+        bucket = self._buckets.get(device_id)
+        if bucket is None:
+            policy = self.policy_for(packet_type, device_id)
+            if policy.unlimited:
+                return True
+            if now is None:
+                now = time.monotonic()
+            bucket = self._buckets[device_id] = _DeviceBucket(policy, now)
+            if len(self._buckets) > self._prune_threshold:
+                self._prune(now)
+        elif now is None:
+            now = time.monotonic()
+
+        policy = bucket.policy
+        # Refill the token bucket for the elapsed time
+        if policy.max_rate > 0:
+            capacity = max(1.0, policy.max_rate)
+            bucket.tokens = min(capacity, bucket.tokens + (now - bucket.last_refill) * policy.max_rate)
+        bucket.last_refill = now
+
+        bucket.counter += 1
+        if (bucket.counter - 1) % policy.store_every:
+            self.dropped_count += 1
+            return False
+
+        if policy.max_rate > 0:
+            if bucket.tokens < 1.0:
+                self.dropped_count += 1
+                return False
+            bucket.tokens -= 1.0
+
+        return True
+
+    def _prune(self, now: float) -> None:
+        """Drop buckets of idle devices so the table tracks the active set"""
+        horizon = now - IDLE_TIMEOUT
+        idle = [device_id for device_id, bucket in self._buckets.items() if bucket.last_refill < horizon]
+        for device_id in idle:
+            del self._buckets[device_id]
+        # Next prune once the active set has doubled
+        self._prune_threshold = max(1024, 2 * len(self._buckets))
+        logger.info(f"TelemetrySampler: Pruned {len(idle)} idle device buckets, {len(self._buckets)} active")
+
+    def __len__(self) -> int:
+        return len(self._buckets)
@@ -0,0 +1,288 @@
+"""
+SocketIO telemetry subscriptions for Aruba IoT Telemetry Server
+
+Dashboard clients that only care about part of the deployment (one floor's
+APs, a few tagged assets, one packet type) send a ``subscribe`` message with
+their filters instead of watching the global stream. Clients with identical
+filters share a SocketIO room, so every matching record is queued and emitted
+once per room rather than once per client.
+
+Routing is driven by tables precomputed whenever a subscription changes:
+rooms filtering on devices are listed under each device ID, rooms filtering
+on APs (and not devices) under each AP name, and the remaining rooms, which
+filter only on packet type and RSSI, in a wildcard list. Per record, only
+the rooms listed under its device, its hearing APs and the wildcard list are
+examined, so the routing cost follows the number of interested rooms rather
+than the number of connected clients. The tables are replaced, never
+mutated, so the ingest thread reads them without locking.
+
+Subscribe message::
+
+    {'aps': ['AP-1', ...], 'devices': ['aa:bb:...', ...],
+     'types': ['ble', 'wifi', 'enocean'], 'rssi_min': -80}
+
+All keys are optional and combine with AND; an empty message subscribes to
+every record.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, FrozenSet, List, Optional, Tuple
+
+logger = logging.getLogger('aruba-iot')
+
+# Maximum values per filter list in a subscribe message
+MAX_FILTER_VALUES = 1000
+# Records queued per room between flushes; older records are dropped first
+SUBSCRIPTION_BACKLOG = int(os.getenv('SUBSCRIPTION_BACKLOG', 500))
+
+PACKET_TYPES = frozenset(('ble', 'wifi', 'enocean'))
+
+
+def _string_set(message: Dict[str, Any], key: str) -> Optional[FrozenSet[str]]:
+    values = message.get(key)
+    if values is None or values == []:
+        return None
+    if isinstance(values, str):
+        values = values.split(',')
+    if not isinstance(values, (list, tuple)):
+        raise ValueError(f"'{key}' must be a list of strings")
+    if len(values) > MAX_FILTER_VALUES:
+        raise ValueError(f"'{key}' accepts at most {MAX_FILTER_VALUES} values")
+    result = frozenset(str(value).strip() for value in values if str(value).strip())
+    return result or None
+
+
+class Subscription:
+    """Filters of one telemetry subscription"""
+
+    __slots__ = ('aps', 'devices', 'types', 'rssi_min', 'room')
+
+    def __init__(self, aps: Optional[FrozenSet[str]] = None, devices: Optional[FrozenSet[str]] = None,
+                 types: Optional[FrozenSet[str]] = None, rssi_min: Optional[int] = None):
+        self.aps = aps
+        self.devices = devices
+        self.types = types
+        self.rssi_min = rssi_min
+        # Identical filters map to the same room
+        key = repr((sorted(aps or ()), sorted(devices or ()), sorted(types or ()), rssi_min))
+        self.room = 'telemetry:' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+    @classmethod
+    def from_message(cls, message: Optional[Dict[str, Any]]) -> 'Subscription':
+        """
+        Parse a subscribe message
+
+        Args:
+            message: Subscribe message (see module docstring), or None
+
+        Returns:
+            The subscription
+
+        Raises:
+            ValueError: If a filter is malformed
+        """
+        if message is None:
+            message = {}
+        if not isinstance(message, dict):
+            raise ValueError('subscribe expects an object')
+        types = _string_set(message, 'types')
+        if types is not None:
+            types = frozenset(t.lower() for t in types)
+            unknown = types - PACKET_TYPES
+            if unknown:
+                raise ValueError(f"unknown packet types: {', '.join(sorted(unknown))}")
+        rssi_min = message.get('rssi_min')
+        if rssi_min is not None:
+            try:
+                rssi_min = int(rssi_min)
+            except (TypeError, ValueError):
+                raise ValueError("'rssi_min' must be an integer")
+        return cls(_string_set(message, 'aps'), _string_set(message, 'devices'), types, rssi_min)
+
+    def matches(self, record: Dict[str, Any]) -> bool:
+        """Check a stored telemetry record against the filters"""
+        if self.types is not None and record.get('type') not in self.types:
+            return False
+        if self.devices is not None and record.get('device_id') not in self.devices:
+            return False
+        if self.aps is None:
+            if self.rssi_min is None:
+                return True
+            rssi = record.get('rssi')
+            return rssi is not None and rssi >= self.rssi_min
+        # With AP filters the RSSI threshold applies to the subscribed APs' readings
+        ap_rssi = record.get('ap_rssi') or {record.get('access_point'): record.get('rssi')}
+        for ap, rssi in ap_rssi.items():
+            if ap in self.aps and (self.rssi_min is None or (rssi is not None and rssi >= self.rssi_min)):
+                return True
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'aps': sorted(self.aps) if self.aps is not None else None,
+            'devices': sorted(self.devices) if self.devices is not None else None,
+            'types': sorted(self.types) if self.types is not None else None,
+            'rssi_min': self.rssi_min
+        }
+
+
+class _RoutingTables:
+    """Immutable device/AP -> subscriptions lookup built from the active rooms"""
+
+    __slots__ = ('by_device', 'by_ap', 'wildcard')
+
+    def __init__(self, subscriptions: List[Subscription] = ()):
+        by_device: Dict[str, List[Subscription]] = {}
+        by_ap: Dict[str, List[Subscription]] = {}
+        wildcard = []
+        for subscription in subscriptions:
+            if subscription.devices is not None:
+                for device_id in subscription.devices:
+                    by_device.setdefault(device_id, []).append(subscription)
+            elif subscription.aps is not None:
+                for ap in subscription.aps:
+                    by_ap.setdefault(ap, []).append(subscription)
+            else:
+                wildcard.append(subscription)
+        self.by_device = {key: tuple(value) for key, value in by_device.items()}
+        self.by_ap = {key: tuple(value) for key, value in by_ap.items()}
+        self.wildcard = tuple(wildcard)
+
+
+class SubscriptionRouter:
+    """
+    Maps SocketIO clients to subscription rooms and queues matching records per room
+
+    ``subscribe``/``unsubscribe`` run on the SocketIO side and rebuild the
+    routing tables; ``publish`` runs once per stored record on the ingest
+    side; ``drain`` hands the queued records to the emitter.
+    """
+
+    def __init__(self, backlog: int = SUBSCRIPTION_BACKLOG):
+        self.backlog = backlog
+        self._client_rooms: Dict[str, str] = {}
+        self._members: Dict[str, set] = {}
+        self._subscriptions: Dict[str, Subscription] = {}
+        self._tables = _RoutingTables()
+        self._pending: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._dropped: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.routed_count = 0
+
+    def subscribe(self, client_id: str, subscription: Subscription) -> Optional[str]:
+        """
+        Move a client into the room of a subscription, replacing its previous one
+
+        Returns:
+            The room the client left, or None
+        """
+        with self._lock:
+            previous = self._leave(client_id)
+            self._client_rooms[client_id] = subscription.room
+            members = self._members.setdefault(subscription.room, set())
+            if not members:
+                self._subscriptions[subscription.room] = subscription
+                self._pending[subscription.room] = deque(maxlen=self.backlog)
+                self._dropped[subscription.room] = 0
+            members.add(client_id)
+            self._rebuild()
+        logger.info(f"SubscriptionRouter: {client_id} subscribed to {subscription.room} "
+                    f"({len(self._subscriptions)} active rooms)")
+        return previous if previous != subscription.room else None
+
+    def unsubscribe(self, client_id: str) -> Optional[str]:
+        """Remove a client's subscription; returns the room it left, or None"""
+        with self._lock:
+            room = self._leave(client_id)
+            if room is not None:
+                self._rebuild()
+        return room
+
+    def _leave(self, client_id: str) -> Optional[str]:
+        room = self._client_rooms.pop(client_id, None)
+        if room is not None:
+            members = self._members[room]
+            members.discard(client_id)
+            if not members:
+                del self._members[room]
+                del self._subscriptions[room]
+                del self._pending[room]
+                del self._dropped[room]
+        return room
+
+    def _rebuild(self) -> None:
+        self._tables = _RoutingTables(list(self._subscriptions.values()))
+
+    def route(self, record: Dict[str, Any]) -> List[str]:
+        """Rooms whose subscription matches a record"""
+        tables = self._tables
+        if not (tables.by_device or tables.by_ap or tables.wildcard):
+            return []
+        rooms = []
+        candidates = tables.by_device.get(record.get('device_id'))
+        if candidates:
+            rooms.extend(s.room for s in candidates if s.matches(record))
+        if tables.by_ap:
+            ap_rssi = record.get('ap_rssi')
+            if ap_rssi and len(ap_rssi) > 1:
+                # A record heard by several APs may reach a room through more than one of them
+                seen = set()
+                for ap in ap_rssi:
+                    for s in tables.by_ap.get(ap, ()):
+                        if s.room not in seen:
+                            seen.add(s.room)
+                            if s.matches(record):
+                                rooms.append(s.room)
+            else:
+                candidates = tables.by_ap.get(record.get('access_point'))
+                if candidates:
+                    rooms.extend(s.room for s in candidates if s.matches(record))
+        rooms.extend(s.room for s in tables.wildcard if s.matches(record))
+        return rooms
+
+    def publish(self, record: Dict[str, Any]) -> None:
+        """Queue a stored record for every room it matches"""
+        rooms = self.route(record)
+        if not rooms:
+            return
+        with self._lock:
+            for room in rooms:
+                pending = self._pending.get(room)
+                if pending is None:
+                    continue  # room closed since routing
+                if len(pending) == pending.maxlen:
+                    self._dropped[room] += 1
+                pending.append(record)
+            self.routed_count += len(rooms)
+
+    def drain(self) -> List[Tuple[str, List[Dict[str, Any]], int]]:
+        """
+        Take the queued records of every room
+
+        Returns:
+            (room, records, records dropped because the backlog was full) per
+            room with queued records
+        """
+        batches = []
+        with self._lock:
+            for room, pending in self._pending.items():
+                if pending:
+                    batches.append((room, list(pending), self._dropped[room]))
+                    pending.clear()
+                    self._dropped[room] = 0
+        return batches
+
+    def subscription_of(self, client_id: str) -> Optional[Subscription]:
+        room = self._client_rooms.get(client_id)
+        return self._subscriptions.get(room) if room is not None else None
+
+    @property
+    def room_count(self) -> int:
+        return len(self._subscriptions)
+
+    @property
+    def client_count(self) -> int:
+        return len(self._client_rooms)
@@ -0,0 +1,627 @@
+"""
+Indexed in-memory telemetry store for Aruba IoT Telemetry Server
+
+``TelemetryBuffer`` keeps the most recent telemetry records in a fixed-size
+ring. Every stored record gets a sequence number (``seq``), so a record is
+found by arithmetic on its sequence number, and clients can fetch
+incrementally with ``since=<seq>`` or page backwards with ``cursor=<seq>``.
+Per-field indexes (record type, reporting AP, device) hold, per value, a
+ring of the sequence numbers of matching records, so filtered queries (and
+the per-device and per-AP telemetry endpoints) visit only the records they
+return.
+
+``RegistryIndex`` tracks the key order of a registry dictionary (device
+registry, BLE analytics): an append-only insertion order for stable cursor
+pagination, a recency order for ``seen_since`` queries and, per value of
+selected entry fields (type, AP), the keys having that value, so filtered
+pages visit only matching entries. Updates are
+stamped with versions from a shared ``ChangeClock``, so the keys changed
+(or removed) since a version are found by walking back from the newest
+update; the dashboard feed sends only those.
+
+``Query`` parses the paging, filter and projection parameters shared by the
+API endpoints.
+"""
+import bisect
+import logging
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger('aruba-iot')
+
+# Record fields indexed by default
+INDEX_FIELDS = ('type', 'access_point', 'device_id')
+
+# Upper bound for the limit parameter
+MAX_PAGE_SIZE = 10000
+
+
+def _split(value: Optional[str]) -> Optional[frozenset]:
+    if not value:
+        return None
+    items = frozenset(v.strip() for v in value.split(',') if v.strip())
+    return items or None
+
+
+def parse_time_ns(value: str) -> int:
+    """
+    Parse an ISO 8601 timestamp or epoch seconds into epoch nanoseconds
+
+    Naive ISO timestamps are taken as UTC.
+
+    Raises:
+        ValueError: If the value is neither
+    """
+    try:
+        return int(Decimal(value) * 1_000_000_000)
+    except (InvalidOperation, ValueError, OverflowError):
+        pass
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    delta = parsed - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1000
+
+
+class Query:
+    """Paging, filter and projection parameters of an API request"""
+
+    __slots__ = ('limit', 'cursor', 'since', 'types', 'aps', 'devices', 'seen_since_ns',
+                 'rssi_min', 'rssi_max', 'fields')
+
+    def __init__(self, limit: Optional[int] = None, cursor: Optional[int] = None, since: Optional[int] = None,
+                 types: Optional[frozenset] = None, aps: Optional[frozenset] = None,
+                 devices: Optional[frozenset] = None, seen_since_ns: Optional[int] = None, rssi_min: Optional[float] = None,
+                 rssi_max: Optional[float] = None, fields: Optional[Tuple[str, ...]] = None):
+        self.limit = limit
+        self.cursor = cursor
+        self.since = since
+        self.types = types
+        self.aps = aps
+        self.devices = devices
+        self.seen_since_ns = seen_since_ns
+        self.rssi_min = rssi_min
+        self.rssi_max = rssi_max
+        self.fields = fields
+
+    @classmethod
+    def from_args(cls, args, default_limit: Optional[int] = None) -> 'Query':
+        """
+        Build a query from request arguments
+
+        Recognized arguments: limit, cursor, since, type, ap, device
+        (comma-separated lists), seen_since (ISO 8601 or epoch seconds), rssi_min, rssi_max
+        and fields (comma-separated).
+
+        Args:
+            args: Mapping of request arguments (e.g. ``request.args``)
+            default_limit: Page size when no limit is given (None: unlimited)
+
+        Raises:
+            ValueError: If an argument is malformed
+        """
+        def number(name, convert):
+            value = args.get(name)
+            if value is None or value == '':
+                return None
+            try:
+                return convert(value)
+            except ValueError:
+                raise ValueError(f"Invalid value for '{name}': {value!r}") from None
+
+        limit = number('limit', int)
+        if limit is None:
+            limit = default_limit
+        elif limit < 0:
+            raise ValueError("'limit' must not be negative")
+        if limit is not None:
+            limit = min(limit, MAX_PAGE_SIZE)
+
+        seen_since = args.get('seen_since')
+        seen_since_ns = None
+        if seen_since:
+            try:
+                seen_since_ns = parse_time_ns(seen_since)
+            except ValueError:
+                raise ValueError(f"Invalid value for 'seen_since': {seen_since!r}") from None
+
+        fields = [f.strip() for f in (args.get('fields') or '').split(',') if f.strip()]
+        return cls(limit=limit,
+                   cursor=number('cursor', int),
+                   since=number('since', int),
+                   types=_split(args.get('type')),
+                   aps=_split(args.get('ap')),
+                   devices=_split(args.get('device')),
+                   seen_since_ns=seen_since_ns,
+                   rssi_min=number('rssi_min', float),
+                   rssi_max=number('rssi_max', float),
+                   fields=tuple(dict.fromkeys(fields)) if fields else None)
+
+    def rssi_matches(self, rssi: Any) -> bool:
+        """True if an RSSI value lies within the requested range"""
+        if self.rssi_min is None and self.rssi_max is None:
+            return True
+        if not isinstance(rssi, (int, float)):
+            return False
+        if self.rssi_min is not None and rssi < self.rssi_min:
+            return False
+        if self.rssi_max is not None and rssi > self.rssi_max:
+            return False
+        return True
+
+    def project(self, view: Dict[str, Any]) -> Dict[str, Any]:
+        """Restrict a record view to the requested fields"""
+        if self.fields is None:
+            return view
+        return {field: view[field] for field in self.fields if field in view}
+
+
+class TelemetryBuffer:
+    """
+    Fixed-size ring of recent telemetry records with sequence numbers
+
+    Sequence numbers start at 1 and increase by one per stored record; the
+    record with sequence number ``seq`` lives in slot ``seq % capacity``
+    until it is overwritten. Index entries for overwritten records are
+    dropped lazily.
+
+    Appends come from the ingest thread while API requests query from Flask
+    threads; a lock keeps index iteration consistent.
+    """
+
+    def __init__(self, capacity: int = 1000, index_fields: Iterable[str] = INDEX_FIELDS):
+        self.capacity = max(1, int(capacity))
+        self._slots: List[Optional[Dict[str, Any]]] = [None] * self.capacity
+        self.next_seq = 1
+        self._indexes: Dict[str, Dict[Any, Deque[int]]] = {field: {} for field in index_fields}
+        self._lock = threading.Lock()
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest record still held"""
+        return max(1, self.next_seq - self.capacity)
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the newest record (0 when empty)"""
+        return self.next_seq - 1
+
+    def __len__(self) -> int:
+        return self.next_seq - self.first_seq
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """
+        Store a record, evicting the oldest one when full
+
+        Args:
+            record: Telemetry record; its 'seq' field is set
+
+        Returns:
+            The record's sequence number
+        """
+        with self._lock:
+            seq = self.next_seq
+            record['seq'] = seq
+            self._slots[seq % self.capacity] = record
+            self.next_seq = seq + 1
+            oldest = seq - self.capacity
+            for field, index in self._indexes.items():
+                value = record.get(field)
+                seqs = index.get(value)
+                if seqs is None:
+                    seqs = index[value] = deque()
+                seqs.append(seq)
+                while seqs[0] <= oldest:
+                    seqs.popleft()
+            # Drop index keys whose records have all been evicted
+            if seq % self.capacity == 0:
+                self._prune(oldest)
+        return seq
+
+    def add_to_index(self, record: Dict[str, Any], field: str, value: Any) -> None:
+        """
+        Index a stored record under an additional value of a field
+
+        Used for packets heard by several APs: the record is stored once but
+        is found under every AP that reported it.
+        """
+        index = self._indexes.get(field)
+        seq = record.get('seq')
+        if index is None or seq is None:
+            return
+        with self._lock:
+            if seq < self.first_seq:
+                return
+            seqs = index.get(value)
+            if seqs is None:
+                seqs = index[value] = deque()
+            position = bisect.bisect_left(seqs, seq)
+            if position == len(seqs) or seqs[position] != seq:
+                seqs.insert(position, seq)
+
+    def _prune(self, oldest: int) -> None:
+        for index in self._indexes.values():
+            for value in [value for value, seqs in index.items() if seqs[-1] <= oldest]:
+                del index[value]
+
+    def get(self, seq: int) -> Optional[Dict[str, Any]]:
+        """Return the record with a sequence number, if still held"""
+        if seq < self.first_seq or seq > self.last_seq:
+            return None
+        record = self._slots[seq % self.capacity]
+        if record is None or record.get('seq') != seq:
+            return None
+        return record
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over the held records, oldest first"""
+        for seq in range(self.first_seq, self.next_seq):
+            record = self.get(seq)
+            if record is not None:
+                yield record
+
+    def recent(self, count: int) -> List[Dict[str, Any]]:
+        """Return the newest ``count`` records, oldest first"""
+        start = max(self.first_seq, self.next_seq - max(0, count))
+        return [record for record in map(self.get, range(start, self.next_seq)) if record is not None]
+
+    def count_by(self, field: str) -> Dict[Any, int]:
+        """Number of held records per value of an indexed field"""
+        with self._lock:
+            oldest = self.next_seq - self.capacity - 1
+            return {value: len(seqs) - bisect.bisect_right(seqs, oldest)
+                    for value, seqs in self._indexes[field].items()}
+
+    def _candidates(self, query: Query, ascending: bool, start: int, stop: int) -> Iterator[int]:
+        """
+        Sequence numbers in [start, stop) that may match, in query order
+
+        Uses the smallest applicable index; without indexed filters this
+        is the plain range. Must be called with the lock held.
+        """
+        best = None
+        for field, values in (('type', query.types), ('access_point', query.aps), ('device_id', query.devices)):
+            index = self._indexes.get(field)
+            if values is None or index is None:
+                continue
+            lists = [index[value] for value in values if value in index]
+            size = sum(len(seqs) for seqs in lists)
+            if best is None or size < best[0]:
+                best = (size, lists)
+        if best is None:
+            return iter(range(start, stop) if ascending else range(stop - 1, start - 1, -1))
+        lists = best[1]
+        if len(lists) == 1:
+            seqs = lists[0]
+            low, high = bisect.bisect_left(seqs, start), bisect.bisect_left(seqs, stop)
+            return (seqs[i] for i in (range(low, high) if ascending else range(high - 1, low - 1, -1)))
+        # Several values of one field: merge their sequence numbers
+        merged = sorted(seq for seqs in lists for seq in seqs if start <= seq < stop)
+        return iter(merged if ascending else reversed(merged))
+
+    def _first_seq_at(self, timestamp_ns: int) -> int:
+        """First sequence number received at or after a time
+
+        Records are stored in receive order and receive times never decrease
+        (see timestamps.now_ns), so the times are sorted by sequence number.
+        """
+        low, high = self.first_seq, self.next_seq
+        while low < high:
+            mid = (low + high) // 2
+            record = self.get(mid)
+            if record is not None and record.get('timestamp', 0) < timestamp_ns:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def query(self, query: Query, extra: Optional[Callable[[Dict[str, Any]], bool]] = None
+              ) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        """
+        Select a page of records
+
+        With ``since``, returns the oldest records after that sequence number
+        (incremental fetch); otherwise the newest records before ``cursor``
+        (or overall). Records are returned oldest first either way.
+
+        Args:
+            query: Paging and filter parameters
+            extra: Additional predicate records must satisfy
+
+        Returns:
+            (records, response headers): 'X-Last-Seq' (newest sequence
+            number held), 'X-Next-Since' and 'X-Has-More' for incremental
+            fetches, 'X-Next-Cursor' when older records remain, and
+            'X-Truncated' when records after ``since`` were already evicted
+        """
+        limit = query.limit if query.limit is not None else self.capacity
+        types, aps, devices = query.types, query.aps, query.devices
+        seen_since, rssi_filtered = query.seen_since_ns, query.rssi_min is not None or query.rssi_max is not None
+        headers = {}
+        records = []
+        has_more = False
+
+        def matches(record):
+            if types is not None and record.get('type') not in types:
+                return False
+            if devices is not None and record.get('device_id') not in devices:
+                return False
+            if aps is not None and record.get('access_point') not in aps:
+                # Also heard by the requested AP as a duplicate?
+                if aps.isdisjoint(record.get('ap_rssi') or ()):
+                    return False
+            if rssi_filtered and not query.rssi_matches(record.get('rssi')):
+                return False
+            return extra is None or extra(record)
+
+        with self._lock:
+            first, stop = self.first_seq, self.next_seq
+            headers['X-Last-Seq'] = str(stop - 1)
+            if query.since is not None:
+                start = max(first, query.since + 1)
+                if query.since + 1 < first:
+                    headers['X-Truncated'] = 'true'
+                if seen_since is not None:
+                    start = max(start, self._first_seq_at(seen_since))
+                for seq in self._candidates(query, True, start, stop):
+                    record = self.get(seq)
+                    if record is None or not matches(record):
+                        continue
+                    if len(records) == limit:
+                        has_more = True
+                        break
+                    records.append(record)
+                last = records[-1]['seq'] if records else max(query.since, first - 1)
+                headers['X-Next-Since'] = str(last)
+                headers['X-Has-More'] = 'true' if has_more else 'false'
+            else:
+                if query.cursor is not None:
+                    stop = min(stop, max(first, query.cursor))
+                for seq in self._candidates(query, False, first, stop):
+                    record = self.get(seq)
+                    if record is None:
+                        continue
+                    # Receive times only decrease from here
+                    if seen_since is not None and record.get('timestamp', 0) < seen_since:
+                        break
+                    if not matches(record):
+                        continue
+                    if len(records) == limit:
+                        has_more = True
+                        break
+                    records.append(record)
+                records.reverse()
+                if has_more and records:
+                    headers['X-Next-Cursor'] = str(records[0]['seq'])
+        return records, headers
+
+
+class ChangeClock:
+    """Monotonic change version shared by the registry indexes"""
+
+    __slots__ = ('version',)
+
+    def __init__(self):
+        self.version = 0
+
+    def tick(self) -> int:
+        """Advance and return the version (called from the ingest thread only)"""
+        self.version += 1
+        return self.version
+
+
+# Removal records kept per index for change queries
+MAX_TOMBSTONES = 4096
+
+
+def _field_values(value: Any) -> frozenset:
+    """Values an entry field is indexed under (each member of a set-valued field)"""
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    return frozenset((value,))
+
+
+class RegistryIndex:
+    """
+    Key order of a registry dictionary
+
+    Keys are recorded in first-seen order in an append-only list, so a
+    cursor is a position in that list and paging costs O(page). A recency
+    order (most recently updated last, with the change version of the
+    update) answers ``seen_since`` and ``changed_since`` queries by walking
+    back from the newest update until the first older entry; this relies on
+    entries being updated in receive-time order (see ``timestamps.now_ns``).
+
+    For each of ``index_fields``, the keys are also indexed by the entry's
+    value of that field (every member, for set-valued fields such as a BLE
+    device's reporters), so a filtered page costs O(matching keys) rather
+    than O(registry).
+    """
+
+    def __init__(self, clock: Optional[ChangeClock] = None, index_fields: Iterable[str] = ()):
+        self.clock = clock if clock is not None else ChangeClock()
+        self._order: List[Any] = []
+        self._positions: Dict[Any, int] = {}
+        self._recent: 'OrderedDict[Any, int]' = OrderedDict()
+        self._removed: 'OrderedDict[Any, int]' = OrderedDict()
+        self.index_fields = tuple(index_fields)
+        # field -> value -> keys whose entry has that value
+        self._members: Dict[str, Dict[Any, set]] = {field: {} for field in self.index_fields}
+        # key -> indexed field values, as last recorded
+        self._values: Dict[Any, Tuple[Any, ...]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    def touch(self, key: Any, entry: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Record an update of a registry entry
+
+        Args:
+            key: Registry key
+            entry: The updated entry; required to keep ``index_fields`` current
+        """
+        with self._lock:
+            recent = self._recent
+            recent[key] = self.clock.tick()
+            recent.move_to_end(key)
+            if key not in self._positions:
+                self._positions[key] = len(self._order)
+                self._order.append(key)
+            if self._removed:
+                self._removed.pop(key, None)
+            if entry is not None and self.index_fields:
+                self._reindex(key, tuple(map(entry.get, self.index_fields)))
+
+    def _reindex(self, key: Any, values: Tuple[Any, ...]) -> None:
+        """Move a key to the member sets of its new field values (lock held)"""
+        old = self._values.get(key)
+        # Usually unchanged; a stored frozenset compares equal to a set with the same members
+        if old == values:
+            return
+        for i, field in enumerate(self.index_fields):
+            old_values = _field_values(old[i]) if old is not None else frozenset()
+            new_values = _field_values(values[i])
+            members = self._members[field]
+            for value in old_values - new_values:
+                keys = members.get(value)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del members[value]
+            for value in new_values - old_values:
+                members.setdefault(value, set()).add(key)
+        # Set-valued fields are mutated in place by their owners; keep a snapshot
+        self._values[key] = tuple(frozenset(value) if isinstance(value, set) else value for value in values)
+
+    def discard(self, key: Any) -> None:
+        """Record the removal of a registry entry"""
+        with self._lock:
+            if self._recent.pop(key, None) is None:
+                return
+            values = self._values.pop(key, None)
+            if values is not None:
+                for field, value in zip(self.index_fields, values):
+                    members = self._members[field]
+                    for member in _field_values(value):
+                        keys = members.get(member)
+                        if keys is not None:
+                            keys.discard(key)
+                            if not keys:
+                                del members[member]
+            self._removed[key] = self.clock.tick()
+            if len(self._removed) > MAX_TOMBSTONES:
+                self._removed.popitem(last=False)
+
+    def _filtered_positions(self, filters: Dict[str, Optional[frozenset]],
+                            keys: Optional[frozenset]) -> Optional[List[int]]:
+        """
+        First-seen positions of the keys that may match, ascending
+
+        Uses the most selective of the key filter and the indexed field
+        filters; None when no filter applies.
+        """
+        with self._lock:
+            best = None
+            if keys is not None:
+                best = [key for key in keys if key in self._positions]
+            for field, values in filters.items():
+                members = self._members.get(field)
+                if values is None or members is None:
+                    continue
+                sets = [members[value] for value in values if value in members]
+                if best is not None and sum(len(keys) for keys in sets) >= len(best):
+                    continue
+                best = set().union(*sets) if len(sets) > 1 else list(sets[0]) if sets else []
+            if best is None:
+                return None
+            return sorted(self._positions[key] for key in best)
+
+    def changed_since(self, version: int) -> Tuple[List[Any], List[Any]]:
+        """
+        Keys updated and keys removed after a change version
+
+        Costs O(changes): both orders are walked back from the newest entry.
+
+        Returns:
+            (updated keys, removed keys), most recent first
+        """
+        with self._lock:
+            updated = []
+            for key in reversed(self._recent):
+                if self._recent[key] <= version:
+                    break
+                updated.append(key)
+            removed = []
+            for key in reversed(self._removed):
+                if self._removed[key] <= version:
+                    break
+                removed.append(key)
+        return updated, removed
+
+    def page(self, registry: Dict[Any, Any], query: Query,
+             matches: Optional[Callable[[Any, Any], bool]] = None,
+             last_seen: Callable[[Any], Optional[int]] = lambda value: value.get('last_seen'),
+             filters: Optional[Dict[str, Optional[frozenset]]] = None,
+             keys: Optional[frozenset] = None
+             ) -> Tuple[List[Tuple[Any, Any]], Dict[str, str]]:
+        """
+        Select a page of registry entries
+
+        Without ``seen_since``, entries are returned in first-seen order
+        starting at ``cursor``; with it, most recently updated first, and
+        ``cursor`` counts entries already returned.
+
+        Args:
+            registry: The dictionary this index tracks
+            query: Paging parameters (limit, cursor, seen_since)
+            matches: Predicate on (key, value) for the remaining filters
+            last_seen: Returns an entry's last update time in epoch nanoseconds
+            filters: Accepted values per indexed field; only keys indexed
+                under one of them are visited (``matches`` still decides)
+            keys: Only these keys are visited
+
+        Returns:
+            ((key, value) pairs, response headers with 'X-Next-Cursor' when
+            more entries remain)
+        """
+        limit = query.limit
+        position = max(0, query.cursor or 0)
+        items = []
+        headers = {}
+
+        def keys_from_position():
+            if query.seen_since_ns is None:
+                order = self._order
+                positions = self._filtered_positions(filters or {}, keys)
+                if positions is None:
+                    for i in range(position, len(order)):
+                        yield i, order[i]
+                else:
+                    for i in positions[bisect.bisect_left(positions, position):]:
+                        yield i, order[i]
+            else:
+                with self._lock:
+                    recent = []
+                    for key in reversed(self._recent):
+                        value = registry.get(key)
+                        seen = last_seen(value) if value is not None else None
+                        if seen is None or seen < query.seen_since_ns:
+                            break
+                        recent.append(key)
+                for i in range(position, len(recent)):
+                    yield i, recent[i]
+
+        for i, key in keys_from_position():
+            value = registry.get(key)
+            if value is None or (matches is not None and not matches(key, value)):
+                continue
+            if limit is not None and len(items) == limit:
+                headers['X-Next-Cursor'] = str(i)
+                break
+            items.append((key, value))
+        return items, headers
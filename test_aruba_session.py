@@ -0,0 +1,74 @@
+"""Tests for aruba_session.py: AP authentication and per-connection state"""
+import pytest
+
+import aruba_session
+from aruba_session import AuthConfig, ConnectionSession
+
+
+class FakeWebSocket:
+    def __init__(self, headers=None, remote_address=('10.0.0.5', 40000)):
+        self.request_headers = headers or {}
+        self.remote_address = remote_address
+
+
+@pytest.fixture
+def auth(monkeypatch):
+    config = AuthConfig(frozenset({'tok'}), frozenset({'ap-client'}), frozenset({'secret'}), frozenset({'replay-tok'}))
+    monkeypatch.setattr(aruba_session, '_auth_config', config)
+    return config
+
+
+@pytest.mark.parametrize('path, headers, expected', [
+    ('/aruba?token=tok', {}, ('token', None)),
+    ('/aruba?clientID=ap-client&accessToken=secret', {}, ('client_id', 'ap-client')),
+    ('/aruba', {'Authorization': 'Bearer tok'}, ('token', None)),
+    ('/aruba', {'X-Client-ID': 'ap-client', 'X-Access-Token': 'secret'}, ('client_id', 'ap-client')),
+    ('/aruba?token=wrong', {}, (None, None)),
+    ('/aruba?clientID=ap-client&accessToken=tok', {}, (None, None)),
+    ('/aruba', {}, (None, None)),
+])
+def test_authenticate(auth, path, headers, expected):
+    assert auth.authenticate(path, headers) == expected
+
+
+def test_open_rejects_bad_credentials(auth):
+    assert ConnectionSession.open(FakeWebSocket(), '/aruba?token=nope') is None
+
+
+def test_session_identity_from_query(auth):
+    session = ConnectionSession.open(FakeWebSocket(), '/aruba?token=tok&ap=AP-7')
+    assert (session.client_ip, session.client_port, session.access_point, session.replay) == \
+        ('10.0.0.5', 40000, 'AP-7', False)
+    packet = {'deviceId': 'd1'}
+    session.apply_identity(packet)
+    assert packet['accessPoint'] is session.access_point
+
+
+def test_session_learns_ap_from_first_packet(auth):
+    session = ConnectionSession.open(FakeWebSocket(), '/aruba?token=tok')
+    session.apply_identity({'accessPoint': 'AP-9'})
+    assert session.access_point == 'AP-9'
+    # Other APs forwarding through the same connection keep their own name
+    packet = {'accessPoint': 'AP-10'}
+    session.apply_identity(packet)
+    assert packet['accessPoint'] == 'AP-10' and session.access_point == 'AP-9'
+
+
+def test_replay_needs_a_replay_token(auth):
+    session = ConnectionSession.open(FakeWebSocket(), '/aruba?token=tok&replay=replay-tok')
+    assert session.replay
+    assert ConnectionSession.open(FakeWebSocket(), '/aruba?token=tok&replay=true') is None
+    assert ConnectionSession.open(FakeWebSocket(), '/aruba?token=tok&replay=tok') is None
+
+
+def test_replay_disabled_without_replay_tokens(monkeypatch):
+    monkeypatch.setattr(aruba_session, '_auth_config', AuthConfig(frozenset({'tok'}), frozenset(), frozenset()))
+    assert ConnectionSession.open(FakeWebSocket(), '/aruba?token=tok&replay=true') is None
+    # An empty value is not a replay request
+    assert not ConnectionSession.open(FakeWebSocket(), '/aruba?token=tok&replay=').replay
+
+
+def test_receive_times_never_decrease(auth):
+    session = ConnectionSession.open(FakeWebSocket(), '/aruba?token=tok')
+    times = [session.now_ns() for _ in range(1000)]
+    assert times == sorted(times)
@@ -0,0 +1,106 @@
+"""Tests for dead_letter.py: segment format, retention, writer queue and replay"""
+import os
+
+import pytest
+
+from dead_letter import (
+    DeadLetterStore, encode_record, read_dead_letters, read_segment, replay_in_process, segment_paths
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DeadLetterStore(str(tmp_path), max_bytes=1 << 20, segment_bytes=1 << 16)
+    yield store
+    store.close()
+
+
+def test_write_read_round_trip(store, tmp_path):
+    frames = ['{"type": "ble", "rssi": -5', b'\x08\xff\x00binary', 'ünïcode\ud800', '']
+    for i, frame in enumerate(frames):
+        assert store.add(frame, 'JSONDecodeError', f"message {i}", f"AP-{i}" if i else None, 1000 + i)
+    store.flush()
+    records = list(read_dead_letters(str(tmp_path)))
+    assert [record.frame for record in records] == frames
+    assert [record.source for record in records] == [None, 'AP-1', 'AP-2', 'AP-3']
+    assert [record.received_ns for record in records] == [1000, 1001, 1002, 1003]
+    assert records[1].to_dict()['binary'] and not records[0].to_dict()['binary']
+    assert store.stats()['records_written'] == 4
+
+
+def test_filters(store, tmp_path):
+    store.add('a', 'JSONDecodeError', source='AP-1')
+    store.add('b', 'ValueError', source='AP-2')
+    store.add('c', 'JSONDecodeError', source='AP-2')
+    store.flush()
+    assert [r.frame for r in read_dead_letters(str(tmp_path), error_classes=['JSONDecodeError'])] == ['a', 'c']
+    assert [r.frame for r in read_dead_letters(str(tmp_path), sources=['AP-2'])] == ['b', 'c']
+
+
+def _write_segment(path, records):
+    with open(path, 'wb') as f:
+        f.write(b''.join(records))
+
+
+def test_crc_mismatch_ends_the_segment(tmp_path):
+    records = [encode_record(f"frame {i}", i, 'AP', 'E', '') for i in range(3)]
+    corrupt = bytearray(records[1])
+    corrupt[-1] ^= 0xff
+    path = str(tmp_path / 'segment-00000001.dlq')
+    _write_segment(path, [records[0], bytes(corrupt), records[2]])
+    assert [record.frame for record in read_segment(path)] == ['frame 0']
+
+
+def test_torn_record_ends_the_segment(tmp_path):
+    records = [encode_record(f"frame {i}", i, 'AP', 'E', '') for i in range(2)]
+    path = str(tmp_path / 'segment-00000001.dlq')
+    _write_segment(path, [records[0], records[1][:-3]])
+    assert [record.frame for record in read_segment(path)] == ['frame 0']
+
+
+def test_restart_starts_a_new_segment(tmp_path):
+    first = DeadLetterStore(str(tmp_path))
+    first.add('one', 'E')
+    first.close()
+    second = DeadLetterStore(str(tmp_path))
+    second.add('two', 'E')
+    second.close()
+    assert len(segment_paths(str(tmp_path))) == 2
+    assert [record.frame for record in read_dead_letters(str(tmp_path))] == ['one', 'two']
+
+
+def test_retention_deletes_oldest_segments(tmp_path):
+    store = DeadLetterStore(str(tmp_path), max_bytes=64 * 1024, segment_bytes=16 * 1024)
+    for i in range(100):
+        store.add(f"{i:04d}" + 'x' * 2000, 'E')
+    store.close()
+    total = sum(os.path.getsize(path) for path in segment_paths(str(tmp_path)))
+    frames = [record.frame[:4] for record in read_dead_letters(str(tmp_path))]
+    assert total <= 64 * 1024
+    # The newest frames survive, without gaps
+    assert frames == [f"{i:04d}" for i in range(100 - len(frames), 100)]
+    assert store.stats()['bytes'] == total
+
+
+def test_full_queue_drops_without_blocking(tmp_path):
+    store = DeadLetterStore(str(tmp_path), queue_size=1)
+    # Hold the store lock so the writer cannot drain the queue
+    with store._lock:
+        results = [store.add(f"frame {i}", 'E') for i in range(5)]
+    store.close()
+    assert results.count(False) == store.dropped >= 3
+    assert len(list(read_dead_letters(str(tmp_path)))) == 5 - store.dropped
+
+
+def test_replay_in_process_counts_by_error_class(store, tmp_path):
+    store.add('{"ok": 1}', 'JSONDecodeError')
+    store.add('{"still": broken', 'JSONDecodeError')
+    store.add('x', 'ValueError')
+    store.flush()
+
+    class Handler:
+        def process_telemetry(self, frame):
+            return {'stored': True} if frame.startswith('{"ok"') else None
+    accepted, failed = replay_in_process(list(read_dead_letters(str(tmp_path))), Handler())
+    assert accepted == {'JSONDecodeError': 1}
+    assert failed == {'JSONDecodeError': 1, 'ValueError': 1}
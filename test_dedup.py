@@ -0,0 +1,40 @@
+"""Tests for dedup.py: payload signatures and the duplicate table"""
+from dedup import DuplicateSuppressor, payload_signature
+
+
+def test_signature_ignores_ap_fields():
+    first = {'uuid': 'fda5', 'major': 1, 'minor': 2, 'accessPoint': 'AP-1', 'rssi': -50}
+    second = {'uuid': 'fda5', 'major': 1, 'minor': 2, 'accessPoint': 'AP-2', 'rssi': -70}
+    assert payload_signature(first) == payload_signature(second)
+    assert payload_signature(first) != payload_signature(dict(first, minor=3))
+
+
+def test_signature_of_nested_values():
+    data = {'serviceData': [{'uuid': 'feaa', 'data': '00e7'}], 'manufacturerData': {'004c': [2, 21]}}
+    signature = payload_signature(data)
+    assert isinstance(signature, int)
+    # Object key order does not matter, nested contents do
+    assert payload_signature({'serviceData': [{'data': '00e7', 'uuid': 'feaa'}],
+                              'manufacturerData': {'004c': [2, 21]}}) == signature
+    assert payload_signature({'serviceData': [{'uuid': 'feaa', 'data': '00e8'}],
+                              'manufacturerData': {'004c': [2, 21]}}) != signature
+
+
+def test_signature_of_unhashable_payload_is_none():
+    assert payload_signature({'payload': bytearray(b'\x01')}) is None
+    assert payload_signature({'payload': {1: 'a', 'b': 2}}) is None
+
+
+def test_suppressor_finds_duplicate_within_window():
+    dedup = DuplicateSuppressor(window_ms=50, max_entries=16)
+    record = {'device_id': 'd1'}
+    dedup.remember('ble', 'd1', 42, record, now=100.0)
+    assert dedup.lookup('ble', 'd1', 42, now=100.01) is record
+    assert dedup.lookup('ble', 'd1', 43, now=100.01) is None
+    assert dedup.lookup('ble', 'd1', 42, now=101.0) is None
+
+
+def test_disabled_suppressor_never_matches():
+    dedup = DuplicateSuppressor(window_ms=0)
+    dedup.remember('ble', 'd1', 42, {}, now=1.0)
+    assert dedup.lookup('ble', 'd1', 42, now=1.0) is None
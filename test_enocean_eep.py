@@ -0,0 +1,34 @@
+"""Tests for enocean_eep.py: EEP payload decoding"""
+import pytest
+
+from enocean_eep import decode_eep
+
+
+def test_decodes_temperature():
+    # A5-02-05: 0..40 degC over 255..0; DB1 = 0x80 (LRN bit set, data telegram)
+    values = decode_eep('A5-02-05', '00008008')
+    assert values['temperature'] == pytest.approx(40 - 0x80 * 40 / 255, abs=0.1)
+
+
+def test_payload_with_rorg_prefix_and_lower_case_eep():
+    assert decode_eep('a5-02-05', 'A500008008') == decode_eep('A5-02-05', bytes.fromhex('00008008'))
+
+
+def test_teach_in_telegram():
+    assert decode_eep('A5-02-05', '00008000') == {'teach_in': True}
+
+
+@pytest.mark.parametrize('eep, payload', [
+    (0xA50205, '00008008'),            # numeric EEP
+    (['A5-02-05'], '00008008'),
+    ('A5-02-05', [0, 0, 0x80, 0x08]),  # list payload
+    ('A5-02-05', 8),
+    ('A5-02-05', {'data': '00008008'}),
+    ('A5-02-05', 'not hex'),
+    ('A5-02-05', '00'),                # too short
+    ('ZZ-99-99', '00008008'),          # unsupported profile
+    ('', '00008008'),
+    ('A5-02-05', None),
+])
+def test_unsupported_input_decodes_to_nothing(eep, payload):
+    assert decode_eep(eep, payload) == {}
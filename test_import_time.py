@@ -0,0 +1,59 @@
+"""
+Cold-start test: importing app must not load the protobuf runtime
+
+Each measurement imports app in a fresh interpreter with ``python -X
+importtime`` (see benchmarks/import_time.py for the full audit). The protobuf
+runtime and the generated _pb2 modules are loaded on first use of a codec,
+not at import. The total import time must stay under IMPORT_TIME_BUDGET_MS
+(default 1000 ms; the best of three runs is compared, to ride out noise).
+"""
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+IMPORT_TIME_BUDGET_MS = float(os.getenv('IMPORT_TIME_BUDGET_MS', 1000))
+
+# import time: <self us> | <cumulative us> | <2 spaces per nesting level><module>
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def _run(code, *options):
+    # No dead-letter store or other side effects from the environment
+    env = dict(os.environ, DEAD_LETTER_DIR='')
+    result = subprocess.run([sys.executable, *options, '-c', code], cwd=ROOT, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr[-2000:]
+    return result
+
+
+def _import_app():
+    """(cumulative microseconds of importing app, names of every module imported)"""
+    result = _run('import app', '-X', 'importtime')
+    lines = [m for m in map(_LINE.match, result.stderr.splitlines()) if m]
+    total = next(int(m.group(2)) for m in lines if m.group(4) == 'app')
+    return total, {m.group(4) for m in lines}
+
+
+def _is_protobuf(name):
+    return name == 'google.protobuf' or name.startswith('google.protobuf.') or name.endswith('_pb2')
+
+
+def test_import_does_not_load_protobuf():
+    _, modules = _import_app()
+    assert not sorted(name for name in modules if _is_protobuf(name))
+
+
+def test_protobuf_loads_on_first_use():
+    result = _run(
+        "import sys, app, protobuf_utils\n"
+        "before = sorted(m for m in sys.modules if m.startswith('google.protobuf') or m.endswith('_pb2'))\n"
+        "protobuf_utils.encode_wifi_packet({'type': 'wifi', 'macAddress': 'AA:BB:CC:DD:EE:FF', 'rssi': -60})\n"
+        "print(len(before), 'google.protobuf' in sys.modules, 'protos.wifi_pb2' in sys.modules)\n")
+    assert result.stdout.split() == ['0', 'True', 'True']
+
+
+def test_import_time_budget():
+    best_ms = min(_import_app()[0] for _ in range(3)) / 1000
+    assert best_ms < IMPORT_TIME_BUDGET_MS, f"import app took {best_ms:.0f} ms"
@@ -0,0 +1,60 @@
+"""Tests for json_repair.py: repairs, size limit and time budget"""
+import json
+import time
+
+import pytest
+
+from json_repair import RepairBudgetExceeded, repair_json
+
+
+@pytest.mark.parametrize('text, repairs', [
+    ('{"a": 1, "b": [1, 2,],}', ['trailing_commas']),
+    ('{deviceId: "x", rssi: -50}', ['unquoted_keys']),
+    ('﻿{"a": 1}', ['bom']),
+    ('{"a": "line\nbreak\ttab"}', ['control_chars']),
+    ('{"a": 1}\x00', ['control_chars']),
+])
+def test_repairs(text, repairs):
+    repaired, applied = repair_json(text)
+    assert applied == repairs
+    json.loads(repaired)
+
+
+def test_well_formed_text_is_unchanged():
+    text = '{"a": [true, false, null, -1.5e3], "b": "x\\"y", "c": {}}'
+    assert repair_json(text) == (text, [])
+
+
+def test_long_strings_are_repaired_across_chunks():
+    value = ('x' * 3000 + '\n') * 3 + 'a,b:c \\" d'
+    repaired, applied = repair_json('{key: "' + value + '",}')
+    assert applied == ['control_chars', 'trailing_commas', 'unquoted_keys']
+    assert json.loads(repaired) == {'key': value.replace('\\"', '"')}
+
+
+def test_unterminated_string_is_not_repaired_into_json():
+    repaired, _ = repair_json('{"a": "' + 'x' * 5000 + '\n')
+    with pytest.raises(ValueError):
+        json.loads(repaired)
+
+
+def test_size_limit():
+    with pytest.raises(RepairBudgetExceeded):
+        repair_json('{a: 1,}' + ' ' * 100, max_chars=100)
+
+
+@pytest.mark.parametrize('text', [
+    '{' + 'a,' * 30000,                   # one long run of plain tokens
+    '{"a": "' + 'x' * 60000,              # unterminated string
+    '{"a": "' + 'x\n' * 30000 + '"}',     # one long string to repair
+    '{' + 'k: 1,' * 12000 + '}',          # many small repairs
+])
+def test_time_budget_holds_for_single_long_tokens(text):
+    start = time.perf_counter()
+    try:
+        repair_json(text, max_chars=64 * 1024, max_seconds=0.002)
+    except RepairBudgetExceeded:
+        pass
+    # The budget is checked at least every kilobyte of scanning; a full scan
+    # of these frames takes several times longer than this
+    assert time.perf_counter() - start < 0.010
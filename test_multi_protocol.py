@@ -72,7 +72,7 @@ class DeviceSimulator:
             "deviceId": f"ibeacon-{uuid[:8]}-{major}-{minor}",
             "macAddress": random.choice(self.device_macs),
             "rssi": random.randint(-80, -30),
-            "manufacturerData": f"4c000215{uuid.replace('-', '')}{major:04x}{minor:04x}{abs(tx_power):02x}",
+            "manufacturerData": f"4c000215{uuid.replace('-', '')}{major:04x}{minor:04x}{tx_power & 0xFF:02x}",
             "uuid": uuid,
             "major": major,
             "minor": minor,
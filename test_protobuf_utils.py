@@ -0,0 +1,71 @@
+"""Tests for protobuf_utils.py: packet stream framing and batch decoding"""
+import pytest
+
+from protobuf_utils import (
+    STREAM_MAGIC, STREAM_TYPE_IBEACON_V2, STREAM_TYPE_WIFI, STREAM_TYPE_WIFI_V2, STREAM_VERSION,
+    StreamFormatError, decode_packet_stream, decode_wifi_packet_v2, encode_ibeacon_packet_v2,
+    encode_packet_stream, encode_wifi_packet, encode_wifi_packet_v2, is_packet_stream, iter_packet_stream
+)
+
+HEADER = bytes((STREAM_MAGIC, STREAM_VERSION))
+
+WIFI = {'type': 'wifi', 'macAddress': 'AA:BB:CC:DD:EE:01', 'rssi': -61, 'ssid': 'lab', 'channel': 6,
+        'timestamp': 1700000000, 'accessPoint': 'AP-1'}
+IBEACON = {'type': 'ble', 'macAddress': 'AA:BB:CC:DD:EE:02', 'rssi': -70, 'timestamp': 1700000000123,
+           'uuid': 'fda50693-a4e2-4fb1-afcf-c6eb07647825', 'major': 1, 'minor': 2, 'txPower': -59}
+
+
+def _frames(data):
+    return [(code, bytes(payload)) for code, payload in iter_packet_stream(data)]
+
+
+def test_framing_round_trip():
+    messages = [(1, b''), (2, b'x' * 127), (3, b'y' * 128), (200, b'z' * 70000)]
+    data = encode_packet_stream(messages)
+    assert is_packet_stream(data)
+    assert _frames(data) == messages
+    assert _frames(memoryview(bytearray(data))) == messages
+    assert _frames(HEADER) == []
+
+
+def test_bare_protobuf_is_not_a_stream():
+    assert not is_packet_stream(encode_wifi_packet(WIFI))
+    assert not is_packet_stream(bytes((STREAM_MAGIC,)))
+
+
+@pytest.mark.parametrize('data', [
+    HEADER + bytes((1,)),                      # type code without a length
+    HEADER + bytes((1, 0x80)),                 # length prefix cut inside the varint
+    HEADER + bytes((1, 5)) + b'abc',           # message shorter than its length
+    encode_packet_stream([(1, b'abcdef')])[:-1],
+])
+def test_truncated_frames_are_rejected(data):
+    with pytest.raises(StreamFormatError):
+        _frames(data)
+
+
+@pytest.mark.parametrize('data', [
+    HEADER + bytes((1, 0xff, 0xff, 0xff, 0xff, 0x7f)),    # length prefix longer than 4 varint bytes
+    HEADER + bytes((1, 0xff, 0xff, 0xff, 0x7f)) + b'x',   # 256 MiB message in a 7 byte frame
+])
+def test_oversized_lengths_are_rejected(data):
+    with pytest.raises(StreamFormatError):
+        _frames(data)
+
+
+def test_batch_decode_matches_single_decode_in_stream_order():
+    wifi = [encode_wifi_packet_v2(dict(WIFI, rssi=-50 - i)) for i in range(5)]
+    beacon = encode_ibeacon_packet_v2(IBEACON)
+    data = encode_packet_stream([(STREAM_TYPE_WIFI_V2, payload) for payload in wifi[:3]]
+                                + [(STREAM_TYPE_IBEACON_V2, beacon)]
+                                + [(STREAM_TYPE_WIFI_V2, payload) for payload in wifi[3:]])
+    records = decode_packet_stream(data)
+    assert [record['type'] for record in records] == ['wifi'] * 3 + ['ble'] + ['wifi'] * 2
+    assert [record for record in records if record['type'] == 'wifi'] == [decode_wifi_packet_v2(p) for p in wifi]
+    assert records[3]['uuid'] == IBEACON['uuid'] and records[3]['minor'] == 2
+
+
+def test_unknown_type_codes_are_skipped():
+    data = encode_packet_stream([(99, b'junk'), (STREAM_TYPE_WIFI, encode_wifi_packet(WIFI))])
+    records = decode_packet_stream(data)
+    assert len(records) == 1 and records[0]['ssid'] == 'lab'
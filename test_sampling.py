@@ -0,0 +1,42 @@
+"""Tests for sampling.py: per-device sampling policies"""
+from sampling import TelemetrySampler
+
+
+def _stored(sampler, packet_type, device_id, times):
+    return sum(sampler.should_store(packet_type, device_id, now=now) for now in times)
+
+
+def test_no_policies_store_everything():
+    sampler = TelemetrySampler({})
+    assert not sampler.enabled
+    assert _stored(sampler, 'ble', 'd1', range(100)) == 100
+
+
+def test_store_every_keeps_one_in_k():
+    sampler = TelemetrySampler({'type:ble': {'store_every': 5}})
+    assert _stored(sampler, 'ble', 'd1', range(100)) == 20
+    assert _stored(sampler, 'wifi', 'w1', range(100)) == 100
+    assert sampler.dropped_count == 80
+
+
+def test_max_rate_limits_stored_records_per_second():
+    sampler = TelemetrySampler({'type:ble': {'max_rate': 2}})
+    # 10 Hz for 10 seconds: a burst of 2, then 2 per second
+    stored = _stored(sampler, 'ble', 'd1', [i / 10 for i in range(100)])
+    assert 19 <= stored <= 22
+
+
+def test_device_policy_overrides_type_policy():
+    sampler = TelemetrySampler({'type:ble': {'store_every': 10}, 'device:vip': {'max_rate': 0}})
+    assert _stored(sampler, 'ble', 'vip', range(50)) == 50
+    assert _stored(sampler, 'ble', 'other', range(50)) == 5
+
+
+def test_devices_are_sampled_independently():
+    sampler = TelemetrySampler({'type:ble': {'store_every': 2}})
+    assert [sampler.should_store('ble', device, now=0) for device in ('a', 'b', 'a', 'b')] == [True, True, False, False]
+
+
+def test_unknown_scope_is_ignored():
+    sampler = TelemetrySampler({'room:lobby': {'store_every': 2}})
+    assert not sampler.enabled
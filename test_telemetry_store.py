@@ -0,0 +1,161 @@
+"""Tests for telemetry_store.py: buffer paging, registry paging and query parsing"""
+import random
+
+import pytest
+
+from telemetry_store import ChangeClock, Query, RegistryIndex, TelemetryBuffer
+
+
+def _buffer(count, capacity=100):
+    buffer = TelemetryBuffer(capacity)
+    for i in range(count):
+        buffer.append({'type': ('ble', 'wifi')[i % 2], 'device_id': f"d{i % 7}",
+                       'access_point': f"AP-{i % 3}", 'timestamp': 1000 + i, 'rssi': -40 - i % 50})
+    return buffer
+
+
+def _seqs(records):
+    return [record['seq'] for record in records]
+
+
+def test_ring_evicts_oldest():
+    buffer = _buffer(250)
+    assert (buffer.first_seq, buffer.last_seq, len(buffer)) == (151, 250, 100)
+    assert buffer.get(150) is None and buffer.get(151)['seq'] == 151
+    assert buffer.count_by('type') == {'ble': 50, 'wifi': 50}
+
+
+def test_incremental_fetch_pages_through_everything():
+    buffer = _buffer(250)
+    since, seen = 200, []
+    while True:
+        records, headers = buffer.query(Query(limit=7, since=since))
+        seen += _seqs(records)
+        since = int(headers['X-Next-Since'])
+        if headers['X-Has-More'] == 'false':
+            break
+    assert seen == list(range(201, 251))
+    assert buffer.query(Query(since=250))[0] == []
+
+
+def test_incremental_fetch_reports_evicted_records():
+    records, headers = _buffer(250).query(Query(limit=5, since=10))
+    assert headers['X-Truncated'] == 'true'
+    assert _seqs(records) == [151, 152, 153, 154, 155]
+
+
+def test_cursor_pages_backwards_without_gaps():
+    buffer = _buffer(250)
+    cursor, pages = None, []
+    while True:
+        records, headers = buffer.query(Query(limit=30, cursor=cursor, types=frozenset({'wifi'})))
+        pages.append(_seqs(records))
+        if 'X-Next-Cursor' not in headers:
+            break
+        cursor = int(headers['X-Next-Cursor'])
+    flat = [seq for page in reversed(pages) for seq in page]
+    assert flat == [seq for seq in range(151, 251) if seq % 2 == 0]
+    # Each page is oldest first
+    assert all(page == sorted(page) for page in pages)
+
+
+@pytest.mark.parametrize('query', [
+    Query(types=frozenset({'ble'}), aps=frozenset({'AP-1'})),
+    Query(devices=frozenset({'d3', 'd5'}), rssi_min=-60),
+    Query(aps=frozenset({'AP-0', 'AP-2'}), seen_since_ns=1200),
+    Query(since=180, devices=frozenset({'d1'})),
+])
+def test_indexed_filters_match_a_full_scan(query):
+    buffer = _buffer(250)
+    records, _ = buffer.query(query)
+
+    def matches(record):
+        return ((query.types is None or record['type'] in query.types)
+                and (query.aps is None or record['access_point'] in query.aps)
+                and (query.devices is None or record['device_id'] in query.devices)
+                and query.rssi_matches(record['rssi'])
+                and (query.seen_since_ns is None or record['timestamp'] >= query.seen_since_ns)
+                and (query.since is None or record['seq'] > query.since))
+    assert _seqs(records) == [record['seq'] for record in buffer if matches(record)]
+
+
+def test_duplicate_is_found_under_every_ap():
+    buffer = TelemetryBuffer(10)
+    record = {'type': 'ble', 'access_point': 'AP-1', 'ap_rssi': {'AP-1': -50}}
+    buffer.append(record)
+    record['ap_rssi']['AP-2'] = -60
+    buffer.add_to_index(record, 'access_point', 'AP-2')
+    assert buffer.query(Query(aps=frozenset({'AP-2'})))[0] == [record]
+
+
+def test_query_from_args_rejects_malformed_values():
+    query = Query.from_args({'limit': '5', 'type': 'ble, wifi', 'fields': 'device_id,rssi'})
+    assert (query.limit, query.types, query.fields) == (5, frozenset({'ble', 'wifi'}), ('device_id', 'rssi'))
+    for args in ({'limit': 'x'}, {'limit': '-1'}, {'cursor': '1.5'}, {'seen_since': 'yesterday'}):
+        with pytest.raises(ValueError):
+            Query.from_args(args)
+
+
+def _registry(count, seed=1):
+    rnd = random.Random(seed)
+    registry, index = {}, RegistryIndex(ChangeClock(), index_fields=('type', 'access_point'))
+    for i in range(count):
+        key = f"dev{rnd.randrange(count)}"
+        registry[key] = {'type': rnd.choice(('ble', 'wifi', 'enocean')), 'access_point': f"AP-{rnd.randrange(5)}",
+                         'last_seen': i}
+        index.touch(key, registry[key])
+    return registry, index
+
+
+def _page_all(index, registry, limit, **kwargs):
+    cursor, keys = None, []
+    while True:
+        items, headers = index.page(registry, Query(limit=limit, cursor=cursor), **kwargs)
+        keys += [key for key, _ in items]
+        if 'X-Next-Cursor' not in headers:
+            return keys
+        cursor = int(headers['X-Next-Cursor'])
+
+
+def test_registry_pages_in_first_seen_order():
+    registry, index = _registry(500)
+    assert _page_all(index, registry, 37) == list(registry)
+
+
+def test_registry_filters_follow_entry_updates():
+    registry, index = _registry(500)
+    key = next(iter(registry))
+    registry[key]['type'] = 'zigbee'
+    index.touch(key, registry[key])
+    filters = {'type': frozenset({'zigbee', 'wifi'}), 'access_point': frozenset({'AP-1', 'AP-3'})}
+
+    def matches(key, value):
+        return value['type'] in filters['type'] and value['access_point'] in filters['access_point']
+    expected = [key for key, value in registry.items() if matches(key, value)]
+    assert key in _page_all(index, registry, 10, filters={'type': frozenset({'zigbee'})})
+    assert _page_all(index, registry, 10, matches=matches, filters=filters) == expected
+
+
+def test_registry_removals_and_changes():
+    registry, index = _registry(50)
+    version = index.clock.tick()
+    first, second = list(registry)[:2]
+    registry[first]['last_seen'] += 1000
+    index.touch(first, registry[first])
+    del registry[second]
+    index.discard(second)
+    assert index.changed_since(version) == ([first], [second])
+    assert second not in _page_all(index, registry, 7, filters={'type': frozenset({'ble', 'wifi', 'enocean'})})
+
+
+def test_set_valued_field_mutated_in_place_is_reindexed():
+    index = RegistryIndex(index_fields=('reporters',))
+    entry = {'reporters': {'AP-1'}}
+    registry = {'beacon': entry}
+    index.touch('beacon', entry)
+    entry['reporters'].add('AP-2')
+    index.touch('beacon', entry)
+    entry['reporters'].discard('AP-1')
+    index.touch('beacon', entry)
+    assert index.page(registry, Query(), filters={'reporters': frozenset({'AP-2'})})[0] == [('beacon', entry)]
+    assert index.page(registry, Query(), filters={'reporters': frozenset({'AP-1'})})[0] == []
@@ -0,0 +1,113 @@
+"""
+Timestamp handling for Aruba IoT Telemetry Server
+
+Internally, receive times are integer nanoseconds since the Unix epoch,
+captured once per frame with ``now_ns()``, a wall clock that never goes
+backwards. Integers are cheap to capture, compare and store; ISO 8601
+strings are only produced at the API boundary by ``format_timestamp`` and
+``api_view``.
+
+Formatting caches the ``YYYY-MM-DDTHH:MM:SS`` prefix per second, so
+serializing the many records received within the same second only formats
+the fractional part.
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Record fields holding epoch-nanosecond timestamps
+TIMESTAMP_FIELDS = ('timestamp', 'first_seen', 'last_seen')
+
+# Formatted 'YYYY-MM-DDTHH:MM:SS' prefixes by epoch second
+_prefixes: Dict[int, str] = {}
+_MAX_PREFIXES = 4096
+
+# Latest time returned by now_ns()
+_last_ns = 0
+
+
+def now_ns() -> int:
+    """
+    Current time in epoch nanoseconds, never earlier than a previous call
+
+    Receive times are captured with this clock, so they never decrease in
+    ingest order, even across AP connections or when the wall clock is
+    stepped back (the clock then holds until the wall clock catches up).
+    Stores rely on this to binary search and stop scans by receive time.
+    """
+    global _last_ns
+    now = time.time_ns()
+    if now < _last_ns:
+        return _last_ns
+    _last_ns = now
+    return now
+
+
+def format_timestamp(timestamp_ns: int) -> str:
+    """
+    Format epoch nanoseconds as an ISO 8601 UTC timestamp
+
+    The result is identical to ``datetime.isoformat()`` of the same instant
+    (microsecond precision, '+00:00' offset).
+
+    Args:
+        timestamp_ns: Nanoseconds since the Unix epoch
+
+    Returns:
+        ISO 8601 timestamp string
+    """
+    seconds, nanos = divmod(timestamp_ns, 1_000_000_000)
+    prefix = _prefixes.get(seconds)
+    if prefix is None:
+        if len(_prefixes) >= _MAX_PREFIXES:
+            _prefixes.clear()
+        prefix = _prefixes[seconds] = (_EPOCH + timedelta(seconds=seconds)).isoformat()[:-6]
+    micros = nanos // 1000
+    if micros:
+        return f"{prefix}.{micros:06d}+00:00"
+    return f"{prefix}+00:00"
+
+
+def epoch_to_ns(value: float) -> int:
+    """
+    Convert a numeric epoch timestamp to epoch nanoseconds
+
+    APs and clients send epoch seconds, milliseconds, microseconds or
+    nanoseconds; the unit is inferred from the magnitude (seconds up to
+    about year 5000, and so on).
+
+    Args:
+        value: Seconds, milliseconds, microseconds or nanoseconds since the Unix epoch
+
+    Returns:
+        Nanoseconds since the Unix epoch
+    """
+    magnitude = abs(value)
+    if magnitude < 1e11:
+        return int(value * 1_000_000_000)
+    if magnitude < 1e14:
+        return int(value * 1_000_000)
+    if magnitude < 1e17:
+        return int(value * 1000)
+    return int(value)
+
+
+def api_view(record: Dict[str, Any], fields: Iterable[str] = TIMESTAMP_FIELDS) -> Dict[str, Any]:
+    """
+    Return a shallow copy of a record with its timestamps formatted for the API
+
+    Args:
+        record: Internal record holding epoch-nanosecond timestamps
+        fields: Fields to format; non-integer values are passed through
+
+    Returns:
+        Copy of the record with ISO 8601 timestamp strings
+    """
+    view = dict(record)
+    for field in fields:
+        value = view.get(field)
+        if type(value) is int:
+            view[field] = format_timestamp(value)
+    return view
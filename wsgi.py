@@ -0,0 +1,16 @@
+"""
+WSGI entry point for production serving of Aruba IoT Telemetry Server
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Importing this module loads the whole application (Flask routes, SocketIO
+server and handlers, protobuf descriptors). With ``preload_app`` this happens once in
+the gunicorn master before workers are forked. The Aruba AP WebSocket
+listener is started in the worker by the ``post_worker_init`` hook in
+gunicorn.conf.py, never in the master.
+"""
+from protobuf_utils import preload_descriptors
+from app import app as application, init_socketio
+
+init_socketio()
+preload_descriptors()